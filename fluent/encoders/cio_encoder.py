@@ -24,10 +24,11 @@ import numpy
 import os
 import random
 
-from collections import Counter
 from cortipy.cortical_client import CorticalClient
 from cortipy.exceptions import UnsuccessfulEncodingError
 from fluent.encoders.language_encoder import LanguageEncoder
+from fluent.utils.fingerprint_index import FingerprintIndex
+from fluent.utils.instrumentation import instruments, timed
 
 
 
@@ -38,6 +39,9 @@ class CioEncoder(LanguageEncoder):
   The encoder queries the Cortical.io REST API via the cortipy module, which
   returns data in the form of "fingerprints". These representations are
   converted to binary SDR arrays with this Cio encoder.
+
+  The fingerprints of the terms the encoder fetches are kept in a local
+  FingerprintIndex, which decode(local=True) uses instead of the API.
   """
 
   def __init__(self, w=128, h=128, cacheDir="./cache", verbosity=0):
@@ -55,8 +59,14 @@ class CioEncoder(LanguageEncoder):
     self.h              = h
     self.n              = w*h
     self.verbosity      = verbosity
+    self.termIndex      = FingerprintIndex()
+
+    # Terms the API returned no fingerprint for, so they are not requested
+    # again.
+    self._unencodableTerms = set()
 
 
+  @timed
   def encode(self, text):
     """
     Encodes the input text w/ a cortipy client. The client returns a
@@ -69,19 +79,37 @@ class CioEncoder(LanguageEncoder):
     """
     if not text:
       return None
-    try:
-      encoding = self.client.getTextBitmap(text)
-    except UnsuccessfulEncodingError:
-      if self.verbosity > 0:
-        print ("\tThe client returned no encoding for the text \'{0}\', so "
-               "we'll use the encoding of the token that is least frequent in "
-               "the corpus.".format(text))
+    encoding = self._getTextBitmap(text)
+    if encoding is None:
       encoding = self._subEncoding(text)
 
     return encoding
 
 
-  def decode(self, encoding, numTerms=10):
+  def encodeBatch(self, texts):
+    """
+    Encode a list of texts; see encode(). The texts the client cannot encode
+    are collected first, and the distinct tokens of those texts are fetched
+    once before the texts are sub-encoded from them.
+
+    @param  texts   (list)            Non-tokenized samples of text.
+    @return         (list)            An encode() result for each text.
+    """
+    encodings = [self._getTextBitmap(text) if text else None
+                 for text in texts]
+
+    failed = [i for i, text in enumerate(texts)
+              if text and encodings[i] is None]
+    tokens = dict((i, self._tokenize(texts[i])) for i in failed)
+    self.indexTerms(sorted(set(itertools.chain.from_iterable(
+      tokens.itervalues()))))
+    for i in failed:
+      encodings[i] = self._subEncoding(texts[i], tokens=tokens[i])
+
+    return encodings
+
+
+  def decode(self, encoding, numTerms=10, local=False):
     """
     Converts an SDR back into the most likely word or words.
 
@@ -91,63 +119,169 @@ class CioEncoder(LanguageEncoder):
     (term, weight) tuples, where higher weights imply the corresponding term
     better matches the encoding.
 
+    If local is True, only the terms the encoder has indexed (see
+    indexTerms()) are candidates: they are ranked by their overlap with the
+    encoding, and the weights are the numbers of overlapping bits. Otherwise
+    the API decodes the encoding.
+
     @param  encoding        (list)            Bitmap encoding.
     @param  numTerms        (int)             The max number of terms to return.
+    @param  local           (bool)            Decode with the local term index
+                                              instead of the API.
     @return                 (list)            List of dictionaries, where keys
                                               are terms and likelihood scores.
     """
-    terms = client.bitmapToTerms(encoding, numTerms=numTerms)
-    # Convert cortipy response to list of tuples (term, weight)
-    return [((term["term"], term["score"])) for term in terms]
+    return self.decodeBatch([encoding], numTerms=numTerms, local=local)[0]
+
 
+  def decodeBatch(self, encodings, numTerms=10, local=False):
+    """Decode a list of bitmap encodings; see decode()."""
+    if local:
+      instruments.increment("CioEncoder.localDecodes", len(encodings))
+      return self.termIndex.decodeBatch(encodings, numTerms)
 
-  def _subEncoding(self, text, method="df"):
+    decoded = []
+    for encoding in encodings:
+      instruments.increment("CioEncoder.decodeRequests")
+      terms = self.client.bitmapToTerms(encoding, numTerms=numTerms)
+      # Convert cortipy response to list of tuples (term, weight)
+      decoded.append([((term["term"], term["score"])) for term in terms])
+    return decoded
+
+
+  def indexTerms(self, terms):
     """
-    @param text             (str)             A non-tokenized sample of text.
-    @return encoding        (dict)            Fingerprint from cortipy client.
-                                              An empty dictionary of the text
-                                              could not be encoded.
+    Add the fingerprints of terms to the local decode index, fetching only the
+    terms not already indexed. Terms the API cannot encode are skipped.
     """
-    tokens = list(itertools.chain.from_iterable(
+    for term in terms:
+      if term not in self.termIndex and term not in self._unencodableTerms:
+        try:
+          self._getTermBitmap(term)
+        except UnsuccessfulEncodingError:
+          if self.verbosity > 0:
+            print ("\tThe client returned no encoding for the term \'{0}\'."
+                   .format(term))
+
+
+  def _getTextBitmap(self, text):
+    """Fetch the fingerprint info of a text, or None if the client has none."""
+    instruments.increment("CioEncoder.textRequests")
+    try:
+      return self.client.getTextBitmap(text)
+    except UnsuccessfulEncodingError:
+      instruments.increment("CioEncoder.fallbacks")
+      if self.verbosity > 0:
+        print ("\tThe client returned no encoding for the text \'{0}\', so "
+               "we'll use the encoding of the token that is least frequent in "
+               "the corpus.".format(text))
+      return None
+
+
+  def _tokenize(self, text):
+    """Split a text into the tokens the client finds in it."""
+    instruments.increment("CioEncoder.tokenizeRequests")
+    return list(itertools.chain.from_iterable(
       [t.split(',') for t in self.client.tokenize(text)]))
+
+
+  def _getTermBitmap(self, term):
+    """Fetch the fingerprint info of a term, and index its positions."""
+    instruments.increment("CioEncoder.termRequests")
     try:
-      if method == "df":
-        encoding = min([self.client.getBitmap(t) for t in tokens],
-                        key=lambda x: x["df"])
-      elif method == "keyword":
-        # Take a union of the bitmaps
-        counts = Counter()
-        for t in tokens:
-          bitmap = self.client.getBitmap(t)["fingerprint"]["positions"]
-          counts.update(bitmap)
-
-        # Sample to remain sparse
-        max_sparsity = int((self.targetSparsity / 100) * self.n)
-        w = min(len(counts), max_sparsity)
-        positions = [c[0] for c in counts.most_common(w)]
-
-        # Populate encoding
-        encoding = {
-            "text": text,
-            "sparsity": w * 100 / float(self.n),
-            "df": 0.0,
-            "height": self.h,
-            "width": self.w,
+      encoding = self.client.getBitmap(term)
+    except UnsuccessfulEncodingError:
+      self._unencodableTerms.add(term)
+      raise
+    self.termIndex.add(term,
+                       encoding["fingerprint"]["positions"],
+                       encoding.get("df", 0.0))
+    return encoding
+
+
+  def _getTermIds(self, terms):
+    """
+    Return the ids of the terms in the local index, fetching the fingerprint of
+    each term not yet indexed once.
+
+    @param terms            (list)            Term strings.
+    @return                 (numpy array)     Index id of each term.
+    """
+    missing = set(t for t in terms if t not in self.termIndex)
+    instruments.increment("CioEncoder.termCacheHits", len(terms) - len(missing))
+    if missing & self._unencodableTerms:
+      raise UnsuccessfulEncodingError(
+        "No encoding for the term(s) {0}.".format(
+          sorted(missing & self._unencodableTerms)))
+    for term in missing:
+      self._getTermBitmap(term)
+    ids = self.termIndex.ids
+    return numpy.array([ids[t] for t in terms], dtype=numpy.int64)
+
+
+  def _termEncoding(self, termId):
+    """Return the fingerprint info of an indexed term, in the cortipy format."""
+    positions = self.termIndex.take([termId])[0]
+    return {"term": self.termIndex.terms[termId],
+            "sparsity": len(positions) * 100 / float(self.n),
+            "df": self.termIndex.getDfs([termId])[0],
             "score": 0.0,
-            "fingerprint": {
-              "positions":sorted(positions)
-              },
-            "pos_types": []
-            }
-      else:
-        raise ValueError("method must be either \'df\' or \'keyword\'")
+            "fingerprint": {"positions": positions.tolist()},
+            "pos_types": []}
+
+
+  def _subEncoding(self, text, method="df", tokens=None):
+    """
+    Encode the text from the fingerprints of its tokens, for texts the client
+    cannot encode. The "df" method takes the fingerprint of the token that is
+    least frequent in the corpus, and the "keyword" method the most common bits
+    of the token fingerprints. Token fingerprints are fetched once and then
+    read from the local term index.
+
+    @param text             (str)             A non-tokenized sample of text.
+    @param tokens           (list)            The tokens of the text, if
+                                              already tokenized by _tokenize().
+    @return encoding        (dict)            Fingerprint from cortipy client.
+                                              None if the text could not be
+                                              encoded.
+    """
+    if method not in ("df", "keyword"):
+      raise ValueError("method must be either \'df\' or \'keyword\'")
+
+    if tokens is None:
+      tokens = self._tokenize(text)
+    try:
+      termIds = self._getTermIds(tokens)
     except UnsuccessfulEncodingError:
+      termIds = None
+    if termIds is None or not len(termIds):
       if self.verbosity > 0:
         print ("\tThe client returned no substitute encoding for the text "
                "\'{0}\', so we encode with None.".format(text))
-      encoding = None
+      return None
 
-    return encoding
+    if method == "df":
+      return self._termEncoding(
+        termIds[numpy.argmin(self.termIndex.getDfs(termIds))])
+
+    # Take a union of the bitmaps, keeping the most common bits to remain
+    # sparse.
+    positions, _ = self.termIndex.take(termIds)
+    counts = numpy.bincount(positions, minlength=self.n)
+    active = numpy.flatnonzero(counts)
+    maxSparsity = int((self.targetSparsity / 100) * self.n)
+    w = min(len(active), maxSparsity)
+    if w < len(active):
+      active = active[numpy.argpartition(-counts[active], w - 1)[:w]]
+
+    return {"text": text,
+            "sparsity": w * 100 / float(self.n),
+            "df": 0.0,
+            "height": self.h,
+            "width": self.w,
+            "score": 0.0,
+            "fingerprint": {"positions": sorted(active.tolist())},
+            "pos_types": []}
 
 
   def compare(self, encoding1, encoding2):
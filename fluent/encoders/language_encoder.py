@@ -35,6 +35,8 @@ class LanguageEncoder(object):
   - pprintHeader() prints a header describing the encoding to the terminal
   - pprint() prints an encoding to the terminal
   - decodedToStr() returns pretty print string of decoded SDR
+  - encodeBatch() encodes a list of texts, one encode() call per text unless
+    overridden
 
   Methods/properties that must be implemented by subclasses:
   - encode() returns a numpy array encoding the input
@@ -86,6 +88,14 @@ class LanguageEncoder(object):
     raise NotImplementedError()
 
 
+  def encodeBatch(self, texts):
+    """
+    Encode a list of texts, returning a list of encode() outputs. Subclasses
+    with a bulk encoding path should override this.
+    """
+    return [self.encode(text) for text in texts]
+
+
   def bitmapToSDR(self, bitmap):
     """Convert SDR encoding from bitmap to binary numpy array."""
     sdr = numpy.zeros(self.n)
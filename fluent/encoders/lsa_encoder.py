@@ -19,15 +19,16 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import collections
 import gensim
+import itertools
 import numpy
-import operator
 
 from fluent.encoders.language_encoder import LanguageEncoder
+from fluent.utils.instrumentation import instruments, timed
 
 
-TARGET_SPARSITY = 1.0
+TARGET_SPARSITY = 5.0
+TERMS_PER_TOPIC = 10
 exclusions = ('!', '.', ':', ',', '"', '\'', '\n', '?')
 
 
@@ -39,53 +40,135 @@ class LSAEncoder(LanguageEncoder):
   The associated script must be used to generate the tf-idf and LSA models that
   are used by the encoder. The encoder takes arbitrary text, converts it to the
   topic space via the models, and then creates an SDR. The SDR has a bit for
-  each topic. The top `w` topics are set to 1.
+  each topic. The top `w` topics with positive weight are set to 1.
+
+  The active topics of each distinct token sequence are cached, so repeated
+  texts skip the models; the cache holds at most cacheSize texts and starts
+  over when it is full.
   """
 
-  def __init__(self):
-    self.dictionary = gensim.corpora.Dictionary.load_from_text(
-        "wiki/wiki_en_wordids.txt")
+  def __init__(self,
+               dictionaryPath="wiki/wiki_en_wordids.txt",
+               tfidfModelPath="wiki/wiki_en.tfidf_model",
+               lsaModelPath="wiki/wiki_en_lsi.model",
+               w=None,
+               batchSize=4096,
+               cacheSize=2**16,
+               verbosity=0):
+    """
+    @param dictionaryPath   (str)   Gensim dictionary, in the text format of
+                                    Dictionary.save_as_text() if the path ends
+                                    in .txt or .txt.bz2, else saved with
+                                    Dictionary.save().
+    @param tfidfModelPath   (str)   Saved gensim TfidfModel.
+    @param lsaModelPath     (str)   Saved gensim LsiModel.
+    @param w                (int)   Number of active topics; defaults to
+                                    TARGET_SPARSITY percent of the topics.
+    @param batchSize        (int)   Max texts held in topic space at once by
+                                    encodeBatch().
+    @param cacheSize        (int)   Max number of texts in the topic cache.
+    """
+    if dictionaryPath.endswith((".txt", ".txt.bz2")):
+      self.dictionary = gensim.corpora.Dictionary.load_from_text(
+        dictionaryPath)
+    else:
+      self.dictionary = gensim.corpora.Dictionary.load(dictionaryPath)
     self.tfidf = gensim.models.TfidfModel.load(tfidfModelPath)
-    self.lsa = gensim.models.lsimodel.LsiModel.load(languageModelPath)
+    self.lsa = gensim.models.lsimodel.LsiModel.load(lsaModelPath)
 
     self.n = self.lsa.num_topics
-    if width:
+    if w:
       self.w = w
     else:
-      self.w = int(float(self.n) * 0.05)
+      self.w = max(1, int(self.n * TARGET_SPARSITY / 100))
+    self.batchSize = batchSize
+    self.cacheSize = cacheSize
+    self.verbosity = verbosity
+    self.description = [("LSA topics", 0)]
+
+    self._topicCache = {}
+    self._topicTerms = None
+
 
-  
   def _tokenize(self, text):
-    """Tokenize the text string into a list of strings."""
-    text = "".join([c for c in text if c not in exclusions])
-    return text.split(" ")
+    """Tokenize the text string into a list of lowercase strings."""
+    if isinstance(text, basestring):
+      text = "".join([c for c in text if c not in exclusions]).split()
+    return [token.lower() for token in text]
 
 
   def encode(self, text):
     """
     Encodes the input text into an SDR.
-    
+
     @param  text    (str, list)       If the input is type str, the encoder
                                       assumes it has not yet been tokenized. A
                                       list input will skip the tokenization
                                       step.
-    @return         (list)            SDR.
+    @return         (numpy array)     Binary SDR of length n; all zeros if no
+                                      token of the text is in the dictionary.
+    """
+    return self.encodeBatch([text])[0]
+
+
+  @timed
+  def encodeBatch(self, texts):
+    """
+    Encode a corpus of texts. The texts not in the cache are streamed through
+    the tf-idf and LSA models in chunks of batchSize, and the top w topics of
+    each are selected with a partial sort.
+
+    @param  texts   (iterable)        Texts, as str or token lists.
+    @return         (numpy array)     Binary SDRs of shape (number of texts, n).
     """
-    
-    """Converts a string into an SDR."""
-   if isinstance(text, str):
-     text = self._tokenize(text)
-
-    ## TODO: test tokenization logic for str and list inputs
-    bow = self.dictionary.doc2bow(text.lower().split())
-    tfidf = self.tfidf[bow]
-    weights = self.lsa[tfidf]
-    topWeights = sorted(weights, key=operator.itemgetter(1))[-self.w:]
-    activeIndices = [pair[0] for pair in topWeights]
-    encoded = numpy.zeros([self.n], dtype=numpy.bool)
-    encoded[activeIndices] = 1
+    keys = [tuple(self._tokenize(t)) for t in texts]
+    topics = {}
+    uncached = []
+    for key in set(keys):
+      cached = self._topicCache.get(key)
+      if cached is None:
+        uncached.append(key)
+      else:
+        topics[key] = cached
+    instruments.increment("LSAEncoder.cacheHits", len(keys) - len(uncached))
+
+    start = 0
+    while start < len(uncached):
+      chunk = uncached[start:start + self.batchSize]
+      topics.update(itertools.izip(chunk, self._activeTopics(chunk)))
+      start += len(chunk)
+    self._cacheTopics((key, topics[key]) for key in uncached)
+
+    encoded = numpy.zeros((len(keys), self.n), dtype=numpy.bool)
+    for i, key in enumerate(keys):
+      encoded[i, topics[key]] = 1
     return encoded
-      
+
+
+  def _cacheTopics(self, items):
+    """Add (key, topics) items to the cache, emptying it first if full."""
+    items = list(itertools.islice(items, self.cacheSize))
+    if len(self._topicCache) + len(items) > self.cacheSize:
+      self._topicCache = {}
+    self._topicCache.update(items)
+
+
+  def _activeTopics(self, tokenLists):
+    """
+    Return an array of the top w topics of each token list, leaving out the
+    topics without positive weight.
+    """
+    bows = (self.dictionary.doc2bow(tokens) for tokens in tokenLists)
+    weights = gensim.matutils.corpus2dense(self.lsa[self.tfidf[bows]],
+                                           num_terms=self.n,
+                                           num_docs=len(tokenLists)).T
+
+    w = min(self.w, self.n)
+    top = numpy.argpartition(-weights, w - 1, axis=1)[:, :w]
+    # Fewer than w topics may have positive weight, e.g. none for a text
+    # without any dictionary tokens.
+    return [t[row[t] > 0] for t, row in itertools.izip(top, weights)]
+
 
   def decode(self, encoding, numTerms=None):
     """Converts an SDR back into the most likely word or words.
@@ -94,26 +177,78 @@ class LSAEncoder(LanguageEncoder):
     specified then it determines how many terms will be returned and the
     return value will be a sequence of (term, weight) tuples where the
     higher the weight, the more the term matches the encoding.
+
+    The weight of a term is the sum of its weights in the active topics, over
+    the TERMS_PER_TOPIC strongest terms of each topic (as LsiModel.show_topic()
+    lists them).
     """
-    potentialTerms = collections.defaultdict(float)
-    for topicNum in xrange(self.lsa.num_topics):
-      if encoding[topicNum] == 1:
-        for weight, term in self.lsa.show_topic(topicNum):
-          potentialTerms[term] += weight
-
-    # Temporary variable for how many terms to get
-    n = numTerms if numTerms is not None else 1
-    topTerms = sorted(potentialTerms.items(),
-                      key=operator.itemgetter(1),
-                      reverse=True)[:n]
+    topTerms = self.decodeBatch([encoding],
+                                numTerms if numTerms is not None else 1)[0]
     # If numTerms is not specified, return just the most likely term, otherwise
     # return the top numTerms terms with weights.
     if numTerms is None:
-      return topTerms[0][0]
+      return topTerms[0][0] if topTerms else None
     else:
       return topTerms
 
 
+  @timed
+  def decodeBatch(self, encodings, numTerms=10):
+    """
+    Decode a batch of SDRs with one product against the topic-term matrix.
+
+    @param  encodings (array-like)    Binary SDRs, of shape (number of SDRs, n).
+    @param  numTerms  (int)           Max number of terms per SDR.
+    @return           (list)          For each SDR, a list of (term, weight)
+                                      tuples, highest weight first.
+    """
+    topicTermWeights, topicTermIds, terms = self._getTopicTerms()
+    active = numpy.asarray(encodings).reshape(-1, self.n) != 0
+    scores = active.astype(numpy.float32).dot(topicTermWeights)
+
+    decoded = []
+    for activeTopics, termScores in itertools.izip(active, scores):
+      # Only the listed terms of the active topics are candidates.
+      candidates = numpy.unique(topicTermIds[activeTopics])
+      candidateScores = termScores[candidates]
+      k = min(numTerms, len(candidates))
+      if k < len(candidates):
+        top = numpy.argpartition(-candidateScores, k - 1)[:k]
+      else:
+        top = numpy.arange(len(candidates))
+      top = top[numpy.argsort(-candidateScores[top], kind="mergesort")]
+      decoded.append([(terms[candidates[i]], float(candidateScores[i]))
+                      for i in top])
+    return decoded
+
+
+  def _getTopicTerms(self):
+    """
+    Return the (topics, terms) matrix of the normalized weight of the top
+    TERMS_PER_TOPIC terms of each topic (zero elsewhere), the (topics,
+    TERMS_PER_TOPIC) term ids of those entries, and the term strings by id;
+    computed once per loaded model.
+    """
+    if self._topicTerms is None:
+      topicWeights = numpy.asarray(self.lsa.projection.u, dtype=numpy.float64).T
+      topicWeights = topicWeights / numpy.sqrt(
+        (topicWeights ** 2).sum(axis=1))[:, numpy.newaxis]
+      numTopics, numTerms = topicWeights.shape
+
+      perTopic = min(TERMS_PER_TOPIC, numTerms)
+      topicTermIds = numpy.argpartition(-numpy.abs(topicWeights),
+                                        perTopic - 1, axis=1)[:, :perTopic]
+      rows = numpy.arange(numTopics)[:, numpy.newaxis]
+      topicTermWeights = numpy.zeros((numTopics, numTerms),
+                                     dtype=numpy.float32)
+      topicTermWeights[rows, topicTermIds] = topicWeights[rows, topicTermIds]
+
+      terms = numpy.array([self.lsa.id2word[i] for i in xrange(numTerms)],
+                          dtype=object)
+      self._topicTerms = (topicTermWeights, topicTermIds, terms)
+    return self._topicTerms
+
+
   def getWidth(self):
     return self.w
 
@@ -0,0 +1,91 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import numpy
+import re
+
+from fluent.encoders.language_encoder import LanguageEncoder
+from fluent.utils.random_sdr import RandomSDRGenerator
+
+
+
+class StubEncoder(LanguageEncoder):
+  """
+  An offline stand-in for CioEncoder, for tests and benchmarks that must run
+  without network access or an API key.
+
+  Each token gets a deterministic random fingerprint, and a text is encoded as
+  the most frequent bits in the union of its token fingerprints, trimmed to the
+  target sparsity. The encode() return value has the same format as the
+  cortipy client responses that CioEncoder returns.
+  """
+
+  def __init__(self, w=128, h=128, targetSparsity=5.0, verbosity=0):
+    self.targetSparsity = targetSparsity
+    self.w              = w
+    self.h              = h
+    self.n              = w*h
+    self.verbosity      = verbosity
+
+    self.generator = RandomSDRGenerator(
+      self.n, int((self.targetSparsity / 100) * self.n))
+
+
+  def encode(self, text):
+    """
+    @param  text    (str)             A non-tokenized sample of text.
+    @return         (dict)            Fingerprint info in the cortipy format;
+                                      the bitmap is at
+                                      encoding["fingerprint"]["positions"].
+    """
+    tokens = re.findall("[a-z$]+", text.lower()) if text else []
+    if not tokens:
+      return None
+
+    counts = numpy.bincount(self.generator.encodeBatch(tokens).ravel(),
+                            minlength=self.n)
+    active = numpy.flatnonzero(counts)
+
+    # The most common bits; ties go to the lower positions.
+    w = min(len(active), self.generator.w)
+    mostCommon = active[numpy.argsort(-counts[active], kind="mergesort")[:w]]
+    positions = sorted(mostCommon.tolist())
+
+    return {"text": text,
+            "sparsity": w * 100 / float(self.n),
+            "df": 0.0,
+            "height": self.h,
+            "width": self.w,
+            "score": 0.0,
+            "fingerprint": {"positions": positions},
+            "pos_types": []}
+
+
+  def decode(self, encoding, numTerms=10):
+    raise NotImplementedError("StubEncoder cannot decode fingerprints.")
+
+
+  def getWidth(self):
+    return self.w
+
+
+  def getHeight(self):
+    return self.h
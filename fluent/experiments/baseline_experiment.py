@@ -44,14 +44,16 @@ Please note the following definitions:
 
 import argparse
 import collections
-import cPickle as pkl
 import itertools
 import numpy
 import os
 import time
 
 from fluent.utils.csv_helper import readCSV
-from fluent.utils.data_split import KFolds
+from fluent.utils.data_split import KFolds, MultilabelStratifiedKFolds
+from fluent.utils.instrumentation import instruments
+from fluent.utils.label_vocabulary import LabelVocabulary
+from fluent.utils.profiling import PhaseProfiler
 from fluent.utils.text_preprocess import TextPreprocess
 
 
@@ -127,39 +129,36 @@ def computeExpectedAccuracy(predictedLabels, dataPath):
   print "Accuracy against expected classifications = ", accuracy
 
 
-def setupData(args):
+def setupData(args, vocabularyPath):
   """ Performs data preprocessing and setup given the user-specified args.
 
-  @param args       (Namespace)     User-provided arguments via the cmd line.
-  @return           (tuple)         Tuple where first entry is a list of the
-      samples, the second is the list of gold labels per example, the third is
-      the list of all possible labels, and the fourth is the labels per example
-      in the data.
+  @param args           (Namespace)     User-provided arguments via the cmd
+                                        line.
+  @param vocabularyPath (str)           Saved label vocabulary, loaded if
+                                        args.load is set.
+  @return               (tuple)         Tuple where first entry is a list of
+      the (tokens, label ids) samples, and the second is the LabelVocabulary of
+      all possible labels.
   """
   dataDict = readCSV(args.dataPath, 2, args.numLabels)
 
-  # Collect each possible label string into a list, where the indices will be
-  # their references throughout the experiment.
-  labelReference = list(set(
-      itertools.chain.from_iterable(dataDict.values())))
+  # Map each possible label string to an int, where the ints will be their
+  # references throughout the experiment. A loaded model keeps its label ids.
+  if args.load and os.path.isfile(vocabularyPath):
+    labelVocabulary = LabelVocabulary.load(vocabularyPath)
+    labelVocabulary.update(dataDict.itervalues())
+  else:
+    labelVocabulary = LabelVocabulary.fromLabels(dataDict.itervalues())
 
-  for sample, labels in dataDict.iteritems():
-    dataDict[sample] = numpy.array([labelReference.index(label)
-                                    for label in labels],
-                                    dtype="int8")
+  labels, offsets = labelVocabulary.encodeMany(dataDict.values())
+  for i, sample in enumerate(dataDict.keys()):
+    dataDict[sample] = labels[offsets[i]:offsets[i+1]]
 
   texter = TextPreprocess()
-  if args.textPreprocess:
-    samples = [(texter.tokenize(sample,
-                                ignoreCommon=100,
-                                removeStrings=["[identifier deleted]"],
-                                correctSpell=True),
-               labels) for sample, labels in dataDict.iteritems()]
-  else:
-    samples = [(texter.tokenize(sample), labels)
-               for sample, labels in dataDict.iteritems()]
+  samples = [(texter.tokenizeSample(sample, args.textPreprocess), labels)
+             for sample, labels in dataDict.iteritems()]
 
-  return samples, labelReference
+  return samples, labelVocabulary
 
 
 def run(args):
@@ -171,6 +170,9 @@ def run(args):
   """
   start = time.time()
 
+  if args.instrument:
+    instruments.enable()
+
   # Setup directories.
   root = os.path.dirname(__file__)
   modelPath = os.path.abspath(
@@ -187,26 +189,30 @@ def run(args):
     raise ValueError("Experiment runs either k-folds CV or training/testing, "
                      "not both.")
 
-  # Load or init model.
+  # Init model, and load its saved state if specified.
+  try:
+    module = __import__(args.modelModuleName, {}, {}, args.modelName)
+    modelClass = getattr(module, args.modelName)
+    model = modelClass(verbosity=args.verbosity,
+                       numLabels=args.numLabels)
+  except ImportError:
+    raise RuntimeError("Could not find model class \'%s\' to import."
+                       % args.modelName)
   if args.load:
-    with open(
-      os.path.join(modelPath, "model.pkl"), "rb") as f:
-      model = pkl.load(f)
+    model.load(modelPath)
     print "Model loaded from \'{0}\'.".format(modelPath)
-  else:
-    try:
-      module = __import__(args.modelModuleName, {}, {}, args.modelName)
-      modelClass = getattr(module, args.modelName)
-      model = modelClass(verbosity=args.verbosity,
-                         numLabels=args.numLabels)
-    except ImportError:
-      raise RuntimeError("Could not find model class \'%s\' to import."
-                         % args.modelName)
+
+  profiler = PhaseProfiler(os.path.join(modelPath, "profile"),
+                           mode=args.profile,
+                           topN=args.profileTopN)
 
   print "Reading in data and preprocessing."
   preprocessTime = time.time()
 
-  samples, labelReference = setupData(args)
+  with instruments.timer("baseline.setupData"), profiler.phase("setupData"):
+    vocabularyPath = os.path.join(modelPath, "labels.json")
+    samples, labelVocabulary = setupData(args, vocabularyPath)
+    labelReference = labelVocabulary.labels
 
   print("Preprocessing complete; elapsed time is {0:.2f} seconds.".
         format(time.time() - preprocessTime))
@@ -215,10 +221,11 @@ def run(args):
 
   print "Encoding the data."
   encodeTime = time.time()
-  patterns = [(model.encodePattern(s[0]), s[1]) for s in samples]
-  patterns = [{"pattern": model.encodePattern(s[0]),
-              "labels": s[1]}
-              for s in samples]
+  with instruments.timer("baseline.encode"), profiler.phase("encodeSamples"):
+    encodings = model.encodeBatch([s[0] for s in samples])
+    patterns = [{"pattern": encodings[i],
+                "labels": s[1]}
+                for i, s in enumerate(samples)]
 
   print("Done encoding; elapsed time is {0:.2f} seconds.".
         format(time.time() - encodeTime))
@@ -226,13 +233,16 @@ def run(args):
 
   # Either we train on all the data, test on all the data, or run k-fold CV.
   if args.train:
-    training(model, patterns)
+    with profiler.phase("training"):
+      training(model, patterns)
 
   if args.test:
-    results = testing(model, patterns)
-    resultMetrics = calculateResults(
-      model, results, labelReference, xrange(len(samples)),
-      os.path.join(modelPath, "test_results.csv"))
+    with profiler.phase("testing"):
+      results = testing(model, patterns)
+    with profiler.phase("calculateResults"):
+      resultMetrics = calculateResults(
+        model, results, labelReference, xrange(len(samples)),
+        os.path.join(modelPath, "test_results.csv"))
     print resultMetrics
     if model.plot:
       model.plotConfusionMatrix(resultMetrics[1])
@@ -240,13 +250,23 @@ def run(args):
   elif args.kFolds > 1:
     # Run k-folds cross validation -- train the model on a subset, and evaluate
     # on the remaining subset.
-    partitions = KFolds(args.kFolds).split(range(len(samples)), randomize=True)
+    if args.stratified:
+      # Keep the proportion of each label about the same in every fold.
+      labelOffsets = numpy.cumsum([0] + [len(s[1]) for s in samples])
+      labels = numpy.concatenate([s[1] for s in samples])
+      partitions = MultilabelStratifiedKFolds(args.kFolds).splitIndices(
+        labels, labelOffsets, randomize=True)
+    else:
+      partitions = KFolds(args.kFolds).splitIndices(len(samples),
+                                                    randomize=True)
     intermResults = []
     predictions = []
-    for k in xrange(args.kFolds):
+    for k, partition in enumerate(partitions):
       print "Training and testing for CV fold {0}.".format(k)
       kTime = time.time()
-      trialResults = runExperiment(model, patterns, partitions[k])
+      with instruments.timer("baseline.fold"), profiler.phase(
+          "runExperiment_fold{0}".format(k)):
+        trialResults = runExperiment(model, patterns, partition)
       print("Fold complete; elapsed time is {0:.2f} seconds.".format(
             time.time() - kTime))
 
@@ -258,11 +278,12 @@ def run(args):
 
       print "Calculating intermediate results for this fold. Writing to CSV."
       intermResults.append(calculateResults(
-        model, trialResults, labelReference, partitions[k][1],
+        model, trialResults, labelReference, partition[1],
         os.path.join(modelPath, "evaluation_fold_" + str(k) + ".csv")))
 
     print "Calculating cumulative results for {0} trials.".format(args.kFolds)
-    results = model.evaluateCumulativeResults(intermResults)
+    with profiler.phase("calculateResults"):
+      results = model.evaluateCumulativeResults(intermResults)
 
     # TODO: csv writing broken until ClassificationModel confusion matrix is fixed
     # results["total_cm"].to_csv(os.path.join(modelPath, "evaluation_totals.csv"))
@@ -275,11 +296,18 @@ def run(args):
   # print model.classifyRandomly(labels)
 
   print "Saving model to \'{0}\' directory.".format(modelPath)
-  with open(
-    os.path.join(modelPath, "model.pkl"), "wb") as f:
-    pkl.dump(model, f)
+  model.save(modelPath)
+  labelVocabulary.save(vocabularyPath)
   print "Experiment complete in {0:.2f} seconds.".format(time.time() - start)
 
+  if args.instrument:
+    instrumentationPath = os.path.join(modelPath, "instrumentation.json")
+    instruments.writeJSON(instrumentationPath)
+    print "Instrumentation written to \'{0}\'.".format(instrumentationPath)
+
+  if profiler.writeSummary():
+    print "Profiles written to \'{0}\'.".format(profiler.outputDir)
+
 
 if __name__ == "__main__":
 
@@ -296,6 +324,10 @@ if __name__ == "__main__":
                       type=int,
                       help="Number of folds for cross validation; k=1 will "
                       "run no cross-validation.")
+  parser.add_argument("--stratified",
+                      default=False,
+                      action="store_true",
+                      help="Stratify the cross validation folds by label.")
   parser.add_argument("--expName",
                       default="survey_response_sample",
                       type=str,
@@ -304,7 +336,7 @@ if __name__ == "__main__":
                       default="ClassificationModelRandomSDR",
                       type=str,
                       help="Name of model class. Also used for model results "
-                      "directory and pickle checkpoint.")
+                      "directory and saved model.")
   parser.add_argument("--modelModuleName",
                       default="fluent.models.classify_random_sdr",
                       type=str,
@@ -329,6 +361,22 @@ if __name__ == "__main__":
   parser.add_argument("--resultsDir",
                       default="results",
                       help="This will hold the evaluation results.")
+  parser.add_argument("--instrument",
+                      default=False,
+                      action="store_true",
+                      help="Record per-stage timers and counters, written to "
+                           "instrumentation.json in the model directory.")
+  parser.add_argument("--profile",
+                      default=None,
+                      choices=PhaseProfiler.modes,
+                      help="Profile each experiment phase with cProfile, or "
+                           "with a low-overhead stack sampler; profiles and a "
+                           "summary are written to the model directory.")
+  parser.add_argument("--profileTopN",
+                      default=25,
+                      type=int,
+                      help="Number of functions per phase in the profile "
+                           "summary.")
   parser.add_argument("--verbosity",
                       default=1,
                       type=int,
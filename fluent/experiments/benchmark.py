@@ -0,0 +1,319 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Benchmarks for the stages of the classification experiments, run on a
+synthetic corpus so no data files or network access are needed.
+
+EXAMPLE: from the fluent directory, run...
+  python experiments/benchmark.py --numSamples 2000 --output baseline.json
+
+and later compare against the saved baseline...
+  python experiments/benchmark.py --numSamples 2000 --baseline baseline.json
+
+The stages are:
+  - tokenize, and tokenizeCorrectSpell: TextPreprocess.tokenize()
+  - <model>/encode: encodePattern() for each sample; the Cortical.io models use
+    the offline StubEncoder
+  - <model>/train and <model>/test: trainModel() and testModel()
+  - <model>/evaluate: calculateAccuracy() and evaluateResults()
+For each stage the throughput and the process's peak resident memory are
+written to the JSON output.
+"""
+
+import argparse
+import numpy
+import os
+import platform
+import random
+import time
+
+from fluent.encoders.stub_encoder import StubEncoder
+from fluent.utils.profiling import peakMemoryKB
+from fluent.utils.text_preprocess import TextPreprocess
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+MODELS = {
+  "RandomSDR": ("fluent.models.classify_random_sdr",
+                "ClassificationModelRandomSDR"),
+  "Fingerprint": ("fluent.models.classify_fingerprint",
+                  "ClassificationModelFingerprint"),
+}
+
+DATA_DIR = os.path.abspath(os.path.join(
+  os.path.dirname(__file__), "../..", "data/etc"))
+
+
+
+def loadVocabulary(vocabSize):
+  """
+  Return vocabSize words, most frequent first. Words come from the word
+  frequency list in data/etc, padded with random strings if needed.
+  """
+  words = []
+  path = os.path.join(DATA_DIR, "word_frequencies.txt")
+  if os.path.isfile(path):
+    with open(path) as f:
+      next(f, None)
+      words = [line.split()[1].lower() for line in f if len(line.split()) > 1]
+      words = [w for w in words if w.isalpha()]
+
+  rng = random.Random(0)
+  while len(words) < vocabSize:
+    words.append("".join(rng.choice(TextPreprocess.alphabet)
+                         for _ in xrange(rng.randint(3, 10))))
+
+  return words[:vocabSize]
+
+
+def generateCorpus(numSamples, vocabSize, meanLength, numCategories,
+                   typoRate, seed):
+  """
+  Generate a synthetic labeled corpus. Tokens are drawn from a Zipfian
+  distribution over the vocabulary, a typoRate fraction of them get one random
+  character substitution, and each sample has one to three categories.
+
+  @return           (list)        Tuples of the sample text and a numpy array
+                                  of its category indices.
+  """
+  rng = numpy.random.RandomState(seed)
+  vocabulary = numpy.array(loadVocabulary(vocabSize), dtype=object)
+  weights = 1.0 / numpy.arange(1, vocabSize + 1)
+  weights /= weights.sum()
+
+  corpus = []
+  for _ in xrange(numSamples):
+    length = max(1, rng.poisson(meanLength))
+    tokens = vocabulary[rng.choice(vocabSize, length, p=weights)].tolist()
+    for i in numpy.where(rng.rand(length) < typoRate)[0]:
+      word = tokens[i]
+      j = rng.randint(len(word))
+      tokens[i] = (word[:j] + TextPreprocess.alphabet[rng.randint(26)] +
+                   word[j+1:])
+    labels = rng.choice(numCategories, rng.randint(1, 4), replace=False)
+    corpus.append((" ".join(tokens), labels))
+
+  return corpus
+
+
+def timeStage(results, name, numItems, fn):
+  """Run fn(), record the stage metrics in results, and return fn's output."""
+  memoryBefore = peakMemoryKB()
+  start = time.time()
+  output = fn()
+  seconds = time.time() - start
+
+  results[name] = {"items": numItems,
+                   "seconds": seconds,
+                   "itemsPerSecond": numItems / seconds if seconds else None,
+                   "peakMemoryKB": peakMemoryKB(),
+                   "peakMemoryGrowthKB": peakMemoryKB() - memoryBefore}
+  print "{0:<30}{1:>10} items{2:>10.3f} s{3:>14.1f} items/s".format(
+    name, numItems, seconds, results[name]["itemsPerSecond"] or 0.0)
+
+  return output
+
+
+def benchmarkModel(results, name, corpusTokens, trainSize):
+  """Run the encode, train, test, and evaluate stages for one model."""
+  moduleName, className = MODELS[name]
+  try:
+    module = __import__(moduleName, {}, {}, className)
+  except ImportError as e:
+    print "Skipping {0}: {1}".format(name, e)
+    return
+  modelClass = getattr(module, className)
+
+  if name == "Fingerprint":
+    model = modelClass(verbosity=0, encoder=StubEncoder())
+  else:
+    model = modelClass(verbosity=0)
+
+  patterns = timeStage(
+    results, name + "/encode", len(corpusTokens),
+    lambda: [{"pattern": model.encodePattern(tokens), "labels": labels}
+             for tokens, labels in corpusTokens])
+
+  trainSet = patterns[:trainSize]
+  testSet = patterns[trainSize:]
+
+  def train():
+    for p in trainSet:
+      model.trainModel(p["pattern"], p["labels"])
+  timeStage(results, name + "/train", len(trainSet), train)
+
+  classifications = timeStage(
+    results, name + "/test", len(testSet),
+    lambda: ([model.testModel(p["pattern"]) for p in testSet],
+             [p["labels"] for p in testSet]))
+
+  def evaluate():
+    model.calculateAccuracy(classifications)
+    model.evaluateResults(classifications, [], range(len(testSet)))
+  timeStage(results, name + "/evaluate", len(testSet), evaluate)
+
+
+def compareToBaseline(results, baselinePath, tolerance):
+  """
+  Print the throughput of each stage relative to a saved baseline.
+
+  @return           (list)        Names of stages slower than the baseline by
+                                  more than the tolerance fraction.
+  """
+  with open(baselinePath) as f:
+    baseline = json.load(f)["stages"]
+
+  regressions = []
+  print "\n{0:<30}{1:>16}{2:>16}{3:>10}".format(
+    "Stage", "Baseline items/s", "Current items/s", "Ratio")
+  for name in sorted(results):
+    if name not in baseline:
+      continue
+    old = baseline[name]["itemsPerSecond"]
+    new = results[name]["itemsPerSecond"]
+    if not old or not new:
+      continue
+    ratio = new / old
+    flag = ""
+    if ratio < 1.0 - tolerance:
+      regressions.append(name)
+      flag = "  REGRESSION"
+    print "{0:<30}{1:>16.1f}{2:>16.1f}{3:>10.2f}{4}".format(
+      name, old, new, ratio, flag)
+
+  return regressions
+
+
+def run(args):
+  config = vars(args).copy()
+  print "Generating a synthetic corpus of {0} samples.".format(args.numSamples)
+  corpus = generateCorpus(args.numSamples, args.vocabSize, args.meanLength,
+                          args.numCategories, args.typoRate, args.seed)
+
+  results = {}
+  texter = TextPreprocess()
+  corpusTokens = timeStage(
+    results, "tokenize", len(corpus),
+    lambda: [(texter.tokenize(text), labels) for text, labels in corpus])
+
+  if not args.noCorrectSpell:
+    spellCorpus = args.spellCorpus
+    if not os.path.isfile(os.path.join(DATA_DIR, spellCorpus)):
+      spellCorpus = "childrens_stories.txt"
+      print ("Spelling corpus \'{0}\' not found in data/etc; using \'{1}\'."
+             .format(args.spellCorpus, spellCorpus))
+    config["spellCorpus"] = spellCorpus
+    speller = TextPreprocess(corpusTxt=spellCorpus)
+    # Load the spelling corpus outside of the timed stage.
+    speller.correct("the")
+    numSpellSamples = min(len(corpus), args.maxSpellSamples)
+    timeStage(results, "tokenizeCorrectSpell", numSpellSamples,
+              lambda: [speller.tokenize(text, correctSpell=True)
+                       for text, _ in corpus[:numSpellSamples]])
+
+  trainSize = int(args.trainPortion * len(corpusTokens))
+  for name in args.models:
+    benchmarkModel(results, name, corpusTokens, trainSize)
+
+  output = {"config": config,
+            "environment": {"python": platform.python_version(),
+                            "numpy": numpy.__version__,
+                            "platform": platform.platform()},
+            "stages": results}
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(output, f, indent=1, sort_keys=True)
+    print "\nBenchmark results written to \'{0}\'.".format(args.output)
+
+  if args.baseline:
+    regressions = compareToBaseline(results, args.baseline, args.tolerance)
+    if regressions:
+      print "\nRegressions in: {0}".format(", ".join(regressions))
+
+  return output
+
+
+if __name__ == "__main__":
+
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--numSamples",
+                      default=1000,
+                      type=int,
+                      help="Number of synthetic samples.")
+  parser.add_argument("--vocabSize",
+                      default=1000,
+                      type=int,
+                      help="Number of distinct words in the corpus.")
+  parser.add_argument("--meanLength",
+                      default=20,
+                      type=int,
+                      help="Mean number of tokens per sample.")
+  parser.add_argument("--numCategories",
+                      default=10,
+                      type=int,
+                      help="Number of classification categories.")
+  parser.add_argument("--typoRate",
+                      default=0.05,
+                      type=float,
+                      help="Fraction of tokens with a misspelling.")
+  parser.add_argument("--trainPortion",
+                      default=0.8,
+                      type=float,
+                      help="Fraction of the samples used for training.")
+  parser.add_argument("--models",
+                      default=sorted(MODELS.keys()),
+                      nargs="+",
+                      choices=sorted(MODELS.keys()),
+                      help="Models to benchmark.")
+  parser.add_argument("--noCorrectSpell",
+                      default=False,
+                      action="store_true",
+                      help="Skip the spelling correction stage.")
+  parser.add_argument("--spellCorpus",
+                      default="compilation.txt",
+                      help="Corpus file in data/etc for spelling correction.")
+  parser.add_argument("--maxSpellSamples",
+                      default=200,
+                      type=int,
+                      help="Max samples for the (slow) spelling correction "
+                           "stage.")
+  parser.add_argument("--seed",
+                      default=42,
+                      type=int,
+                      help="Random seed for the synthetic corpus.")
+  parser.add_argument("--output",
+                      default="",
+                      help="Path to write the JSON results.")
+  parser.add_argument("--baseline",
+                      default="",
+                      help="Path of previous JSON results to compare with.")
+  parser.add_argument("--tolerance",
+                      default=0.2,
+                      type=float,
+                      help="Slowdown fraction reported as a regression.")
+
+  args = parser.parse_args()
+  run(args)
@@ -31,7 +31,9 @@ import pprint
 import time
 
 from fluent.experiments.runner import Runner
+from fluent.utils.instrumentation import instruments
 from fluent.utils.plotting import PlotNLP
+from fluent.utils.profiling import PhaseProfiler
 
 
 def checkInputs(args):
@@ -52,6 +54,9 @@ def checkInputs(args):
 def run(args):
   start = time.time()
 
+  if args.instrument:
+    instruments.enable()
+
   root = os.path.dirname(os.path.realpath(__file__))
   resultsDir = os.path.join(root, args.resultsDir)
 
@@ -65,32 +70,54 @@ def run(args):
                   plots=args.plots,
                   orderedSplit=args.orderedSplit,
                   trainSize=args.trainSize,
-                  verbosity=args.verbosity)
+                  verbosity=args.verbosity,
+                  plotBackend=args.plotBackend,
+                  resume=args.resume)
+
+  try:
+    runner.initModel()
+
+    profiler = PhaseProfiler(os.path.join(runner.modelPath, "profile"),
+                             mode=args.profile,
+                             topN=args.profileTopN)
 
-  runner.initModel()
+    print "Reading in data and preprocessing."
+    dataTime = time.time()
+    with profiler.phase("setupData"):
+      runner.setupData()
+    print ("Data setup complete; elapsed time is {0:.2f} seconds.\nNow "
+           "encoding the data".format(time.time() - dataTime))
 
-  print "Reading in data and preprocessing."
-  dataTime = time.time()
-  runner.setupData()
-  print ("Data setup complete; elapsed time is {0:.2f} seconds.\nNow encoding "
-        "the data".format(time.time() - dataTime))
+    encodeTime = time.time()
+    with profiler.phase("encodeSamples"):
+      runner.encodeSamples()
+    print ("Encoding complete; elapsed time is {0:.2f} seconds.\nNow running "
+           "the experiment.".format(time.time() - encodeTime))
 
-  encodeTime = time.time()
-  runner.encodeSamples()
-  print ("Encoding complete; elapsed time is {0:.2f} seconds.\nNow running the "
-         "experiment.".format(time.time() - encodeTime))
+    with profiler.phase("runExperiment"):
+      runner.runExperiment()
 
-  runner.runExperiment()
+    with profiler.phase("calculateResults"):
+      runner.calculateResults()
 
-  runner.calculateResults()
+    runner.save()
 
-  runner.save()
+    print "Experiment complete in {0:.2f} seconds.".format(time.time() - start)
 
-  print "Experiment complete in {0:.2f} seconds.".format(time.time() - start)
+    if args.instrument:
+      instrumentationPath = os.path.join(runner.modelPath,
+                                         "instrumentation.json")
+      instruments.writeJSON(instrumentationPath)
+      print "Instrumentation written to \'{0}\'.".format(instrumentationPath)
 
-  if args.validation:
-    print "Validating experiment against expected classifications..."
-    print runner.validateExperiment(args.validation)
+    if profiler.writeSummary():
+      print "Profiles written to \'{0}\'.".format(profiler.outputDir)
+
+    if args.validation:
+      print "Validating experiment against expected classifications..."
+      print runner.validateExperiment(args.validation)
+  finally:
+    runner.close()
 
 
 if __name__ == "__main__":
@@ -107,7 +134,7 @@ if __name__ == "__main__":
                       default="ClassificationModelRandomSDR",
                       type=str,
                       help="Name of model class. Also used for model results "
-                           "directory and pickle checkpoint.")
+                           "directory and saved model.")
   parser.add_argument("-mm", "--modelModuleName",
                       default="fluent.models.classify_random_sdr",
                       type=str,
@@ -127,6 +154,18 @@ if __name__ == "__main__":
                       type=int,
                       help="0 for no evaluation plots, 1 for classification "
                            "accuracy plots, 2 includes the confusion matrix.")
+  parser.add_argument("--plotBackend",
+                      default="offline",
+                      choices=PlotNLP.backends,
+                      help="\'offline\' writes the plots as HTML files to the "
+                           "model directory; \'online\' uploads them to "
+                           "Plotly, which needs PLOTLY_API_KEY and "
+                           "PLOTLY_USERNAME.")
+  parser.add_argument("--resume",
+                      default=False,
+                      action="store_true",
+                      help="Skip the trials whose results were stored by an "
+                           "interrupted run of the same experiment.")
   parser.add_argument("--orderedSplit",
                       default=False,
                       action="store_true",
@@ -150,6 +189,22 @@ if __name__ == "__main__":
   parser.add_argument("--validation",
                       default="",
                       help="Path to file of expected classifications.")
+  parser.add_argument("--instrument",
+                      default=False,
+                      action="store_true",
+                      help="Record per-stage timers and counters, written to "
+                           "instrumentation.json in the model directory.")
+  parser.add_argument("--profile",
+                      default=None,
+                      choices=PhaseProfiler.modes,
+                      help="Profile each experiment phase with cProfile, or "
+                           "with a low-overhead stack sampler; profiles and a "
+                           "summary are written to the model directory.")
+  parser.add_argument("--profileTopN",
+                      default=25,
+                      type=int,
+                      help="Number of functions per phase in the profile "
+                           "summary.")
   parser.add_argument("--skipConfirmation",
                       help="If specified will skip the user confirmation step",
                       default=False,
@@ -20,15 +20,16 @@
 # ----------------------------------------------------------------------
 
 import collections
-import cPickle as pkl
-import itertools
 import numpy
 import os
-import random
 
-from collections import defaultdict
 from fluent.utils.csv_helper import readCSV
+from fluent.utils.data_split import partitionIndices
+from fluent.utils.instrumentation import instruments, timed
+from fluent.utils.label_vocabulary import LabelVocabulary
+from fluent.utils.pattern_store import PatternStore, PatternStoreWriter
 from fluent.utils.plotting import PlotNLP
+from fluent.utils.result_store import ResultStore
 
 from fluent.utils.text_preprocess import TextPreprocess
 
@@ -51,7 +52,9 @@ class Runner(object):
                plots,
                orderedSplit,
                trainSize,
-               verbosity):
+               verbosity,
+               plotBackend="offline",
+               resume=False):
     """
     @param dataPath         (str)     Path to raw data file for the experiment.
     @param resultsDir       (str)     Directory where for the results metrics.
@@ -66,6 +69,13 @@ class Runner(object):
                                       samples; False is random, True is ordered.
     @param trainSize        (str)     Number of samples to use in training.
     @param verbosity        (int)     Greater value prints out more progress.
+    @param plotBackend      (str)     "offline" writes the plots as HTML files
+                                      to the model directory in the
+                                      background; "online" uploads them to
+                                      Plotly, which needs API credentials.
+    @param resume           (bool)    Skip the trials whose results are in the
+                                      result store from a previous run of the
+                                      experiment; False starts a new store.
 
     """
     self.dataPath = dataPath
@@ -85,84 +95,67 @@ class Runner(object):
     if not os.path.exists(self.modelPath):
       os.makedirs(self.modelPath)
 
+    self.plotter = None
     if self.plots:
-      self.plotter = PlotNLP()
+      self.plotter = PlotNLP(experimentName=self.experimentName,
+                             backend=plotBackend,
+                             outputDir=os.path.join(self.modelPath, "plots"))
 
     self.dataDice = None
     self.labels = None
     self.labelRefs = None
+    self.labelVocabulary = None
     self.partitions = []
     self.samples = None
-    self.results = []
+    self.resultStore = ResultStore(os.path.join(self.modelPath, "results"),
+                                   resume=resume)
 
 
   def _calculateTrialAccuracies(self):
     """
-    @return trialAccuracies     (defaultdict)   Items are defaultdicts, one for
-        each size of the training set. Inner defaultdicts keys are classification
-        categories, with numpy array values that contain one accuracy value for
-        each trial.
+    @return trialAccuracies     (numpy array)   Accuracy of each category
+        (column, by label id) in each trial (row); NaN where the test set of the
+        trial has no samples of the category.
     """
-    # To handle multiple trials of the same size:
-    # trialSize -> (category -> list of accuracies)
-    trialAccuracies = defaultdict(lambda: defaultdict(lambda:
-        numpy.ndarray(0)))
-    for i, size in enumerate(self.trainSize):
-      accuracies = self.model.calculateClassificationResults(self.results[i])
-      for label, acc in accuracies:
-        category = self.labelRefs[label]
-        acc_list = trialAccuracies[size][category]
-        trialAccuracies[size][category] = numpy.append(acc_list, acc)
+    trialAccuracies = numpy.empty((len(self.trainSize), len(self.labelRefs)))
+    trialAccuracies.fill(numpy.nan)
+    for i, trial in enumerate(self.resultStore):
+      accuracies = self.model.calculateClassificationResults(trial["results"])
+      if accuracies:
+        labels, acc = zip(*accuracies)
+        trialAccuracies[i, list(labels)] = acc
 
     return trialAccuracies
 
 
-  def _calculateClassificationAccuracies(self, trialAccuracies):
+  def _mapLabelRefs(self):
     """
-    @param trialAccuracies            (defaultdict)   Please see the description
-        in self._calculateClassificationAccuracies().
-
-    @return classificationAccuracies  (defaultdict)   Keys are classification
-        categories, with multiple numpy arrays as values -- one for each size of
-        training sets, with one accuracy value for each run of that training set
-        size.
+    Replace the label strings in self.dataDict with corresponding ints. Label
+    ids are sorted by label string, and a loaded model keeps the ids it was
+    saved with.
     """
-    # Need the accuracies to be ordered for the plot
-    trials = sorted(set(self.trainSize))
-    # category -> list of list of accuracies
-    classificationAccuracies = defaultdict(list)
-    for trial in trials:
-      accuracies = trialAccuracies[trial]
-      for label, acc in accuracies.iteritems():
-        classificationAccuracies[label].append(acc)
-
-    return classificationAccuracies
-
-
-  def _mapLabelRefs(self):
-    """Replace the label strings in self.dataDict with corresponding ints."""
-    self.labelRefs = list(set(
-        itertools.chain.from_iterable(self.dataDict.values())))
+    vocabularyPath = os.path.join(self.modelPath, "labels.json")
+    if self.load and os.path.isfile(vocabularyPath):
+      self.labelVocabulary = LabelVocabulary.load(vocabularyPath)
+      self.labelVocabulary.update(self.dataDict.itervalues())
+    else:
+      self.labelVocabulary = LabelVocabulary.fromLabels(
+        self.dataDict.itervalues())
+    self.labelRefs = self.labelVocabulary.labels
 
-    for k, v in self.dataDict.iteritems():
-      self.dataDict[k] = numpy.array(
-          [self.labelRefs.index(label) for label in v])
+    labels, offsets = self.labelVocabulary.encodeMany(self.dataDict.values())
+    for i, sample in enumerate(self.dataDict.keys()):
+      self.dataDict[sample] = labels[offsets[i]:offsets[i+1]]
 
 
   def _preprocess(self, preprocess):
     """Tokenize the samples, with or without preprocessing."""
     texter = TextPreprocess()
-    if preprocess:
-      self.samples = [(texter.tokenize(sample,
-                                       ignoreCommon=100,
-                                       removeStrings=["[identifier deleted]"],
-                                       correctSpell=True),
-                      labels) for sample, labels in self.dataDict.iteritems()]
-    else:
-      self.samples = [(texter.tokenize(sample), labels)
-                      for sample, labels in self.dataDict.iteritems()]
+    self.samples = [(texter.tokenizeSample(sample, preprocess), labels)
+                    for sample, labels in self.dataDict.iteritems()]
 
 
+  @timed
   def setupData(self, preprocess=False, sampleIdx=2):
     """
     Get the data from CSV and preprocess if specified.
@@ -185,35 +178,57 @@ class Runner(object):
 
   def initModel(self):
     """Load or instantiate the classification model."""
+    try:
+      module = __import__(self.modelModuleName, {}, {}, self.modelName)
+      modelClass = getattr(module, self.modelName)
+      self.model = modelClass(verbosity=self.verbosity)
+    except ImportError:
+      raise RuntimeError("Could not find model class \'{0}\' to import.".
+                         format(self.modelName))
+
     if self.load:
-      with open(os.path.join(self.modelPath, "model.pkl"), "rb") as f:
-        self.model = pkl.load(f)
+      self.model.load(self.modelPath)
       print "Model loaded from \'{0}\'.".format(self.modelPath)
-    else:
-      try:
-        module = __import__(self.modelModuleName, {}, {}, self.modelName)
-        modelClass = getattr(module, self.modelName)
-        self.model = modelClass(verbosity=self.verbosity)
-      except ImportError:
-        raise RuntimeError("Could not find model class \'{0}\' to import.".
-                           format(self.modelName))
 
 
+  @timed
   def encodeSamples(self):
     """
-    Encode the text samples into bitmap patterns, and log to txt file. The
-    encoded patterns are stored in a dict along with their corresponding class
-    labels.
+    Encode the text samples into bitmap patterns, streaming them one at a time
+    into a pattern store in the model directory, which also serves as the
+    encoding log. self.patterns is the memory-mapped store, indexed like a list
+    of dicts with the encoded pattern and its corresponding class labels.
     """
-    self.patterns = [{"pattern": self.model.encodePattern(s[0]),
-                     "labels": s[1]}
-                     for s in self.samples]
-    self.model.logEncodings(self.patterns, self.modelPath)
+    storePath = os.path.join(self.modelPath, "encoding_log")
+    with PatternStoreWriter(storePath) as writer:
+      for sample, labels in self.samples:
+        self.model.writePattern(writer, sample, labels)
+    self.patterns = PatternStore(storePath)
 
 
+  @timed
   def runExperiment(self):
-    """Train and test the model for each trial specified by self.trainSize."""
+    """
+    Train and test the model for each trial specified by self.trainSize. Trials
+    already in the result store are skipped, keeping their stored partitions.
+    """
+    numStored = len(self.resultStore)
+    if numStored > len(self.trainSize):
+      raise ValueError("The result store has {0} trials, but the experiment "
+                       "has {1}.".format(numStored, len(self.trainSize)))
+
     for i, size in enumerate(self.trainSize):
+      if i < numStored:
+        stored = self.resultStore.getTrial(i)
+        if stored["trainSize"] != size:
+          raise ValueError("Stored trial {0} has training set size {1}, not "
+                           "{2}.".format(i, stored["trainSize"], size))
+        self.partitions.append((numpy.array(stored["trainIndices"]),
+                                numpy.array(stored["testIndices"])))
+        print "\tRun {0} of {1} is in the result store; skipping.".format(
+          i+1, len(self.trainSize))
+        continue
+
       self.partitions.append(self.partitionIndices(size))
 
       if self.verbosity > 0:
@@ -227,48 +242,63 @@ class Runner(object):
       print "\tTesting for this run."
       self.testing(i)
 
+    if 0 < len(self.trainSize) <= numStored:
+      # The model saved at the end must be the one of the last trial.
+      print "\tRetraining on the last run's training set."
+      self.model.resetModel()
+      self.training(len(self.trainSize) - 1)
+
 
+  @timed
   def training(self, trial):
     """
-    Train the model one-by-one on each pattern specified in this trials
-    partition of indices.
+    Train the model on the patterns of this trial's partition of training
+    indices.
     """
-    for i in self.partitions[trial][0]:
-      self.model.trainModel(self.patterns[i]["pattern"],
-                            self.patterns[i]["labels"])
+    self.model.trainPatterns(self.patterns, self.partitions[trial][0])
+    instruments.increment("Runner.trainedSamples",
+                          len(self.partitions[trial][0]))
 
 
+  @timed
   def testing(self, trial):
-    results = ([], [])
-    for i in self.partitions[trial][1]:
-      predicted = self.model.testModel(self.patterns[i]["pattern"])
-      results[0].append(predicted)
-      results[1].append(self.patterns[i]["labels"])
+    """
+    Test the model on each pattern in this trial's partition of test indices,
+    and append the trial's results to the result store.
+    """
+    testIndices = self.partitions[trial][1]
+    predictions = self.model.testPatterns(self.patterns, testIndices)
+    labels = [self.patterns.getLabels(i) for i in testIndices]
+    instruments.increment("Runner.testedSamples", len(testIndices))
 
-    self.results.append(results)
+    self.resultStore.appendTrial(self.trainSize[trial],
+                                 self.partitions[trial][0],
+                                 testIndices,
+                                 predictions,
+                                 labels)
 
 
+  @timed
   def calculateResults(self):
     """
     Calculate evaluation metrics from the result classifications.
 
     TODO: pass intended CM results to plotter.plotConfusionMatrix()
     """
-    resultCalcs = [self.model.evaluateResults(self.results[i],
+    resultCalcs = [self.model.evaluateResults(trial["results"],
                                               self.labelRefs,
-                                              self.partitions[i][1])
-                   for i in xrange(len(self.trainSize))]
+                                              trial["testIndices"])
+                   for trial in self.resultStore]
 
     self.model.printFinalReport(self.trainSize, [r[0] for r in resultCalcs])
 
     if self.plots:
       trialAccuracies = self._calculateTrialAccuracies()
-      classificationAccuracies = self._calculateClassificationAccuracies(
-          trialAccuracies)
 
-      self.plotter.plotCategoryAccuracies(trialAccuracies, self.trainSize)
-      self.plotter.plotCumulativeAccuracies(classificationAccuracies,
-          self.trainSize)
+      self.plotter.plotCategoryAccuracies(trialAccuracies, self.trainSize,
+                                          self.labelRefs)
+      self.plotter.plotCumulativeAccuracies(trialAccuracies, self.trainSize,
+                                            self.labelRefs)
 
       if self.plots > 1:
         # Plot extra evaluation figures -- confusion matrix.
@@ -276,42 +306,73 @@ class Runner(object):
             self.setupConfusionMatrices(resultCalcs))
 
 
+  @timed
   def save(self):
     """Save the serialized model."""
     print "Saving model to \'{0}\' directory.".format(self.modelPath)
-    with open(os.path.join(self.modelPath, "model.pkl"), "wb") as f:
-      pkl.dump(self.model, f)
+    self.model.save(self.modelPath)
+    if self.labelVocabulary is not None:
+      self.labelVocabulary.save(os.path.join(self.modelPath, "labels.json"))
 
 
-  def partitionIndices(self, split):
+  def close(self):
     """
-    Returns train and test indices.
-
-    TODO: use StandardSplit in data_split.py
+    Wait for the plots being written in the background, and close the result
+    store.
     """
-    length = len(self.samples)
-    if self.orderedSplit:
-      trainIdx = range(split)
-      testIdx = range(split, length)
-    else:
-      # Randomly sampled, not repeated
-      trainIdx = random.sample(xrange(length), split)
-      testIdx = [i for i in xrange(length) if i not in trainIdx]
+    if self.plotter is not None:
+      self.plotter.close()
+    self.resultStore.close()
 
-    return (trainIdx, testIdx)
+
+  def partitionIndices(self, split):
+    """
+    Returns train and test indices as numpy arrays; the test indices are in
+    sample order.
+    """
+    return partitionIndices(len(self.samples), split, self.orderedSplit)
 
 
   def validateExperiment(self, expectationFilePath):
-    """Returns accuracy of predicted labels against expected labels."""
+    """
+    Returns the accuracy of the predicted labels against the expected labels
+    in each trial: the mean over the trial's test samples of the fraction of
+    the expected labels that were predicted. Rows of the expectation file
+    correspond to the samples of the data file, in order; samples without
+    expected labels are not counted.
+    """
     dataDict = readCSV(expectationFilePath, 2, self.numClasses)
-
-    accuracies = numpy.zeros((len(self.results)))
-    for i, trial in enumerate(self.results):
-      for j, predictionList in enumerate(trial[0]):
-        predictions = [self.labelRefs[p] for p in predictionList if p]
-        expected = dataDict.items()[j+self.trainSize[i]][1]
-        accuracies[i] += (float(len(set(predictions) & set(expected)))
-                          / len(expected))
-      accuracies[i] = accuracies[i] / len(trial[0])
+    if len(dataDict) != len(self.samples):
+      raise ValueError("The expectation file has {0} samples, but the data "
+                       "has {1}.".format(len(dataDict), len(self.samples)))
+
+    # Expected labels the model doesn't know get ids after the model's labels.
+    vocabulary = LabelVocabulary(self.labelRefs)
+    vocabulary.update(dataDict.itervalues())
+    labels, offsets = vocabulary.encodeMany(dataDict.values())
+    numExpected = numpy.diff(offsets)
+    expected = numpy.zeros((len(dataDict), len(vocabulary)), dtype=bool)
+    expected[numpy.repeat(numpy.arange(len(dataDict)), numExpected),
+             labels] = True
+
+    accuracies = numpy.empty(len(self.resultStore))
+    accuracies.fill(numpy.nan)
+    for i, trial in enumerate(self.resultStore):
+      testIdx = trial["testIndices"]
+      predictions = trial["results"][0]
+      if not len(testIdx):
+        continue
+
+      predicted = numpy.zeros((len(testIdx), len(vocabulary)), dtype=bool)
+      numPredicted = [len(p) for p in predictions]
+      if sum(numPredicted):
+        predicted[numpy.repeat(numpy.arange(len(testIdx)), numPredicted),
+                  numpy.concatenate(predictions)] = True
+
+      overlap = (predicted & expected[testIdx]).sum(axis=1)
+      counted = numExpected[testIdx] > 0
+      if counted.any():
+        accuracies[i] = numpy.mean(overlap[counted] /
+                                   numExpected[testIdx][counted].astype(float))
 
     return accuracies
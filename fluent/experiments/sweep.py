@@ -0,0 +1,318 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Hyperparameter sweep over the classification models and their encodings.
+
+EXAMPLE: from the fluent directory, run...
+  python experiments/sweep.py
+  ../data/sample_reviews/sample_reviews_data_training.csv grid.json
+  --numClasses 1 --trainSize 20 28
+
+where grid.json maps parameter names to lists of values, e.g.
+  {"model": ["RandomSDR"], "n": [100, 200], "w": [10, 20], "k": [1, 3]}
+or is a list of such grids. Every combination of values in a grid is one
+configuration:
+  - "model" names the model (see MODELS)
+  - "preprocess" selects the runners' text preprocessing
+  - the model's encoder parameters (see ENCODER_PARAMS) set the encoding; for
+    the random SDR models the sparsity is w/n
+  - any other parameter, e.g. k, goes to the model constructor; the
+    Fingerprint model also takes distanceMethod, while the RandomSDR model
+    supports only "rawOverlap"
+Configurations with the same model, preprocessing, and encoder parameters
+share one encoding of the data, written once to a pattern store. The
+configurations run in a process pool, one process each, with the same
+train/test partitions. The results of each configuration and training set size
+are written as the rows of one CSV: accuracy, train and test seconds, and the
+peak memory of the configuration's process.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+from fluent.utils.csv_helper import readCSV, writeCSV
+from fluent.utils.data_split import partitionIndices
+from fluent.utils.label_vocabulary import LabelVocabulary
+from fluent.utils.pattern_store import PatternStore, PatternStoreWriter
+from fluent.utils.profiling import peakMemoryKB
+from fluent.utils.text_preprocess import TextPreprocess
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+MODELS = {
+  "RandomSDR": ("fluent.models.classify_random_sdr",
+                "ClassificationModelRandomSDR"),
+  "Fingerprint": ("fluent.models.classify_fingerprint",
+                  "ClassificationModelFingerprint"),
+}
+
+# Model constructor parameters that change the encodings.
+ENCODER_PARAMS = {
+  "RandomSDR": ("n", "w"),
+  "Fingerprint": (),
+}
+
+RESULT_COLUMNS = ("trial", "trainSize", "accuracy", "encodeSeconds",
+                  "trainSeconds", "testSeconds", "peakMemoryKB")
+
+
+
+def expandGrid(grid):
+  """
+  @param grid       (dict or list)  Parameter names mapped to lists of values
+                                    (or single values), or a list of these.
+  @return           (list)          Configuration dicts, one per combination.
+  """
+  configs = []
+  for g in (grid if isinstance(grid, list) else [grid]):
+    if g.get("model") is None:
+      raise ValueError("Each grid needs a \"model\" parameter.")
+    names = sorted(g)
+    values = [g[name] if isinstance(g[name], list) else [g[name]]
+              for name in names]
+    for combination in itertools.product(*values):
+      # JSON strings are unicode; the models expect byte strings.
+      config = {str(name): (value.encode("utf-8")
+                            if isinstance(value, unicode) else value)
+                for name, value in zip(names, combination)}
+      if config["model"] not in MODELS:
+        raise ValueError("Unknown model \'{0}\'; expected one of {1}.".format(
+          config["model"], sorted(MODELS)))
+      configs.append(config)
+  return configs
+
+
+def encodingKey(config):
+  """Return the settings of a configuration that determine its encodings."""
+  # Samples are tokenized by bool(preprocess), so e.g. a missing preprocess
+  # and preprocess=False share an encoding.
+  names = ENCODER_PARAMS[config["model"]]
+  return ((("model", config["model"]),
+           ("preprocess", bool(config.get("preprocess")))) +
+          tuple((name, config.get(name)) for name in names))
+
+
+def buildModel(config, numLabels, stubEncoder):
+  """Instantiate the model of a configuration."""
+  moduleName, className = MODELS[config["model"]]
+  module = __import__(moduleName, {}, {}, className)
+
+  kwargs = {name: value for name, value in config.iteritems()
+            if name not in ("model", "preprocess")}
+  kwargs.update(verbosity=0, numLabels=numLabels)
+  if stubEncoder and config["model"] == "Fingerprint":
+    from fluent.encoders.stub_encoder import StubEncoder
+    kwargs["encoder"] = StubEncoder()
+  return getattr(module, className)(**kwargs)
+
+
+def encodeTask(task):
+  """
+  Encode the samples with the model of a configuration into a pattern store.
+
+  @param task       (tuple)     The configuration, store path, tokenized
+      samples, label id arrays, number of labels, and stubEncoder flag.
+  @return           (tuple)     The encoding key and the seconds to encode.
+  """
+  config, storePath, samples, labels, numLabels, stubEncoder = task
+  start = time.time()
+  model = buildModel(config, numLabels, stubEncoder)
+  with PatternStoreWriter(storePath) as writer:
+    for sample, sampleLabels in zip(samples, labels):
+      model.writePattern(writer, sample, sampleLabels)
+  return encodingKey(config), time.time() - start
+
+
+def runTask(task):
+  """
+  Train and test the model of a configuration on its shared encodings, for
+  each training set size.
+
+  @param task       (tuple)     The configuration, store path, training set
+      sizes, orderedSplit flag, partition seed, number of labels, and
+      stubEncoder flag.
+  @return           (tuple)     The configuration, and a result dict per
+                                training set size.
+  """
+  (config, storePath, trainSizes, orderedSplit, seed, numLabels,
+   stubEncoder) = task
+  model = buildModel(config, numLabels, stubEncoder)
+  patterns = PatternStore(storePath)
+
+  results = []
+  for trial, size in enumerate(trainSizes):
+    trainIdx, testIdx = partitionIndices(len(patterns), size, orderedSplit,
+                                         seed + trial)
+    model.resetModel()
+
+    start = time.time()
+    for i in trainIdx:
+      sample = patterns[i]
+      model.trainModel(sample["pattern"], sample["labels"])
+    trainSeconds = time.time() - start
+
+    start = time.time()
+    testSamples = [patterns[i] for i in testIdx]
+    predictions = model.testBatch([s["pattern"] for s in testSamples])
+    testSeconds = time.time() - start
+
+    accuracy = model.calculateAccuracy(
+      (predictions, [s["labels"] for s in testSamples]))
+    results.append({"trial": trial,
+                    "trainSize": size,
+                    "accuracy": accuracy,
+                    "trainSeconds": trainSeconds,
+                    "testSeconds": testSeconds,
+                    "peakMemoryKB": peakMemoryKB()})
+  return config, results
+
+
+def run(args):
+  with open(args.gridPath) as f:
+    configs = expandGrid(json.load(f))
+
+  root = os.path.dirname(os.path.realpath(__file__))
+  outputDir = os.path.join(root, args.resultsDir, args.experimentName)
+  if not os.path.exists(outputDir):
+    os.makedirs(outputDir)
+
+  dataDict = readCSV(args.dataPath, 2, args.numClasses)
+  if not all(0 < size < len(dataDict) for size in args.trainSize):
+    raise ValueError("Invalid size(s) for training set.")
+  vocabulary = LabelVocabulary.fromLabels(dataDict.itervalues())
+  labels = [vocabulary.encode(l) for l in dataDict.itervalues()]
+  vocabulary.save(os.path.join(outputDir, "labels.json"))
+
+  # Tokenize once per preprocessing option.
+  texter = TextPreprocess()
+  tokenized = {}
+  for preprocess in set(bool(c.get("preprocess")) for c in configs):
+    tokenized[preprocess] = [texter.tokenizeSample(sample, preprocess)
+                             for sample in dataDict]
+
+  # One encoding per distinct encoder setting.
+  storePaths = {}
+  encodeTasks = []
+  for config in configs:
+    key = encodingKey(config)
+    if key not in storePaths:
+      storePaths[key] = os.path.join(outputDir, "encodings",
+                                     str(len(storePaths)))
+      encodeTasks.append((config, storePaths[key],
+                          tokenized[bool(config.get("preprocess"))], labels,
+                          args.numLabels, args.stubEncoder))
+  print ("Sweeping {0} configurations with {1} distinct encodings in {2} "
+         "processes.".format(len(configs), len(encodeTasks),
+                             args.numProcesses))
+
+  # A fresh process per task, so the peak memory is that of the task.
+  pool = multiprocessing.Pool(args.numProcesses, maxtasksperchild=1)
+  try:
+    encodeSeconds = dict(pool.map(encodeTask, encodeTasks, chunksize=1))
+
+    runTasks = [(config, storePaths[encodingKey(config)], args.trainSize,
+                 args.orderedSplit, args.seed, args.numLabels,
+                 args.stubEncoder) for config in configs]
+    rows = []
+    for i, (config, results) in enumerate(
+        pool.imap(runTask, runTasks, chunksize=1)):
+      print "\tConfiguration {0} of {1} done: {2}".format(
+        i+1, len(configs), config)
+      for result in results:
+        result["encodeSeconds"] = encodeSeconds[encodingKey(config)]
+        rows.append((config, result))
+  finally:
+    pool.close()
+    pool.join()
+
+  paramNames = sorted(set(name for config in configs for name in config))
+  table = [[config.get(name, "") for name in paramNames] +
+           [result[column] for column in RESULT_COLUMNS]
+           for config, result in rows]
+  outputPath = os.path.join(outputDir, args.outputName)
+  writeCSV(table, paramNames + list(RESULT_COLUMNS), outputPath)
+  print "Sweep results written to \'{0}\'.".format(outputPath)
+
+  return table
+
+
+if __name__ == "__main__":
+
+  parser = argparse.ArgumentParser()
+  parser.add_argument("dataPath",
+                      help="Path to data CSV.")
+  parser.add_argument("gridPath",
+                      help="Path to the JSON parameter grid.")
+  parser.add_argument("-e", "--experimentName",
+                      default="sweep",
+                      type=str,
+                      help="Experiment name; the encodings and results are "
+                           "written to this directory in the results "
+                           "directory.")
+  parser.add_argument("--resultsDir",
+                      default="results",
+                      help="This will hold the sweep results.")
+  parser.add_argument("--outputName",
+                      default="sweep_results.csv",
+                      help="File name of the comparison table.")
+  parser.add_argument("--numClasses",
+                      default=3,
+                      type=int,
+                      help="Specifies the number of classes per sample.")
+  parser.add_argument("--numLabels",
+                      default=3,
+                      type=int,
+                      help="numLabels of the models.")
+  parser.add_argument("--trainSize",
+                      default=[7, 13],
+                      nargs="+",
+                      type=int,
+                      help="Number of samples to use in training. Separate "
+                           "with spaces for multiple trials.")
+  parser.add_argument("--orderedSplit",
+                      default=False,
+                      action="store_true",
+                      help="Train on the first trainSize samples and test on "
+                           "the rest, instead of a random split.")
+  parser.add_argument("--seed",
+                      default=42,
+                      type=int,
+                      help="Random seed for the train/test partitions.")
+  parser.add_argument("--numProcesses",
+                      default=multiprocessing.cpu_count(),
+                      type=int,
+                      help="Number of worker processes.")
+  parser.add_argument("--stubEncoder",
+                      default=False,
+                      action="store_true",
+                      help="Use the offline StubEncoder in place of the "
+                           "Cortical.io encoder.")
+
+  args = parser.parse_args()
+  run(args)
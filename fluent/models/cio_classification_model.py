@@ -0,0 +1,84 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+import numpy
+
+from fluent.models.classification_model import ClassificationModel
+from fluent.utils.instrumentation import timed
+
+
+
+class CioClassificationModel(ClassificationModel):
+  """
+  Base class for the models that encode samples with a CioEncoder, or an
+  encoder with its interface such as the StubEncoder, set as self.encoder.
+  Samples the encoder returns no fingerprint for get a random SDR with the
+  model's dimensions n and w.
+  """
+
+  @timed
+  def encodePattern(self, sample):
+    """
+    Encode an SDR of the input string by querying the Cortical.io API. If the
+    client returns None, we create a random SDR with the model's dimensions n
+    and w.
+
+    @param sample     (list)            Tokenized sample, where each item is a
+                                        string token.
+    @return fp        (dict)            The sample text, sparsity, and bitmap.
+    Example return dict:
+      {
+        "text": "Example text",
+        "sparsity": 0.03,
+        "bitmap": numpy.array([])
+      }
+    """
+    sample = " ".join(sample)
+    return self._formatEncoding(sample, self.encoder.encode(sample))
+
+
+  def encodeBatch(self, samples):
+    """
+    Encode a list of tokenized samples with one encoder batch, so the texts the
+    API cannot encode share their token lookups; see encodePattern().
+    """
+    texts = [" ".join(sample) for sample in samples]
+    return [self._formatEncoding(text, fpInfo)
+            for text, fpInfo in zip(texts, self.encoder.encodeBatch(texts))]
+
+
+  def _formatEncoding(self, sample, fpInfo):
+    """
+    Convert the encoder's fingerprint info for a text into the encodePattern()
+    format, with a random SDR if the encoder returned None.
+    """
+    if fpInfo:
+      fp = {"text":fpInfo["text"] if "text" in fpInfo else fpInfo["term"],
+            "sparsity":fpInfo["sparsity"],
+            "bitmap":numpy.array(fpInfo["fingerprint"]["positions"])
+            }
+    else:
+      fp = {"text":sample,
+            "sparsity":float(self.w)/self.n,
+            "bitmap":self.encodeRandomly(sample)
+            }
+
+    return fp
@@ -19,13 +19,13 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import copy
 import numpy
 import os
 import pandas
-import random
 
 from collections import Counter
+from fluent.utils.pattern_store import PatternStoreWriter
+from fluent.utils.random_sdr import RandomSDRGenerator
 
 try:
   import simplejson as json
@@ -34,6 +34,11 @@ except ImportError:
 
 
 
+# Version 2 models encode with the hash-based RandomSDRGenerator; version 1
+# models were trained on encodings seeded by the global random module.
+MODEL_FORMAT_VERSION = 2
+
+
 class ClassificationModel(object):
   """
   Base class for NLP models of classification tasks. When inheriting from this
@@ -45,6 +50,7 @@ class ClassificationModel(object):
     - resetModel()
     - trainModel()
     - testModel()
+    - _getState() and _setState(), for save() and load().
 
   TODO: confusion matrices
   TODO: use nupic.bindings.math import Random
@@ -57,26 +63,96 @@ class ClassificationModel(object):
     self.numLabels = numLabels
     self.verbosity = verbosity
 
+    self._sdrGenerator = None
+
 
   def encodeRandomly(self, sample):
-    """Return a random bitmap representation of the sample."""
-    random.seed(sample)
-    return numpy.sort(random.sample(xrange(self.n), self.w))
+    """
+    Return a random bitmap representation of the sample; the same sample
+    string always gets the same bitmap for the model's n and w.
+    """
+    return self._getSDRGenerator().encode(sample)
+
+
+  def _getSDRGenerator(self):
+    """Return the random SDR generator for the current n and w."""
+    generator = self._sdrGenerator
+    if generator is None or (generator.n, generator.w) != (self.n, self.w):
+      generator = self._sdrGenerator = RandomSDRGenerator(self.n, self.w)
+    return generator
 
 
   def logEncodings(self, patterns, path):
-    """Log the encoding dictionaries to a txt file."""
+    """
+    Log the encoding dictionaries to a columnar pattern store in the directory
+    "encoding_log" under path. The patterns are streamed to disk one at a time;
+    read them back with fluent.utils.pattern_store.PatternStore.
+    """
     if not os.path.isdir(path):
       raise ValueError("Invalid path to write file.")
 
-    # Cast numpy arrays to list objects for serialization.
-    jsonPatterns = copy.deepcopy(patterns)
-    for jp in jsonPatterns:
-      jp["pattern"]["bitmap"] = jp["pattern"].get("bitmap", None).tolist()
-      jp["labels"] = jp.get("labels", None).tolist()
+    with PatternStoreWriter(os.path.join(path, "encoding_log")) as writer:
+      for p in patterns:
+        writer.append(p["pattern"], p["labels"])
+
+
+  def save(self, path):
+    """
+    Save the model to the directory path. The model is written as a JSON header
+    (model class, format version, and the JSON-serializable state) plus one
+    .npy file per array of the model state, so it can be loaded without
+    unpickling any Python objects.
+    """
+    if not os.path.isdir(path):
+      os.makedirs(path)
+
+    state, arrays = self._getState()
+    header = {"version": MODEL_FORMAT_VERSION,
+              "modelClass": self.__class__.__name__,
+              "n": self.n,
+              "w": self.w,
+              "numLabels": self.numLabels,
+              "state": state,
+              "arrays": sorted(arrays.keys())}
+
+    for name, array in arrays.iteritems():
+      numpy.save(os.path.join(path, name + ".npy"), array)
+    with open(os.path.join(path, "model.json"), "w") as f:
+      json.dump(header, f, indent=1)
 
-    with open(os.path.join(path, "encoding_log.txt"), "w") as f:
-      f.write(json.dumps(jsonPatterns, indent=1))
+
+  def load(self, path):
+    """
+    Load the model state saved by save() into this model instance. The arrays
+    are memory-mapped rather than read into memory.
+    """
+    with open(os.path.join(path, "model.json")) as f:
+      header = json.load(f)
+
+    if header["modelClass"] != self.__class__.__name__:
+      raise ValueError("Cannot load a saved {0} into a {1}.".format(
+        header["modelClass"], self.__class__.__name__))
+    if header["version"] != MODEL_FORMAT_VERSION:
+      raise ValueError("Model format version {0} is not supported; version {1} "
+                       "is required.".format(header["version"],
+                                             MODEL_FORMAT_VERSION))
+
+    arrays = {name: self._loadArray(os.path.join(path, name + ".npy"))
+              for name in header["arrays"]}
+
+    self.n = header["n"]
+    self.w = header["w"]
+    self.numLabels = header["numLabels"]
+    self._setState(header["state"], arrays)
+
+
+  @staticmethod
+  def _loadArray(path):
+    """Memory-map a .npy file; numpy cannot map arrays without elements."""
+    try:
+      return numpy.load(path, mmap_mode="r")
+    except ValueError:
+      return numpy.load(path)
 
 
   def classifyRandomly(self, labels):
@@ -93,6 +169,42 @@ class ClassificationModel(object):
     return densePattern
 
 
+  @staticmethod
+  def _getPrototypes(classifier):
+    """
+    Return the patterns stored in a KNNClassifier in CSR form.
+
+    @return           (dict)          Arrays "positions" and "offsets", where
+        prototype i is positions[offsets[i]:offsets[i+1]], and "categories" with
+        the category of each prototype.
+    """
+    categories = numpy.array(classifier._categoryList, dtype=numpy.int32)
+    patterns = [classifier.getPattern(i, sparseBinaryForm=True)
+                for i in xrange(len(categories))]
+    offsets = numpy.zeros(len(patterns) + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum([len(p) for p in patterns])
+    positions = (numpy.concatenate(patterns).astype(numpy.int32) if patterns
+                 else numpy.zeros(0, dtype=numpy.int32))
+
+    return {"positions": positions,
+            "offsets": offsets,
+            "categories": categories}
+
+
+  def _setPrototypes(self, classifier, arrays):
+    """
+    Restore the prototypes from _getPrototypes() into a cleared KNNClassifier
+    with sparse memory, by learning them in their saved order.
+    """
+    classifier.clear()
+    positions = arrays["positions"]
+    offsets = arrays["offsets"]
+    for i, category in enumerate(arrays["categories"]):
+      classifier.learn(numpy.array(positions[offsets[i]:offsets[i+1]]),
+                       int(category),
+                       isSparse=self.n)
+
+
   @staticmethod
   def getWinningLabels(labelFreq, numLabels=3):
     """
@@ -325,6 +437,22 @@ class ClassificationModel(object):
     raise NotImplementedError
 
 
+  def encodeBatch(self, samples):
+    """
+    Encode a list of samples, returning a list of encodePattern() outputs.
+    Subclasses with a bulk encoding path should override this.
+    """
+    return [self.encodePattern(s) for s in samples]
+
+
+  def writePattern(self, writer, sample, labels):
+    """
+    Encode a tokenized sample into a PatternStoreWriter. Subclasses with a
+    more compact stored form should override this.
+    """
+    return writer.append(self.encodePattern(sample), labels)
+
+
   def resetModel(self):
     raise NotImplementedError
 
@@ -335,3 +463,44 @@ class ClassificationModel(object):
 
   def testModel(self, sample, numLabels):
     raise NotImplementedError
+
+
+  def testBatch(self, samples, numLabels=3):
+    """
+    Test a list of encoded samples, returning a list of testModel() outputs.
+    Subclasses with a bulk inference path should override this.
+    """
+    return [self.testModel(s, numLabels) for s in samples]
+
+
+  def trainPatterns(self, store, indices):
+    """
+    Train on the samples of a PatternStore at indices, in order, with one
+    trainModel() call per sample. Subclasses that can train from the store's
+    arrays (see PatternStore.take()) should override this.
+    """
+    for i in indices:
+      sample = store[i]
+      self.trainModel(sample["pattern"], sample["labels"])
+
+
+  def testPatterns(self, store, indices, numLabels=3):
+    """
+    Test the samples of a PatternStore at indices with one testBatch() call,
+    returning a list of testModel() outputs. Subclasses that can test from the
+    store's arrays (see PatternStore.take()) should override this.
+    """
+    return self.testBatch([store.getPattern(i) for i in indices], numLabels)
+
+
+  def _getState(self):
+    """
+    Return the model state for save() as a 2-tuple: a JSON-serializable dict,
+    and a dict of numpy arrays keyed by name.
+    """
+    raise NotImplementedError
+
+
+  def _setState(self, state, arrays):
+    """Restore the model state from the output of _getState()."""
+    raise NotImplementedError
@@ -25,11 +25,12 @@ import os
 from collections import defaultdict
 from cortipy.cortical_client import CorticalClient
 from fluent.encoders.cio_encoder import CioEncoder
-from fluent.models.classification_model import ClassificationModel
+from fluent.models.cio_classification_model import CioClassificationModel
+from fluent.utils.instrumentation import instruments, timed
 
 
 
-class ClassificationModelEndpoint(ClassificationModel):
+class ClassificationModelEndpoint(CioClassificationModel):
   """
   Class to run the survey response classification task with Cortical.io
   text endpoint encodings and classification system.
@@ -54,36 +55,6 @@ class ClassificationModelEndpoint(ClassificationModel):
     self.positives = {}
 
 
-  def encodePattern(self, sample):
-    """
-    Encode an SDR of the input string by querying the Cortical.io API.
-
-    @param sample         (list)          Tokenized sample, where each item is
-                                          a string
-    @return fp            (dict)          The sample text, sparsity, and bitmap.
-    Example return dict:
-      {
-        "text": "Example text",
-        "sparsity": 0.03,
-        "bitmap": numpy.array([])
-      }
-    """
-    sample = " ".join(sample)
-    fpInfo = self.encoder.encode(sample)
-    if fpInfo:
-      fp = {"text":fpInfo["text"] if "text" in fpInfo else fpInfo["term"],
-            "sparsity":fpInfo["sparsity"],
-            "bitmap":numpy.array(fpInfo["fingerprint"]["positions"])
-            }
-    else:
-      fp = {"text":sample,
-            "sparsity":float(self.w)/self.n,
-            "bitmap":self.encodeRandomly(sample)
-            }
-
-    return fp
-
-
   def resetModel(self):
     """Reset the model"""
     self.positives.clear()
@@ -91,6 +62,7 @@ class ClassificationModelEndpoint(ClassificationModel):
     self.categoryBitmaps.clear()
 
 
+  @timed
   def trainModel(self, sample, labels, negatives=None):
     """
     Train the classifier on the input sample and label. Use Cortical.io's
@@ -120,12 +92,14 @@ class ClassificationModelEndpoint(ClassificationModel):
           if neg["text"]:
             self.negatives[label].append(neg["text"])
 
+      instruments.increment("ClassificationModelEndpoint.apiCalls")
       self.categoryBitmaps[label] = self.client.createClassification(
           str(label),
           self.positives[label],
           self.negatives[label])["positions"]
 
 
+  @timed
   def testModel(self, sample, numLabels=3, metric="overlappingAll"):
     """
     Test the Cortical.io classifier on the input sample. Returns a dictionary
@@ -141,10 +115,46 @@ class ClassificationModelEndpoint(ClassificationModel):
     distances = defaultdict(list)
     for cat, catBitmap in self.categoryBitmaps.iteritems():
       distances[cat] = self.client.compare(sampleBitmap, catBitmap)
+    instruments.increment("ClassificationModelEndpoint.apiCalls",
+                          len(self.categoryBitmaps))
 
     return self.getWinningLabels(distances, numLabels=numLabels, metric=metric)
 
 
+  def _getState(self):
+    """
+    The category bitmaps are stored in CSR form, and the positive and negative
+    sample texts of each category go in the JSON state.
+    """
+    categories = sorted(self.categoryBitmaps.keys())
+    bitmaps = [numpy.asarray(self.categoryBitmaps[c], dtype=numpy.int32)
+               for c in categories]
+    offsets = numpy.zeros(len(bitmaps) + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum([len(b) for b in bitmaps])
+    arrays = {"categories": numpy.array(categories, dtype=numpy.int32),
+              "positions": (numpy.concatenate(bitmaps) if bitmaps
+                            else numpy.zeros(0, dtype=numpy.int32)),
+              "offsets": offsets}
+    state = {"positives": {str(k): v for k, v in self.positives.iteritems()},
+             "negatives": {str(k): v for k, v in self.negatives.iteritems()}}
+
+    return state, arrays
+
+
+  def _setState(self, state, arrays):
+    self.resetModel()
+    self.positives.update(
+      {int(k): v for k, v in state["positives"].iteritems()})
+    self.negatives.update(
+      {int(k): v for k, v in state["negatives"].iteritems()})
+
+    positions = arrays["positions"]
+    offsets = arrays["offsets"]
+    for i, category in enumerate(arrays["categories"]):
+      self.categoryBitmaps[int(category)] = (
+        positions[offsets[i]:offsets[i+1]].tolist())
+
+
   @staticmethod
   def getWinningLabels(distances, numLabels, metric):
     """
@@ -19,15 +19,14 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import numpy
-
 from fluent.encoders.cio_encoder import CioEncoder
-from fluent.models.classification_model import ClassificationModel
+from fluent.models.cio_classification_model import CioClassificationModel
+from fluent.utils.instrumentation import timed
 from nupic.algorithms.KNNClassifier import KNNClassifier
 
 
 
-class ClassificationModelFingerprint(ClassificationModel):
+class ClassificationModelFingerprint(CioClassificationModel):
   """
   Class to run the survey response classification task with Coritcal.io
   fingerprint encodings.
@@ -35,58 +34,38 @@ class ClassificationModelFingerprint(ClassificationModel):
   From the experiment runner, the methods expect to be fed one sample at a time.
   """
 
-  def __init__(self, verbosity=1, numLabels=3):
-    super(ClassificationModelFingerprint, self).__init__(verbosity, numLabels)
+  def __init__(self, verbosity=1, numLabels=3, encoder=None, k=None,
+               distanceMethod="rawOverlap"):
+    """
+    @param encoder    (LanguageEncoder)   Encoder with the CioEncoder interface;
+        defaults to a CioEncoder, which needs a valid API key (see CioEncoder
+        init for details). Pass a StubEncoder to run offline.
+    @param k              (int)   Number of kNN matches that vote; defaults to
+                                  numLabels.
+    @param distanceMethod (str)   KNNClassifier distance method.
+    """
+    super(ClassificationModelFingerprint, self).__init__(verbosity=verbosity,
+                                                         numLabels=numLabels)
 
-    # Init kNN classifier and Cortical.io encoder; need valid API key (see
-    # CioEncoder init for details).
-    self.classifier = KNNClassifier(k=numLabels,
-                                    distanceMethod='rawOverlap',
+    # Init kNN classifier and Cortical.io encoder.
+    self.classifier = KNNClassifier(k=numLabels if k is None else k,
+                                    distanceMethod=distanceMethod,
                                     exact=False,
                                     verbosity=verbosity-1)
 
-    self.encoder = CioEncoder(cacheDir="./experiments/cache")
+    if encoder is None:
+      encoder = CioEncoder(cacheDir="./experiments/cache")
+    self.encoder = encoder
     self.n = self.encoder.n
     self.w = int((self.encoder.targetSparsity/100)*self.n)
 
 
-  def encodePattern(self, sample):
-    """
-    Encode an SDR of the input string by querying the Cortical.io API. If the
-    client returns None, we create a random SDR with the model's dimensions n
-    and w.
-
-    @param sample     (list)            Tokenized sample, where each item is a
-                                        string token.
-    @return fp        (dict)            The sample text, sparsity, and bitmap.
-    Example return dict:
-      {
-        "text": "Example text",
-        "sparsity": 0.03,
-        "bitmap": numpy.array([])
-      }
-    """
-    sample = " ".join(sample)
-    fpInfo = self.encoder.encode(sample)
-    if fpInfo:
-      fp = {"text":fpInfo["text"] if "text" in fpInfo else fpInfo["term"],
-            "sparsity":fpInfo["sparsity"],
-            "bitmap":numpy.array(fpInfo["fingerprint"]["positions"])
-            }
-    else:
-      fp = {"text":sample,
-            "sparsity":float(self.w)/self.n,
-            "bitmap":self.encodeRandomly(sample)
-            }
-
-    return fp
-
-
   def resetModel(self):
     """Reset the model by clearing the classifier."""
     self.classifier.clear()
 
 
+  @timed
   def trainModel(self, sample, labels):
     """
     Train the classifier on the input sample and labels.
@@ -100,6 +79,7 @@ class ClassificationModelFingerprint(ClassificationModel):
         self.classifier.learn(sample["bitmap"], label, isSparse=self.n)
 
 
+  @timed
   def testModel(self, sample, numLabels=3):
     """
     Test the kNN classifier on the input sample. Returns the classification most
@@ -116,3 +96,13 @@ class ClassificationModelFingerprint(ClassificationModel):
     (_, inferenceResult, _, _) = self.classifier.infer(
       self._densifyPattern(sample["bitmap"]))
     return self.getWinningLabels(inferenceResult, numLabels)
+
+
+  def _getState(self):
+    """The state is the classifier's k and stored prototypes."""
+    return {"k": self.classifier.k}, self._getPrototypes(self.classifier)
+
+
+  def _setState(self, state, arrays):
+    self.classifier.k = state["k"]
+    self._setPrototypes(self.classifier, arrays)
@@ -19,18 +19,12 @@
 # http://numenta.org/licenses/
 # ----------------------------------------------------------------------
 
-import copy
 import numpy
-import os
-import random
 
 from fluent.models.classification_model import ClassificationModel
-from nupic.algorithms.KNNClassifier import KNNClassifier
-
-try:
-  import simplejson as json
-except ImportError:
-  import json
+from fluent.models.sparse_knn import SparseKNN
+from fluent.utils.instrumentation import timed
+from fluent.utils.random_sdr import TokenSDRTable
 
 
 
@@ -43,54 +37,101 @@ class ClassificationModelRandomSDR(ClassificationModel):
   TODO: use nupic.bindings.math import Random
   """
 
-  def __init__(self, n=100, w=20, verbosity=1, numLabels=3):
+  def __init__(self, n=100, w=20, verbosity=1, numLabels=3, k=None,
+               distanceMethod="rawOverlap", maxTokens=2**18):
+    """
+    @param k              (int)   Number of kNN matches that vote; defaults to
+                                  numLabels.
+    @param distanceMethod (str)   KNNClassifier distance method; only
+                                  "rawOverlap" is supported.
+    @param maxTokens      (int)   Max number of token SDRs kept in memory; the
+                                  token table starts over when it is full.
+    """
+    if distanceMethod != "rawOverlap":
+      raise ValueError("ClassificationModelRandomSDR only supports the "
+                       "\'rawOverlap\' distance method, not \'{0}\'.".format(
+                         distanceMethod))
     super(ClassificationModelRandomSDR, self).__init__(n, w, verbosity,
                                                        numLabels)
 
-    self.classifier = KNNClassifier(exact=True,
-                                    distanceMethod='rawOverlap',
-                                    k=numLabels,
-                                    verbosity=verbosity-1)
+    # Votes as a KNNClassifier(exact=True, distanceMethod='rawOverlap'), with
+    # the tokens of a sample scored in one batch.
+    self.classifier = SparseKNN(k=numLabels if k is None else k)
 
+    self.maxTokens = maxTokens
+    self._tokenTable = None
 
+
+  @timed
   def encodePattern(self, sample):
     """
-    Randomly encode an SDR of the input strings. We seed the random number
-    generator such that a given string will yield the same SDR each time this
-    method is called.
+    Randomly encode an SDR of the input strings. The SDR of each token is
+    derived from a hash of the token, so a given string will yield the same
+    SDR each time this method is called, in any process. The bitmaps are views
+    of the model's token table, so every pattern of a token shares memory.
 
     @param sample     (list)            Tokenized sample, where each item is a
                                         string token.
-    @return           (list)            Numpy arrays, each with a bitmap of the
-                                        encoding.
+    @return           (list)            Dicts with the text, sparsity, and
+                                        bitmap (numpy array) of each token.
+    """
+    table = self._getTokenTable()
+    return self._tokenPatterns(sample, table.lookup(sample), table.bitmaps)
+
+
+  def encodeBatch(self, samples):
+    """
+    Encode a list of tokenized samples; the tokens of all samples are looked
+    up in the token table together.
     """
+    table = self._getTokenTable()
+    tokenIds = table.lookup([token for sample in samples for token in sample])
+    bitmaps = table.bitmaps
+
     patterns = []
-    for token in sample:
-      patterns.append({
-                        "text":token,
-                        "sparsity":float(self.w)/self.n,
-                        "bitmap":self.encodeRandomly(token)
-                        })
+    start = 0
+    for sample in samples:
+      end = start + len(sample)
+      patterns.append(self._tokenPatterns(sample, tokenIds[start:end], bitmaps))
+      start = end
     return patterns
 
 
-  def logEncodings(self, patterns, path):
+  def encodeTokenIds(self, sample):
+    """
+    Encode a tokenized sample as an array of token ids; the SDR of token id i
+    is row i of self.getTokenBitmaps(), until the next call.
+    """
+    return self._getTokenTable().lookup(sample)
+
+
+  def writePattern(self, writer, sample, labels):
     """
-    Log the encoding dictionaries to a txt file; overrides the superclass
-    implementation.
+    Write the sample as token ids, so the store keeps one SDR per distinct
+    token; read back, the patterns are the same as encodePattern()'s.
     """
-    if not os.path.isdir(path):
-      raise ValueError("Invalid path to write file.")
+    tokenIds = self.encodeTokenIds(sample)
+    return writer.appendTokens(sample, tokenIds, self.getTokenBitmaps(),
+                               float(self.w)/self.n, labels)
+
+
+  def getTokenBitmaps(self):
+    """Return the (number of tokens, w) array of the SDR of each token id."""
+    return self._getTokenTable().bitmaps
 
-    # Cast numpy arrays to list objects for serialization.
-    jsonPatterns = copy.deepcopy(patterns)
-    for jp in jsonPatterns:
-      for tokenPattern in jp["pattern"]:
-        tokenPattern["bitmap"] = tokenPattern.get("bitmap", None).tolist()
-      jp["labels"] = jp.get("labels", None).tolist()
 
-    with open(os.path.join(path, "encoding_log.txt"), "w") as f:
-      f.write(json.dumps(jsonPatterns, indent=1))
+  def _getTokenTable(self):
+    """Return the token table for the current n and w."""
+    generator = self._getSDRGenerator()
+    if self._tokenTable is None or self._tokenTable.generator is not generator:
+      self._tokenTable = TokenSDRTable(generator, maxTokens=self.maxTokens)
+    return self._tokenTable
+
+
+  def _tokenPatterns(self, sample, tokenIds, bitmaps):
+    sparsity = float(self.w)/self.n
+    return [{"text":token, "sparsity":sparsity, "bitmap":bitmaps[tokenId]}
+            for token, tokenId in zip(sample, tokenIds)]
 
 
   def resetModel(self):
@@ -98,6 +139,7 @@ class ClassificationModelRandomSDR(ClassificationModel):
     self.classifier.clear()
 
 
+  @timed
   def trainModel(self, sample, labels):
     """
     Train the classifier on the input sample and label. This model is unique in
@@ -113,7 +155,7 @@ class ClassificationModelRandomSDR(ClassificationModel):
     for s in sample:
       if not s: continue
       for label in labels:
-        self.classifier.learn(s["bitmap"], label, isSparse=self.n)
+        self.classifier.learn(s["bitmap"], label)
 
 
   def testModel(self, sample, numLabels=3):
@@ -121,7 +163,8 @@ class ClassificationModelRandomSDR(ClassificationModel):
     Test the classifier on the input sample. Returns the classifications
     most frequent amongst the classifications of the sample's individual tokens.
     We ignore the terms that are unclassified, picking the most frequent
-    classifications among those that are detected.
+    classifications among those that are detected. Not timed itself; it is
+    timed as a batch of one by testBatch().
     @param sample           (list)          List of dict encodings, one for each
                                             token in the sample.
     @param numLabels        (int)           Number of predicted classifications.
@@ -129,16 +172,86 @@ class ClassificationModelRandomSDR(ClassificationModel):
                                             classifications for the data
                                             samples; values are int or empty.
     """
-    totalInferenceResult = None
-    for idx, s in enumerate(sample):
-      if not s: continue
+    return self.testBatch([sample], numLabels)[0]
+
+
+  @timed
+  def testBatch(self, samples, numLabels=3):
+    """
+    Test a list of samples, scoring the tokens of all samples against the
+    classifier in one batch. The results are the same as testModel() for each
+    sample.
+    """
+    bitmaps = [[s["bitmap"] for s in sample if s] for sample in samples]
+    tokensPerSample = numpy.array([len(b) for b in bitmaps], dtype=numpy.int64)
+    tokenBitmaps = [b for sampleBitmaps in bitmaps for b in sampleBitmaps]
+
+    offsets = numpy.zeros(len(tokenBitmaps) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(b) for b in tokenBitmaps], out=offsets[1:])
+    positions = (numpy.concatenate(tokenBitmaps) if tokenBitmaps
+                 else numpy.zeros(0, dtype=numpy.int64))
+    return self._testTokens(positions, offsets, tokensPerSample, numLabels)
+
+
+  def trainPatterns(self, store, indices):
+    """
+    Train on the samples of a PatternStore at indices, reading the token
+    bitmaps of all the samples with one PatternStore.take(); the prototypes
+    are learned in the same order as with trainModel().
+    """
+    arrays = store.take(indices)
+    bitmaps = arrays["bitmaps"]
+    bitmapOffsets = arrays["bitmapOffsets"]
+    labels = arrays["labels"]
+    labelOffsets = arrays["labelOffsets"]
+    sampleOfToken = numpy.repeat(numpy.arange(len(indices)),
+                                 numpy.diff(arrays["sampleOffsets"]))
+    for row, sample in enumerate(sampleOfToken):
+      bitmap = bitmaps[bitmapOffsets[row]:bitmapOffsets[row+1]]
+      for label in labels[labelOffsets[sample]:labelOffsets[sample+1]]:
+        self.classifier.learn(bitmap, label)
+
+
+  def testPatterns(self, store, indices, numLabels=3):
+    """
+    Test the samples of a PatternStore at indices, scoring the token bitmaps
+    read with one PatternStore.take() in one batch; see testBatch().
+    """
+    arrays = store.take(indices)
+    return self._testTokens(arrays["bitmaps"],
+                            arrays["bitmapOffsets"],
+                            numpy.diff(arrays["sampleOffsets"]),
+                            numLabels)
+
+
+  def _testTokens(self, positions, offsets, tokensPerSample, numLabels):
+    """
+    Return the winning labels of samples from the votes of their tokens.
+
+    @param positions        (numpy array)   Concatenated token bitmaps.
+    @param offsets          (numpy array)   Offsets of each token bitmap in
+                                            positions, in CSR form.
+    @param tokensPerSample  (numpy array)   Number of tokens of each sample.
+    @param numLabels        (int)           Number of predicted
+                                            classifications.
+    """
+    inferenceResults = self.classifier.inferBatch(positions, offsets)
+
+    # Sum the inference results of the tokens of each sample.
+    totals = numpy.zeros((len(tokensPerSample), inferenceResults.shape[1]))
+    tested = tokensPerSample > 0
+    if tested.any():
+      starts = numpy.cumsum(tokensPerSample) - tokensPerSample
+      totals[tested] = numpy.add.reduceat(inferenceResults, starts[tested])
+
+    return [self.getWinningLabels(t, numLabels) for t in totals]
+
 
-      (_, inferenceResult, _, _) = self.classifier.infer(
-        self._densifyPattern(s["bitmap"]))
+  def _getState(self):
+    """The state is the classifier's k and stored prototypes."""
+    return {"k": self.classifier.k}, self.classifier.getPrototypes()
 
-      if totalInferenceResult is None:
-        totalInferenceResult = inferenceResult
-      else:
-        totalInferenceResult += inferenceResult
 
-    return self.getWinningLabels(totalInferenceResult, numLabels)
+  def _setState(self, state, arrays):
+    self.classifier.k = state["k"]
+    self.classifier.setPrototypes(arrays)
@@ -0,0 +1,379 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Batched k-nearest neighbors inference over sparse binary patterns.
+"""
+
+import numpy
+
+from fluent.utils.columnar import raggedIndices
+
+
+
+class SparseKNN(object):
+  """
+  Stores sparse binary prototypes with categories, and computes for queries
+  the same votes as nupic's KNNClassifier.infer() with exact=True and
+  distanceMethod="rawOverlap", where the distance of a prototype is the number
+  of query bits it lacks:
+    - the prototypes at distance zero, i.e. containing every query bit, are the
+      matches of a query;
+    - the first min(k, number of prototypes) matches, in the order they were
+      learned, each add one vote for their category;
+    - the votes of a query are normalized to sum to one, or are all zero if
+      there are no matches.
+
+  Identical (pattern, category) pairs are stored once, as a row with the
+  number of times the pair was learned and the learn order of its first k
+  copies; later copies can never be among the first k matches of a query, so
+  the votes are the same as with one prototype per learn() call, while memory
+  grows with the number of distinct pairs.
+
+  Rather than scanning every row for each query, the rows are indexed by bit
+  (an inverted index), and the overlaps of a whole batch of queries are
+  counted from the index entries of the query bits.
+
+  Prototypes restored by setPrototypes() stay in their CSR arrays, and are
+  split into per-row lists only if more prototypes are learned.
+  """
+
+  def __init__(self, k=1, maxBatchEntries=2**22):
+    """
+    @param k                (int)   Number of matches that vote.
+    @param maxBatchEntries  (int)   Max index entries scored at once; bounds
+                                    the memory of inferBatch().
+    """
+    self.k = k
+    self.maxBatchEntries = maxBatchEntries
+    self.clear()
+
+
+  def clear(self):
+    """Forget all prototypes."""
+    self._rowPositions = []
+    self._rowCategories = []
+    self._rowCounts = []
+    self._rowLearnOrder = []
+    self._rowOfPair = {}
+    self._numLearned = 0
+    self._index = None
+    self._arrays = None
+
+
+  def __len__(self):
+    """Number of prototypes learned, counting repeats."""
+    return self._numLearned
+
+
+  def numRows(self):
+    """Number of distinct (pattern, category) pairs stored."""
+    if self._arrays is not None:
+      return len(self._arrays["categories"])
+    return len(self._rowCategories)
+
+
+  def learn(self, positions, category):
+    """
+    Store a prototype.
+
+    @param positions  (array-like)    Active bits of the pattern.
+    @param category   (int)           Category of the pattern.
+    """
+    if self._arrays is not None:
+      self._splitArrays()
+    positions = numpy.unique(numpy.asarray(positions, dtype=numpy.int64))
+    category = int(category)
+    pair = (category, positions.tostring())
+    row = self._rowOfPair.get(pair)
+    if row is None:
+      row = self._rowOfPair[pair] = len(self._rowCategories)
+      self._rowPositions.append(positions)
+      self._rowCategories.append(category)
+      self._rowCounts.append(0)
+      self._rowLearnOrder.append([])
+
+    self._rowCounts[row] += 1
+    if len(self._rowLearnOrder[row]) < self.k:
+      self._rowLearnOrder[row].append(self._numLearned)
+      # Only the first k copies of a pair can vote, so the index changes only
+      # when one of them is added.
+      self._index = None
+    self._numLearned += 1
+
+
+  def getPrototypes(self):
+    """
+    @return           (dict)          Arrays "positions" and "offsets", where
+        row i is positions[offsets[i]:offsets[i+1]], "categories" and "counts"
+        with the category and number of copies of each row, and "learnOrder"
+        and "learnOffsets" with the learn order of the first k copies of each
+        row, in CSR form.
+    """
+    if self._arrays is not None:
+      arrays = self._arrays
+      return {"positions": arrays["positions"].astype(numpy.int32),
+              "offsets": arrays["offsets"],
+              "categories": arrays["categories"].astype(numpy.int32),
+              "counts": arrays["counts"],
+              "learnOrder": arrays["learnOrder"],
+              "learnOffsets": arrays["learnOffsets"]}
+
+    positions, offsets = self._concatenate(self._rowPositions)
+    learnOrder, learnOffsets = self._concatenate(self._rowLearnOrder)
+    return {"positions": positions.astype(numpy.int32),
+            "offsets": offsets,
+            "categories": numpy.array(self._rowCategories, dtype=numpy.int32),
+            "counts": numpy.array(self._rowCounts, dtype=numpy.int64),
+            "learnOrder": learnOrder,
+            "learnOffsets": learnOffsets}
+
+
+  def setPrototypes(self, arrays):
+    """
+    Replace the prototypes with those returned by getPrototypes(); the index is
+    built from the arrays in bulk. Arrays without "counts", with one row per
+    learned prototype, are also accepted; these are learned one by one, so
+    repeated pairs share a row.
+    """
+    self.clear()
+    if "counts" not in arrays:
+      positions = arrays["positions"]
+      offsets = arrays["offsets"]
+      for i, category in enumerate(arrays["categories"]):
+        self.learn(positions[offsets[i]:offsets[i+1]], category)
+      return
+
+    # Keep the learn order of the first k copies of each row.
+    learnOrder = numpy.asarray(arrays["learnOrder"], dtype=numpy.int64)
+    learnOffsets = numpy.asarray(arrays["learnOffsets"], dtype=numpy.int64)
+    learnSizes = numpy.diff(learnOffsets)
+    ranks = (numpy.arange(len(learnOrder)) -
+             numpy.repeat(learnOffsets[:-1], learnSizes))
+    keptOffsets = numpy.zeros(len(learnOffsets), dtype=numpy.int64)
+    numpy.cumsum(numpy.minimum(learnSizes, self.k), out=keptOffsets[1:])
+
+    self._arrays = {
+      "positions": numpy.asarray(arrays["positions"], dtype=numpy.int64),
+      "offsets": numpy.asarray(arrays["offsets"], dtype=numpy.int64),
+      "categories": numpy.asarray(arrays["categories"], dtype=numpy.int64),
+      "counts": numpy.asarray(arrays["counts"], dtype=numpy.int64),
+      "learnOrder": learnOrder[ranks < self.k],
+      "learnOffsets": keptOffsets}
+    self._numLearned = int(self._arrays["counts"].sum())
+
+
+  def _splitArrays(self):
+    """Move the prototypes restored by setPrototypes() into per-row lists."""
+    arrays = self._arrays
+    self._arrays = None
+    self._rowPositions = numpy.split(arrays["positions"],
+                                     arrays["offsets"][1:-1])
+    self._rowCategories = arrays["categories"].tolist()
+    self._rowCounts = arrays["counts"].tolist()
+    self._rowLearnOrder = [
+      order.tolist() for order in numpy.split(arrays["learnOrder"],
+                                              arrays["learnOffsets"][1:-1])]
+    self._rowOfPair = {(category, positions.tostring()): row
+                       for row, (category, positions) in enumerate(
+                         zip(self._rowCategories, self._rowPositions))}
+
+
+  def infer(self, positions):
+    """
+    @param positions  (array-like)    Active bits of the query.
+    @return           (numpy array)   Normalized votes per category.
+    """
+    positions = numpy.asarray(positions, dtype=numpy.int64)
+    return self.inferBatch(positions, numpy.array([0, len(positions)]))[0]
+
+
+  def inferBatch(self, positions, offsets):
+    """
+    Compute the votes of a batch of queries.
+
+    @param positions  (numpy array)   Concatenated active bits of the queries;
+                                      the bits of a query must be distinct.
+    @param offsets    (numpy array)   Offsets of each query in positions, in
+                                      CSR form.
+    @return           (numpy array)   Normalized votes of shape (number of
+        queries, number of categories), where the number of categories is the
+        max category learned plus one (one if nothing was learned).
+    """
+    numQueries = len(offsets) - 1
+    index = self._getIndex()
+    categories = index["categories"]
+    numCategories = int(categories.max()) + 1 if len(categories) else 1
+    votes = numpy.zeros((numQueries, numCategories))
+    if not len(categories) or not numQueries:
+      return votes
+
+    positions = numpy.asarray(positions, dtype=numpy.int64)
+    offsets = numpy.asarray(offsets, dtype=numpy.int64)
+
+    # Bits outside the indexed range cannot be in any prototype.
+    numBits = len(index["bitOffsets"]) - 1
+    outside = (positions < 0) | (positions >= numBits)
+    if outside.any():
+      positions = numpy.where(outside, 0, positions)
+
+    # Number of index entries read for each query; split the queries into
+    # chunks that read about maxBatchEntries entries each.
+    entriesPerBit = numpy.diff(index["bitOffsets"])[positions]
+    entriesPerBit[outside] = 0
+    entriesBefore = numpy.concatenate(([0], numpy.cumsum(entriesPerBit)))
+    entriesBefore = entriesBefore[offsets]
+
+    start = 0
+    while start < numQueries:
+      end = numpy.searchsorted(entriesBefore,
+                               entriesBefore[start] + self.maxBatchEntries,
+                               side="right") - 1
+      end = min(max(end, start + 1), numQueries)
+      self._votes(positions, offsets, outside, start, end, votes)
+      start = end
+
+    totals = votes.sum(axis=1)
+    matched = totals > 0
+    votes[matched] /= totals[matched, numpy.newaxis]
+    return votes
+
+
+  def _votes(self, positions, offsets, outside, start, end, votes):
+    """Add the votes of queries start to end (unnormalized) into votes."""
+    index = self._getIndex()
+    numRows = len(index["categories"])
+
+    queryBits = positions[offsets[start]:offsets[end]]
+    querySizes = numpy.diff(offsets[start:end + 1])
+    queryOfBit = numpy.repeat(numpy.arange(end - start), querySizes)
+    queryBits = queryBits[~outside[offsets[start]:offsets[end]]]
+    queryOfBit = queryOfBit[~outside[offsets[start]:offsets[end]]]
+
+    # Overlap of each (query, row) pair sharing a bit, from the sorted pair
+    # keys; a row matches if it has every bit of the query.
+    entryIdx, entryOffsets = raggedIndices(index["bitOffsets"], queryBits)
+    keys = (numpy.repeat(queryOfBit, numpy.diff(entryOffsets)) * numRows +
+            index["rows"][entryIdx])
+    keys, overlaps = numpy.unique(keys, return_counts=True)
+    matches = keys[overlaps == querySizes[keys // numRows]]
+    matchRows = matches % numRows
+
+    # Each matching row stands for the copies of its pair that can vote.
+    learnIdx, learnOffsets = raggedIndices(index["learnOffsets"], matchRows)
+    matchQueries = numpy.repeat(matches // numRows, numpy.diff(learnOffsets))
+    matchLearnOrder = index["learnOrder"][learnIdx]
+    matchRows = numpy.repeat(matchRows, numpy.diff(learnOffsets))
+
+    # Queries without bits match every prototype.
+    empty = numpy.flatnonzero(querySizes == 0)
+    if len(empty):
+      firstLearned = index["firstLearned"]
+      matchQueries = numpy.concatenate(
+        (matchQueries, numpy.repeat(empty, len(firstLearned))))
+      matchLearnOrder = numpy.concatenate(
+        (matchLearnOrder, numpy.tile(numpy.arange(len(firstLearned)),
+                                     len(empty))))
+      matchRows = numpy.concatenate(
+        (matchRows, numpy.tile(firstLearned, len(empty))))
+
+    self._addFirstKVotes(matchQueries, matchLearnOrder,
+                         index["categories"][matchRows],
+                         votes[start:end])
+
+
+  def _addFirstKVotes(self, queries, learnOrder, categories, votes):
+    """
+    For each query, add a vote for the category of each of its first k
+    matches by learnOrder.
+    """
+    order = numpy.lexsort((learnOrder, queries))
+    queries = queries[order]
+    # Rank of each match among the matches of its query.
+    groupStarts = numpy.flatnonzero(
+      numpy.concatenate(([True], queries[1:] != queries[:-1])))
+    groupSizes = numpy.diff(numpy.concatenate((groupStarts, [len(queries)])))
+    ranks = numpy.arange(len(queries)) - numpy.repeat(groupStarts, groupSizes)
+    voting = ranks < min(self.k, len(self))
+
+    numCategories = votes.shape[1]
+    votes += numpy.bincount(
+      queries[voting] * numCategories + categories[order][voting],
+      minlength=votes.size).reshape(votes.shape)
+
+
+  def _getIndex(self):
+    """Build the row arrays and the bit -> rows index if stale."""
+    if self._index is None:
+      if self._arrays is not None:
+        arrays = self._arrays
+      else:
+        positions, offsets = self._concatenate(self._rowPositions)
+        learnOrder, learnOffsets = self._concatenate(self._rowLearnOrder)
+        arrays = {"positions": positions,
+                  "offsets": offsets,
+                  "categories": numpy.array(self._rowCategories,
+                                            dtype=numpy.int64),
+                  "learnOrder": learnOrder,
+                  "learnOffsets": learnOffsets}
+      self._index = self._buildIndex(arrays, self.k)
+    return self._index
+
+
+  @staticmethod
+  def _concatenate(rows):
+    """Return the concatenated values and the offsets of a list of rows."""
+    offsets = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(r) for r in rows], out=offsets[1:])
+    values = (numpy.concatenate(rows).astype(numpy.int64) if offsets[-1]
+              else numpy.zeros(0, dtype=numpy.int64))
+    return values, offsets
+
+
+  @staticmethod
+  def _buildIndex(arrays, k):
+    """Build the index from the rows and their learn orders in CSR form."""
+    positions = arrays["positions"]
+    offsets = arrays["offsets"]
+    learnOrder = arrays["learnOrder"]
+    learnOffsets = arrays["learnOffsets"]
+    numRows = len(offsets) - 1
+    numBits = int(positions.max()) + 1 if len(positions) else 1
+
+    # Rows of each bit, in row order.
+    rowOfBit = numpy.repeat(numpy.arange(numRows),
+                            numpy.diff(offsets))
+    order = numpy.argsort(positions, kind="mergesort")
+    bitOffsets = numpy.zeros(numBits + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(positions, minlength=numBits),
+                 out=bitOffsets[1:])
+
+    # Rows of the first k prototypes learned, which empty queries match.
+    rowOfLearned = numpy.repeat(numpy.arange(numRows),
+                                numpy.diff(learnOffsets))
+    first = learnOrder < k
+    firstLearned = rowOfLearned[first][numpy.argsort(learnOrder[first])]
+
+    return {"categories": arrays["categories"],
+            "rows": rowOfBit[order],
+            "bitOffsets": bitOffsets,
+            "learnOrder": learnOrder,
+            "learnOffsets": learnOffsets,
+            "firstLearned": firstLearned}
@@ -0,0 +1,233 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Micro-batching of online classification requests. Samples submitted from any
+thread are queued, and a single worker thread collects them into batches of up
+to maxBatchSize samples, waiting at most maxWaitMs after the first sample of a
+batch arrives. Each batch goes through the model's encodeBatch() and
+testBatch() methods, so models with bulk encoding and inference paths amortize
+their per-call overhead across concurrent requests.
+
+Larger maxBatchSize and maxWaitMs values trade latency for throughput; the
+scheduler stats report both the batch sizes and the time samples spend in the
+queue so the tradeoff can be measured.
+"""
+
+import Queue
+import threading
+import time
+
+
+
+_STOP = object()
+
+
+
+class BatchFuture(object):
+  """The pending result of one submitted sample."""
+
+  def __init__(self):
+    self._event = threading.Event()
+    self._result = None
+    self._exception = None
+    self.latency = None
+
+
+  def done(self):
+    return self._event.is_set()
+
+
+  def result(self, timeout=None):
+    """
+    Block until the sample is classified, and return the predicted labels.
+    Raises the exception from the model if the batch failed.
+    """
+    if not self._event.wait(timeout):
+      raise RuntimeError("Timed out waiting for the classification result.")
+    if self._exception is not None:
+      raise self._exception
+    return self._result
+
+
+  def setResult(self, result, latency):
+    self._result = result
+    self.latency = latency
+    self._event.set()
+
+
+  def setException(self, exception):
+    self._exception = exception
+    self._event.set()
+
+
+
+class MicroBatchScheduler(object):
+  """Collects samples into batches for a ClassificationModel."""
+
+  def __init__(self, model, maxBatchSize=32, maxWaitMs=2.0, numLabels=3):
+    """
+    @param model          (ClassificationModel)   Trained model; only the
+                                                  worker thread uses it.
+    @param maxBatchSize   (int)     Max number of samples per batch.
+    @param maxWaitMs      (float)   Max time to wait for more samples after
+                                    the first sample of a batch arrives.
+    @param numLabels      (int)     Max number of labels per sample.
+    """
+    if maxBatchSize < 1:
+      raise ValueError("maxBatchSize must be 1 or greater.")
+    if maxWaitMs < 0:
+      raise ValueError("maxWaitMs cannot be negative.")
+
+    self.model = model
+    self.maxBatchSize = maxBatchSize
+    self.maxWaitMs = maxWaitMs
+    self.numLabels = numLabels
+
+    self._queue = Queue.Queue()
+    self._thread = None
+    self._statsLock = threading.Lock()
+    self._stats = {"batches": 0,
+                   "samples": 0,
+                   "queueSeconds": 0.0,
+                   "encodeSeconds": 0.0,
+                   "inferSeconds": 0.0,
+                   "largestBatch": 0}
+
+
+  def start(self):
+    """Start the worker thread."""
+    if self._thread is None:
+      self._thread = threading.Thread(target=self._run,
+                                      name="MicroBatchScheduler")
+      self._thread.daemon = True
+      self._thread.start()
+
+
+  def stop(self):
+    """Classify the samples already submitted, then stop the worker thread."""
+    if self._thread is not None:
+      self._queue.put(_STOP)
+      self._thread.join()
+      self._thread = None
+
+
+  def submit(self, sample):
+    """
+    Queue one tokenized sample for classification.
+
+    @param sample         (list)          Tokenized sample.
+    @return               (BatchFuture)   Resolves to the predicted labels.
+    """
+    if self._thread is None:
+      raise RuntimeError("The scheduler is not running; call start() first.")
+    future = BatchFuture()
+    self._queue.put((time.time(), sample, future))
+    return future
+
+
+  def classify(self, samples, timeout=None):
+    """Submit the samples and block until all of them are classified."""
+    futures = [self.submit(s) for s in samples]
+    return [f.result(timeout) for f in futures], futures
+
+
+  def getStats(self):
+    """
+    @return               (dict)      Totals, the mean batch size, the mean
+        seconds each sample waited in the queue, the amortized encode and infer
+        seconds per sample, and the throughput while the worker was busy.
+    """
+    with self._statsLock:
+      stats = dict(self._stats)
+    samples = float(stats["samples"]) or 1.0
+    stats["meanBatchSize"] = (stats["samples"] / float(stats["batches"])
+                              if stats["batches"] else 0.0)
+    for stage in ("queue", "encode", "infer"):
+      stats[stage + "SecondsPerSample"] = stats[stage + "Seconds"] / samples
+    busySeconds = stats["encodeSeconds"] + stats["inferSeconds"]
+    stats["samplesPerBusySecond"] = (stats["samples"] / busySeconds
+                                     if busySeconds else 0.0)
+    return stats
+
+
+  def _run(self):
+    stopping = False
+    while not stopping:
+      item = self._queue.get()
+      if item is _STOP:
+        break
+
+      batch = [item]
+      deadline = time.time() + self.maxWaitMs / 1000.0
+      while len(batch) < self.maxBatchSize:
+        remaining = deadline - time.time()
+        try:
+          if remaining > 0:
+            item = self._queue.get(timeout=remaining)
+          else:
+            item = self._queue.get_nowait()
+        except Queue.Empty:
+          break
+        if item is _STOP:
+          stopping = True
+          break
+        batch.append(item)
+
+      try:
+        self._dispatch(batch)
+      except Exception as e:
+        # Keep the worker alive, and never leave a future of the batch pending.
+        for _, _, future in batch:
+          if not future.done():
+            future.setException(e)
+
+
+  def _dispatch(self, batch):
+    """Encode and test one batch, and resolve its futures."""
+    start = time.time()
+    try:
+      patterns = self.model.encodeBatch([sample for _, sample, _ in batch])
+      inferStart = time.time()
+      predictions = self.model.testBatch(patterns, self.numLabels)
+      end = time.time()
+      if len(predictions) != len(batch):
+        raise RuntimeError("The model returned {0} predictions for a batch of "
+                           "{1} samples.".format(len(predictions), len(batch)))
+    except Exception as e:
+      for _, _, future in batch:
+        future.setException(e)
+      return
+
+    queueSeconds = sum(start - submitted for submitted, _, _ in batch)
+    with self._statsLock:
+      self._stats["batches"] += 1
+      self._stats["samples"] += len(batch)
+      self._stats["queueSeconds"] += queueSeconds
+      self._stats["encodeSeconds"] += inferStart - start
+      self._stats["inferSeconds"] += end - inferStart
+      self._stats["largestBatch"] = max(self._stats["largestBatch"],
+                                        len(batch))
+
+    for (submitted, _, future), predicted in zip(batch, predictions):
+      future.setResult(predicted, {"queue": start - submitted,
+                                   "encode": inferStart - start,
+                                   "infer": end - inferStart,
+                                   "batchSize": len(batch)})
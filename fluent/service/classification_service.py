@@ -0,0 +1,345 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Long-running classification service. A trained model is loaded once, and
+texts are classified over HTTP on a local port.
+
+EXAMPLE: serve a model saved by the experiment runner...
+  python fluent/service/classification_service.py
+  fluent/experiments/results/survey_baseline_example/ClassificationModelRandomSDR
+
+then classify texts with a POST request to /classify:
+  curl -d '{"texts": ["the kitchen smells"]}' http://localhost:8080/classify
+
+and get the per-stage latency stats with a GET request to /stats.
+"""
+
+import argparse
+import BaseHTTPServer
+import inspect
+import os
+import SocketServer
+import threading
+import time
+
+from fluent.service.batch_scheduler import MicroBatchScheduler
+from fluent.utils.label_vocabulary import LabelVocabulary
+from fluent.utils.text_preprocess import TextPreprocess
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+class StageStats(object):
+  """Latency statistics for one stage of the classification pipeline."""
+
+  def __init__(self):
+    self.count = 0
+    self.totalSeconds = 0.0
+    self.maxSeconds = 0.0
+
+
+  def add(self, seconds, count=1):
+    """Record the time to process count items."""
+    self.count += count
+    self.totalSeconds += seconds
+    self.maxSeconds = max(self.maxSeconds, seconds)
+
+
+  def toDict(self):
+    return {"count": self.count,
+            "totalSeconds": self.totalSeconds,
+            "maxSeconds": self.maxSeconds,
+            "meanSecondsPerItem": (self.totalSeconds / self.count
+                                   if self.count else 0.0)}
+
+
+
+class ClassificationService(object):
+  """
+  Classifies texts with a trained ClassificationModel. Texts are tokenized in
+  the calling thread, then encoded and tested by a MicroBatchScheduler, which
+  batches the samples of concurrent calls together. The latency of each stage
+  is recorded.
+  """
+
+  stages = ("preprocess", "queue", "encode", "infer")
+
+  def __init__(self, model, preprocess=False, numLabels=3, labelRefs=None,
+               maxBatchSize=32, maxWaitMs=2.0):
+    """
+    @param model          (ClassificationModel)   Trained model.
+    @param preprocess     (bool)    Tokenize with the same preprocessing as
+                                    the experiment runners' preprocess option.
+    @param numLabels      (int)     Max number of labels per text.
+    @param labelRefs      (list)    Label strings indexed by label id; if
+                                    given, results include the label strings.
+    @param maxBatchSize   (int)     See MicroBatchScheduler.
+    @param maxWaitMs      (float)   See MicroBatchScheduler.
+    """
+    self.model = model
+    self.preprocess = preprocess
+    self.numLabels = numLabels
+    self.labelRefs = labelRefs
+
+    self.texter = TextPreprocess()
+    self.stats = {stage: StageStats() for stage in self.stages}
+    self._statsLock = threading.Lock()
+
+    self.scheduler = MicroBatchScheduler(model,
+                                         maxBatchSize=maxBatchSize,
+                                         maxWaitMs=maxWaitMs,
+                                         numLabels=numLabels)
+    self.scheduler.start()
+
+
+  def close(self):
+    """Stop the scheduler once the pending texts are classified."""
+    self.scheduler.stop()
+
+
+  def _tokenize(self, text):
+    return self.texter.tokenizeSample(text, self.preprocess)
+
+
+  def classify(self, texts):
+    """
+    Classify a batch of texts.
+
+    @param texts          (list)    Text strings.
+    @return               (tuple)   A list with the predicted label ids (a list
+        of ints) for each text, and a dict of the seconds spent in each stage;
+        for the scheduler stages this is the slowest of the texts.
+    """
+    texts = [t.encode("utf-8") if isinstance(t, unicode) else t for t in texts]
+
+    start = time.time()
+    samples = [self._tokenize(t) for t in texts]
+    latencies = {"preprocess": time.time() - start}
+
+    predictions, futures = self.scheduler.classify(samples)
+    for stage in ("queue", "encode", "infer"):
+      latencies[stage] = max([f.latency[stage] for f in futures] or [0.0])
+
+    with self._statsLock:
+      for stage, seconds in latencies.iteritems():
+        self.stats[stage].add(seconds, len(texts))
+
+    return [[int(l) for l in p] for p in predictions], latencies
+
+
+  def formatResults(self, texts, predictions):
+    """Return JSON-serializable results for the texts and predicted ids."""
+    results = []
+    for text, labelIds in zip(texts, predictions):
+      result = {"text": text, "labels": labelIds}
+      if self.labelRefs is not None:
+        result["labelNames"] = [self.labelRefs[l] for l in labelIds]
+      results.append(result)
+    return results
+
+
+  def getStats(self):
+    with self._statsLock:
+      stats = {stage: s.toDict() for stage, s in self.stats.iteritems()}
+    stats["scheduler"] = self.scheduler.getStats()
+    return stats
+
+
+
+class ClassificationRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """
+  Handles the service's HTTP endpoints:
+    - POST /classify with a JSON body {"texts": [str, ...]} or {"text": str}
+    - GET /stats
+  """
+
+  def do_POST(self):
+    if self.path != "/classify":
+      self._respond(404, {"error": "Unknown endpoint."})
+      return
+
+    try:
+      length = int(self.headers.getheader("content-length", 0))
+      body = json.loads(self.rfile.read(length))
+      texts = body["texts"] if "texts" in body else [body["text"]]
+      if not (isinstance(texts, list) and
+              all(isinstance(t, basestring) for t in texts)):
+        raise TypeError("texts must be a list of strings.")
+    except (ValueError, KeyError, TypeError):
+      self._respond(400, {"error": "Expected a JSON body with \"texts\", a "
+                                   "list of strings."})
+      return
+
+    service = self.server.service
+    try:
+      predictions, latencies = service.classify(texts)
+      results = service.formatResults(texts, predictions)
+    except Exception as e:
+      self._respond(500, {"error": "Classification failed: {0!r}".format(e)})
+      return
+    self._respond(200, {"results": results, "latency": latencies})
+
+
+  def do_GET(self):
+    if self.path != "/stats":
+      self._respond(404, {"error": "Unknown endpoint."})
+      return
+    self._respond(200, self.server.service.getStats())
+
+
+  def _respond(self, status, content):
+    body = json.dumps(content)
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+
+  def log_message(self, *args):
+    if self.server.verbosity > 1:
+      BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, *args)
+
+
+
+class ClassificationServer(SocketServer.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+  """HTTP server with one thread per connection, wrapping a service."""
+
+  daemon_threads = True
+
+  def __init__(self, address, service, verbosity=1):
+    BaseHTTPServer.HTTPServer.__init__(self, address,
+                                       ClassificationRequestHandler)
+    self.service = service
+    self.verbosity = verbosity
+
+
+
+def loadModel(modelDir, modelName, modelModuleName, numLabels=3, verbosity=1,
+              stubEncoder=False):
+  """Instantiate the model class and load its saved state from modelDir."""
+  try:
+    module = __import__(modelModuleName, {}, {}, modelName)
+    modelClass = getattr(module, modelName)
+  except ImportError:
+    raise RuntimeError("Could not find model class \'{0}\' to import."
+                       .format(modelName))
+
+  kwargs = {"verbosity": verbosity, "numLabels": numLabels}
+  # Only models that encode through an encoder object take one; the random
+  # SDR model makes its own encodings.
+  if stubEncoder and "encoder" in inspect.getargspec(modelClass.__init__).args:
+    from fluent.encoders.stub_encoder import StubEncoder
+    kwargs["encoder"] = StubEncoder()
+
+  model = modelClass(**kwargs)
+  model.load(modelDir)
+  return model
+
+
+def run(args):
+  model = loadModel(args.modelDir,
+                    args.modelName,
+                    args.modelModuleName,
+                    numLabels=args.numLabels,
+                    verbosity=args.verbosity,
+                    stubEncoder=args.stubEncoder)
+
+  # The experiment runners save the label strings next to the model.
+  labelRefs = None
+  vocabularyPath = os.path.join(args.modelDir, "labels.json")
+  if os.path.isfile(vocabularyPath):
+    labelRefs = LabelVocabulary.load(vocabularyPath).labels
+
+  service = ClassificationService(model,
+                                  preprocess=args.textPreprocess,
+                                  numLabels=args.numLabels,
+                                  labelRefs=labelRefs,
+                                  maxBatchSize=args.maxBatchSize,
+                                  maxWaitMs=args.maxWaitMs)
+  server = ClassificationServer((args.host, args.port), service,
+                                verbosity=args.verbosity)
+
+  print "Serving \'{0}\' at http://{1}:{2}".format(
+    args.modelDir, *server.server_address)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    service.close()
+
+
+if __name__ == "__main__":
+
+  parser = argparse.ArgumentParser()
+  parser.add_argument("modelDir",
+                      help="Directory of the saved model.")
+  parser.add_argument("-m", "--modelName",
+                      default="ClassificationModelRandomSDR",
+                      type=str,
+                      help="Name of model class.")
+  parser.add_argument("-mm", "--modelModuleName",
+                      default="fluent.models.classify_random_sdr",
+                      type=str,
+                      help="Model module (location of model class).")
+  parser.add_argument("--host",
+                      default="localhost",
+                      help="Interface to listen on.")
+  parser.add_argument("--port",
+                      default=8080,
+                      type=int,
+                      help="Port to listen on.")
+  parser.add_argument("--numLabels",
+                      default=3,
+                      type=int,
+                      help="Max number of classes returned per text.")
+  parser.add_argument("--maxBatchSize",
+                      default=32,
+                      type=int,
+                      help="Max number of texts encoded and tested together.")
+  parser.add_argument("--maxWaitMs",
+                      default=2.0,
+                      type=float,
+                      help="Max milliseconds to wait for more texts to fill a "
+                           "batch.")
+  parser.add_argument("--textPreprocess",
+                      default=False,
+                      action="store_true",
+                      help="Preprocess the texts before encoding.")
+  parser.add_argument("--stubEncoder",
+                      default=False,
+                      action="store_true",
+                      help="Use the offline StubEncoder in place of the "
+                           "Cortical.io encoder.")
+  parser.add_argument("-v", "--verbosity",
+                      default=1,
+                      type=int,
+                      help="verbosity > 1 logs every request.")
+
+  args = parser.parse_args()
+  run(args)
@@ -0,0 +1,203 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Helpers for append-only columnar files. A column is a raw binary file of a
+single numpy dtype; a ragged column is a values column plus an int64 offsets
+column, i.e. the CSR layout, such that row i is values[offsets[i]:offsets[i+1]].
+Columns are written incrementally and read back with numpy.memmap.
+"""
+
+import numpy
+import os
+
+
+
+class ColumnWriter(object):
+  """Appends numpy values of a fixed dtype to a raw binary file."""
+
+  def __init__(self, path, dtype, append=False):
+    """
+    @param path       (str)           File to write.
+    @param dtype      (numpy dtype)   Type of every value in the column.
+    @param append     (bool)          Keep existing values in the file.
+    """
+    self.path = path
+    self.dtype = numpy.dtype(dtype)
+    self.length = 0
+    if append and os.path.isfile(path):
+      self.length = os.path.getsize(path) // self.dtype.itemsize
+    self._file = open(path, "ab" if append else "wb")
+
+
+  def append(self, values):
+    """Append a scalar or an array of values."""
+    values = numpy.asarray(values, dtype=self.dtype).ravel()
+    self._file.write(values.tobytes())
+    self.length += values.size
+
+
+  def truncate(self, length):
+    """Drop any values after the first length values, e.g. a partial write."""
+    self._file.flush()
+    self._file.truncate(length * self.dtype.itemsize)
+    self._file.seek(0, os.SEEK_END)
+    self.length = length
+
+
+  def flush(self):
+    self._file.flush()
+
+
+  def close(self):
+    if not self._file.closed:
+      self._file.close()
+
+
+
+class RaggedWriter(object):
+  """Appends variable-length rows to a values column and an offsets column."""
+
+  def __init__(self, dirPath, name, dtype, append=False):
+    """
+    @param dirPath    (str)           Directory holding the column files.
+    @param name       (str)           Column name; files are <name>.values and
+                                      <name>.offsets.
+    @param dtype      (numpy dtype)   Type of the row values.
+    @param append     (bool)          Keep existing rows in the files.
+    """
+    self.values = ColumnWriter(
+      os.path.join(dirPath, name + ".values"), dtype, append)
+    self.offsets = ColumnWriter(
+      os.path.join(dirPath, name + ".offsets"), numpy.int64, append)
+    if self.offsets.length == 0:
+      self.offsets.append(0)
+
+
+  def __len__(self):
+    return self.offsets.length - 1
+
+
+  def append(self, row):
+    """Append one row (an array-like of values) and return its index."""
+    row = numpy.asarray(row, dtype=self.values.dtype).ravel()
+    self.values.append(row)
+    self.offsets.append(self.values.length)
+    return len(self) - 1
+
+
+  def truncate(self, numRows):
+    """Drop all rows after the first numRows."""
+    self.offsets.flush()
+    with open(self.offsets.path, "rb") as f:
+      f.seek(numRows * self.offsets.dtype.itemsize)
+      end = numpy.fromfile(f, dtype=numpy.int64, count=1)[0]
+    self.values.truncate(int(end))
+    self.offsets.truncate(numRows + 1)
+
+
+  def flush(self):
+    self.values.flush()
+    self.offsets.flush()
+
+
+  def close(self):
+    self.values.close()
+    self.offsets.close()
+
+
+
+def readColumn(path, dtype, length=None, mode="r"):
+  """
+  Memory-map a column file.
+
+  @param path       (str)           Column file.
+  @param dtype      (numpy dtype)   Type of the values.
+  @param length     (int)           Number of values to map; defaults to all of
+                                    the values in the file. Trailing values
+                                    beyond length (e.g. an interrupted append)
+                                    are ignored.
+  @return           (numpy array)   Read-only view of the column.
+  """
+  dtype = numpy.dtype(dtype)
+  available = os.path.getsize(path) // dtype.itemsize
+  if length is None:
+    length = available
+  elif length > available:
+    raise ValueError("Column {0} has {1} values, expected at least {2}."
+                     .format(path, available, length))
+
+  if length == 0:
+    # numpy.memmap cannot map an empty file.
+    return numpy.zeros(0, dtype=dtype)
+
+  return numpy.memmap(path, dtype=dtype, mode=mode, shape=(length,))
+
+
+def readRagged(dirPath, name, dtype, numRows=None):
+  """
+  Memory-map a ragged column written by RaggedWriter.
+
+  @return           (tuple)         The values and offsets arrays; row i is
+                                    values[offsets[i]:offsets[i+1]].
+  """
+  offsets = readColumn(os.path.join(dirPath, name + ".offsets"),
+                       numpy.int64,
+                       None if numRows is None else numRows + 1)
+  values = readColumn(os.path.join(dirPath, name + ".values"),
+                      dtype,
+                      int(offsets[-1]) if len(offsets) else 0)
+  return values, offsets
+
+
+def raggedIndices(offsets, rows):
+  """
+  Locate the values of rows of a ragged column.
+
+  @param offsets    (numpy array)   Offsets of the ragged column.
+  @param rows       (array-like)    Indices of the rows, in order.
+  @return           (tuple)         The indices into the values column of
+                                    each value of the rows, concatenated, and
+                                    the offsets of the rows within them.
+  """
+  rows = numpy.asarray(rows, dtype=numpy.int64)
+  starts = numpy.asarray(offsets[rows], dtype=numpy.int64)
+  lengths = numpy.asarray(offsets[rows + 1], dtype=numpy.int64) - starts
+  newOffsets = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+  numpy.cumsum(lengths, out=newOffsets[1:])
+
+  # Each value's index is the start of its row plus its position in the row.
+  valueIdx = (numpy.repeat(starts - newOffsets[:-1], lengths) +
+              numpy.arange(newOffsets[-1], dtype=numpy.int64))
+  return valueIdx, newOffsets
+
+
+def takeRagged(values, offsets, rows):
+  """
+  Gather rows of a ragged column into new, contiguous CSR arrays.
+
+  @param values     (numpy array)   Values of the ragged column.
+  @param offsets    (numpy array)   Offsets of the ragged column.
+  @param rows       (array-like)    Indices of the rows to gather, in order.
+  @return           (tuple)         The values and offsets of the gathered
+                                    rows.
+  """
+  valueIdx, newOffsets = raggedIndices(offsets, rows)
+  return numpy.asarray(values[valueIdx]), newOffsets
@@ -21,7 +21,9 @@
 
 """Data splitting is used to partition data into train and test sets."""
 
-import random
+import numpy
+
+from fluent.utils.columnar import raggedIndices
 
 # from nupic.bindings.math import Random
 
@@ -39,7 +41,50 @@ class DataSplit(object):
                                           (training, test) where each element is
                                           a list of elements from samples.
     """
-    return NotImplementedError()
+    raise NotImplementedError
+
+
+  def splitIndices(self, numSamples, randomize=False, seed=None):
+    """Split the indices of numSamples samples into train/test sets.
+
+    @param numSamples     (int)           Number of samples.
+    @param randomize      (bool)          Shuffle the indices before splitting.
+    @param seed           (int)           Seed for the shuffle.
+    @return               (iterable)      Splits where each split is a 2-tuple
+                                          (training, test) of numpy arrays of
+                                          sample indices.
+    """
+    raise NotImplementedError
+
+
+
+def _order(numSamples, randomize, seed):
+  """Return the sample indices, shuffled if randomize."""
+  if randomize:
+    # Without a seed, use the global generator so numpy.random.seed() applies.
+    rng = numpy.random if seed is None else numpy.random.RandomState(seed)
+    return rng.permutation(numSamples)
+  return numpy.arange(numSamples)
+
+
+
+def partitionIndices(numSamples, trainSize, orderedSplit=False, seed=None):
+  """Split the indices of numSamples samples into trainSize training samples
+  and the remaining test samples.
+
+  @param numSamples     (int)           Number of samples.
+  @param trainSize      (int)           Number of training samples.
+  @param orderedSplit   (bool)          Train on the first trainSize samples,
+                                        instead of a random selection.
+  @param seed           (int)           Seed for the random selection.
+  @return               (tuple)         Numpy arrays of the (training, test)
+                                        indices; the test indices are in
+                                        sample order.
+  """
+  trainIdx = _order(numSamples, not orderedSplit, seed)[:trainSize]
+  testMask = numpy.ones(numSamples, dtype=bool)
+  testMask[trainIdx] = False
+  return trainIdx, numpy.flatnonzero(testMask)
 
 
 
@@ -86,32 +131,42 @@ class KFolds(DataSplit):
                                           training/test pair contains all
                                           elements from samples.
     """
-    if len(samples) < self.k:
+    samples = list(samples)
+    return [([samples[i] for i in trainIdx], [samples[i] for i in testIdx])
+            for trainIdx, testIdx in self.splitIndices(len(samples),
+                                                       randomize)]
+
+
+  def splitIndices(self, numSamples, randomize=False, seed=None):
+    """Split the indices of numSamples samples into k train/test sets.
+
+    The splits are generated one fold at a time: the test indices are a view
+    of the (shuffled) index array, and only the training indices of the
+    current fold are allocated.
+
+    @param numSamples     (int)           Number of samples.
+    @param randomize      (bool)          Shuffle the indices before splitting.
+    @param seed           (int)           Seed for the shuffle.
+    @return               (generator)     Yields a (training, test) tuple of
+                                          numpy index arrays for each fold.
+    """
+    if numSamples < self.k:
       raise ValueError(
           "Must have as many samples as number of folds %i" % self.k)
 
-    if randomize:
-      random.shuffle(samples)
+    order = _order(numSamples, randomize, seed)
+    return self._folds(order)
 
-    # Aggregate each train/test set to return
-    trainTestSplits = []
-
-    # Make sure we have an indexable list
-    samples = list(samples)
 
-    numTest = len(samples) / self.k
+  def _folds(self, order):
+    numTest = len(order) / self.k
     for i in xrange(self.k):
       # Determine the range for the test data for this fold
       start = i * numTest
       end = (i + 1) * numTest
 
-      # Split the samples into train and test sets
-      testSamples = samples[start:end]
-      trainSamples = samples[:start] + samples[end:]
-
-      trainTestSplits.append((trainSamples, testSamples))
-
-    return trainTestSplits
+      yield (numpy.concatenate((order[:start], order[end:])),
+             order[start:end])
 
 
 
@@ -136,14 +191,217 @@ class StandardSplit(DataSplit):
                                           where each element of the 2-tuple is a
                                           list of samples.
     """
-    if len(samples) < 2:
+    samples = list(samples)
+    trainIdx, testIdx = self.splitIndices(len(samples), randomize)
+    return ([samples[i] for i in trainIdx], [samples[i] for i in testIdx])
+
+
+  def splitIndices(self, numSamples, randomize=False, seed=None):
+    """Split the indices of numSamples samples into one train/test set.
+
+    @param numSamples     (int)           Number of samples.
+    @param randomize      (bool)          Shuffle the indices before splitting.
+    @param seed           (int)           Seed for the shuffle.
+    @return               (tuple)         Numpy arrays of the (training, test)
+                                          indices; both are views of one index
+                                          array.
+    """
+    if numSamples < 2:
       raise ValueError("Must have at least two samples for train/test split.")
 
-    if randomize:
-      random.shuffle(samples)
+    order = _order(numSamples, randomize, seed)
+    sliceIdx = int(self.trainPortion*numSamples)
+    return (order[:sliceIdx], order[sliceIdx:])
+
+
+
+def _foldSplits(folds, k):
+  """Yield the (training, test) indices of each fold in a fold assignment."""
+  for i in xrange(k):
+    inFold = folds == i
+    yield numpy.flatnonzero(~inFold), numpy.flatnonzero(inFold)
+
+
 
-    # Make sure we have an indexable list
+class StratifiedKFolds(KFolds):
+  """k-folds cross validation where each fold has the same proportion of each
+  class as the full set of samples, for samples with a single class each.
+
+  Samples are sorted by class (stably, after an optional shuffle) and dealt to
+  the folds in turn, so the count of each class in any two folds differs by at
+  most one.
+  """
+
+
+  def split(self, samples, labels, randomize=False):
+    """Split the given samples into k stratified train/test sets.
+
+    @param samples        (list)          Sample elements of any type.
+    @param labels         (array-like)    Class index of each sample.
+    @return               (list)          Splits as returned by KFolds.split().
+    """
+    samples = list(samples)
+    return [([samples[i] for i in trainIdx], [samples[i] for i in testIdx])
+            for trainIdx, testIdx in self.splitIndices(labels, randomize)]
+
+
+  def splitIndices(self, labels, randomize=False, seed=None):
+    """Split the sample indices into k stratified train/test sets.
+
+    @param labels         (array-like)    Class index of each sample.
+    @param randomize      (bool)          Shuffle the samples of each class.
+    @param seed           (int)           Seed for the shuffle.
+    @return               (generator)     Yields a (training, test) tuple of
+                                          numpy index arrays for each fold.
+    """
+    labels = numpy.asarray(labels)
+    if len(labels) < self.k:
+      raise ValueError(
+          "Must have as many samples as number of folds %i" % self.k)
+
+    order = _order(len(labels), randomize, seed)
+    byClass = order[numpy.argsort(labels[order], kind="mergesort")]
+    folds = numpy.empty(len(labels), dtype=numpy.int32)
+    folds[byClass] = numpy.arange(len(labels)) % self.k
+
+    return _foldSplits(folds, self.k)
+
+
+
+class MultilabelStratifiedKFolds(KFolds):
+  """k-folds cross validation for samples with any number of classes, using
+  iterative stratification [Sechidis et al., "On the stratification of
+  multi-label data", ECML PKDD 2011].
+
+  The class with the fewest unassigned samples is taken first, and all of its
+  unassigned samples are distributed over the folds in proportion to how far
+  each fold is below its desired count of that class. This repeats until every
+  labeled sample is assigned, so the rarest classes are spread first; samples
+  without labels then even out the fold sizes. The work per class is
+  vectorized, so the cost is linear in the total number of sample labels plus
+  quadratic in the number of classes.
+  """
+
+
+  def split(self, samples, labels, labelOffsets, randomize=False):
+    """Split the given samples into k stratified train/test sets.
+
+    @param samples        (list)          Sample elements of any type.
+    @param labels         (numpy array)   Concatenated class indices of the
+                                          samples.
+    @param labelOffsets   (numpy array)   Offsets of each sample's classes in
+                                          labels, in CSR form.
+    @return               (list)          Splits as returned by KFolds.split().
+    """
     samples = list(samples)
+    return [([samples[i] for i in trainIdx], [samples[i] for i in testIdx])
+            for trainIdx, testIdx in self.splitIndices(labels,
+                                                       labelOffsets,
+                                                       randomize)]
+
+
+  def splitIndices(self, labels, labelOffsets, randomize=False, seed=None):
+    """Split the sample indices into k stratified train/test sets.
+
+    @param labels         (numpy array)   Concatenated class indices of the
+                                          samples.
+    @param labelOffsets   (numpy array)   Offsets of each sample's classes in
+                                          labels, in CSR form.
+    @param randomize      (bool)          Shuffle the samples of each class.
+    @param seed           (int)           Seed for the shuffle.
+    @return               (generator)     Yields a (training, test) tuple of
+                                          numpy index arrays for each fold.
+    """
+    labels = numpy.asarray(labels, dtype=numpy.int64)
+    labelOffsets = numpy.asarray(labelOffsets, dtype=numpy.int64)
+    numSamples = len(labelOffsets) - 1
+    if numSamples < self.k:
+      raise ValueError(
+          "Must have as many samples as number of folds %i" % self.k)
+
+    folds = self._assignFolds(labels, labelOffsets, numSamples,
+                              _order(numSamples, randomize, seed))
+    return _foldSplits(folds, self.k)
+
+
+  def _assignFolds(self, labels, labelOffsets, numSamples, order):
+    k = self.k
+    numClasses = int(labels.max()) + 1 if len(labels) else 0
+
+    # Rank of each sample in the (shuffled) order, and the samples of each
+    # class sorted by rank: the class's rows of the transposed label matrix.
+    rank = numpy.empty(numSamples, dtype=numpy.int64)
+    rank[order] = numpy.arange(numSamples)
+    sampleOfLabel = numpy.repeat(numpy.arange(numSamples),
+                                 numpy.diff(labelOffsets))
+    byClass = numpy.lexsort((rank[sampleOfLabel], labels))
+    classSamples = sampleOfLabel[byClass]
+    classOffsets = numpy.zeros(numClasses + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(labels, minlength=numClasses),
+                 out=classOffsets[1:])
+
+    folds = numpy.full(numSamples, -1, dtype=numpy.int32)
+    desired = numpy.diff(classOffsets) / float(k)
+    current = numpy.zeros((k, numClasses))
+    foldSizes = numpy.zeros(k)
+    remaining = numpy.diff(classOffsets).astype(numpy.float64)
+    remaining[remaining == 0] = numpy.inf
+
+    for _ in xrange(numClasses):
+      label = int(numpy.argmin(remaining))
+      if numpy.isinf(remaining[label]):
+        break
+
+      samples = classSamples[classOffsets[label]:classOffsets[label+1]]
+      samples = samples[folds[samples] == -1]
+      quotas = self._quotas(desired[label] - current[:, label],
+                            numSamples / float(k) - foldSizes,
+                            len(samples))
+      sampleFolds = numpy.repeat(numpy.arange(k, dtype=numpy.int32), quotas)
+      folds[samples] = sampleFolds
+      foldSizes += quotas
+
+      # Count every class of the newly assigned samples in their folds.
+      valueIdx, offsets = raggedIndices(labelOffsets, samples)
+      newLabels = labels[valueIdx]
+      current += numpy.bincount(
+        numpy.repeat(sampleFolds, numpy.diff(offsets)) * numClasses + newLabels,
+        minlength=k * numClasses).reshape(k, numClasses)
+      remaining -= numpy.bincount(newLabels, minlength=numClasses)
+      remaining[label] = numpy.inf
+
+    # Samples without labels fill the smallest folds.
+    unlabeled = order[folds[order] == -1]
+    quotas = self._quotas(numSamples / float(k) - foldSizes,
+                          numpy.zeros(k),
+                          len(unlabeled))
+    folds[unlabeled] = numpy.repeat(numpy.arange(k, dtype=numpy.int32), quotas)
+
+    return folds
+
+
+  @staticmethod
+  def _quotas(deficits, sizeDeficits, numItems):
+    """
+    Divide numItems between the folds in proportion to their positive
+    deficits, by largest remainder; ties, and any items left over once no
+    fold has a deficit, go to the folds furthest below their desired size.
+    """
+    deficits = numpy.clip(deficits, 0, None)
+    total = deficits.sum()
+    if total > 0:
+      shares = deficits * min(numItems, total) / total
+    else:
+      shares = numpy.zeros(len(deficits))
+    quotas = numpy.floor(shares).astype(numpy.int64)
+
+    leftover = numItems - quotas.sum()
+    if leftover:
+      # Rank by fractional share, then by fold size deficit.
+      priority = numpy.lexsort((-sizeDeficits, -(shares - quotas)))
+      fullRounds, extra = divmod(leftover, len(deficits))
+      quotas += fullRounds
+      quotas[priority[:extra]] += 1
+
+    return quotas
 
-    sliceIdx = int(self.trainPortion*len(samples))
-    return (samples[:sliceIdx], samples[sliceIdx:])
@@ -0,0 +1,183 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Local reverse index from SDR bits to the terms whose fingerprints have them,
+for decoding SDRs without a request per vector.
+"""
+
+import numpy
+
+from fluent.utils.columnar import raggedIndices, takeRagged
+
+
+
+class FingerprintIndex(object):
+  """
+  Term fingerprints, i.e. the bitmap positions and document frequency of each
+  term, with an inverted index of bit -> terms. Decoding an SDR ranks the terms
+  by the number of bits their fingerprint shares with the SDR.
+
+  The positions of all terms are stored contiguously in CSR form, in arrays
+  that grow by doubling, so the fingerprints of many terms can be gathered
+  with one vector operation.
+  """
+
+  def __init__(self, capacity=1024, positionsCapacity=2**16):
+    """
+    @param capacity           (int)   Initial number of terms.
+    @param positionsCapacity  (int)   Initial number of stored positions.
+    """
+    self.terms = []
+    self.ids = {}
+    self._positions = numpy.empty(positionsCapacity, dtype=numpy.int32)
+    self._offsets = numpy.zeros(capacity + 1, dtype=numpy.int64)
+    self._dfs = numpy.empty(capacity, dtype=numpy.float64)
+    self._index = None
+
+
+  def __len__(self):
+    return len(self.terms)
+
+
+  def __contains__(self, term):
+    return term in self.ids
+
+
+  def add(self, term, positions, df=0.0):
+    """
+    Add the fingerprint of a term; a term already in the index keeps its first
+    fingerprint.
+
+    @param term       (str)           The term.
+    @param positions  (array-like)    Bitmap positions of the term.
+    @param df         (float)         Document frequency of the term.
+    @return           (int)           Id of the term.
+    """
+    termId = self.ids.get(term)
+    if termId is None:
+      positions = numpy.unique(numpy.asarray(positions, dtype=numpy.int64))
+      termId = self.ids[term] = len(self.terms)
+      start = self._offsets[termId]
+      end = start + len(positions)
+      self._reserve(termId + 1, end)
+
+      self.terms.append(term)
+      self._positions[start:end] = positions
+      self._offsets[termId + 1] = end
+      self._dfs[termId] = df
+      self._index = None
+    return termId
+
+
+  def getPositions(self, term):
+    """Return the bitmap positions of a term in the index."""
+    termId = self.ids[term]
+    return self._positions[self._offsets[termId]:self._offsets[termId + 1]]
+
+
+  def take(self, termIds):
+    """
+    @param termIds    (array-like)    Term ids, possibly repeated.
+    @return           (tuple)         The concatenated bitmap positions of the
+                                      terms, and their offsets in CSR form.
+    """
+    return takeRagged(self._positions, self._offsets, termIds)
+
+
+  def getDfs(self, termIds):
+    """Return the document frequencies of the terms as an array."""
+    return self._dfs[numpy.asarray(termIds, dtype=numpy.int64)]
+
+
+  def decode(self, positions, numTerms=10):
+    """
+    @param positions  (array-like)    Bitmap positions of an SDR.
+    @param numTerms   (int)           Max number of terms to return.
+    @return           (list)          (term, score) tuples for the terms
+        sharing bits with the SDR, where the score is the number of shared
+        bits; highest score first, and ties in the order the terms were added.
+    """
+    return self.decodeBatch([positions], numTerms)[0]
+
+
+  def decodeBatch(self, bitmaps, numTerms=10):
+    """Decode a list of bitmaps; see decode()."""
+    index = self._getIndex()
+    numBits = len(index["bitOffsets"]) - 1
+
+    decoded = []
+    for positions in bitmaps:
+      positions = numpy.unique(numpy.asarray(positions, dtype=numpy.int64))
+      positions = positions[(positions >= 0) & (positions < numBits)]
+      entryIdx, _ = raggedIndices(index["bitOffsets"], positions)
+      termIds, overlaps = numpy.unique(index["terms"][entryIdx],
+                                       return_counts=True)
+
+      k = min(numTerms, len(termIds))
+      if k < len(termIds):
+        top = numpy.argpartition(-overlaps, k - 1)[:k]
+      else:
+        top = numpy.arange(len(termIds))
+      # termIds are sorted, so sorting stably by score breaks ties by id.
+      top = numpy.sort(top)
+      top = top[numpy.argsort(-overlaps[top], kind="mergesort")]
+      decoded.append([(self.terms[termIds[i]], float(overlaps[i]))
+                      for i in top])
+    return decoded
+
+
+  def _getIndex(self):
+    """Build the bit -> terms index if stale."""
+    if self._index is None:
+      numTerms = len(self.terms)
+      positions = self._positions[:self._offsets[numTerms]]
+      numBits = int(positions.max()) + 1 if len(positions) else 0
+
+      termOfBit = numpy.repeat(numpy.arange(numTerms),
+                               numpy.diff(self._offsets[:numTerms + 1]))
+      order = numpy.argsort(positions, kind="mergesort")
+      bitOffsets = numpy.zeros(numBits + 1, dtype=numpy.int64)
+      numpy.cumsum(numpy.bincount(positions, minlength=numBits),
+                   out=bitOffsets[1:])
+      self._index = {"terms": termOfBit[order], "bitOffsets": bitOffsets}
+    return self._index
+
+
+  def _reserve(self, numTerms, numPositions):
+    """Grow the term and position arrays by doubling."""
+    if numTerms > len(self._dfs):
+      capacity = max(len(self._dfs), 1)
+      while capacity < numTerms:
+        capacity *= 2
+      offsets = numpy.zeros(capacity + 1, dtype=numpy.int64)
+      offsets[:len(self._offsets)] = self._offsets
+      dfs = numpy.empty(capacity, dtype=numpy.float64)
+      dfs[:len(self._dfs)] = self._dfs
+      self._offsets = offsets
+      self._dfs = dfs
+
+    if numPositions > len(self._positions):
+      capacity = max(len(self._positions), 1)
+      while capacity < numPositions:
+        capacity *= 2
+      positions = numpy.empty(capacity, dtype=numpy.int32)
+      positions[:len(self._positions)] = self._positions
+      self._positions = positions
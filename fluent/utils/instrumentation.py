@@ -0,0 +1,197 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Lightweight timers, counters, and histograms for experiment runs.
+
+Components report into the module-level `instruments` object, e.g.
+  instruments.increment("CioEncoder.fallbacks")
+  with instruments.timer("Runner.encodeSamples"):
+    ...
+Instrumentation is disabled by default, in which case every call returns
+immediately; enable it with instruments.enable() and export the results with
+instruments.writeJSON() at the end of a run.
+"""
+
+import functools
+import math
+import threading
+import time
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+class Histogram(object):
+  """
+  Summary of a stream of non-negative values: count, sum, min, max, and counts
+  in power-of-two buckets, so memory stays constant however many values are
+  observed.
+  """
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.0
+    self.min = None
+    self.max = None
+    self.buckets = {}
+
+
+  def observe(self, value):
+    self.count += 1
+    self.total += value
+    self.min = value if self.min is None else min(self.min, value)
+    self.max = value if self.max is None else max(self.max, value)
+    # Bucket b holds values in [2**(b-1), 2**b); zero goes in bucket None.
+    bucket = int(math.floor(math.log(value, 2))) + 1 if value > 0 else None
+    self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+
+  def toDict(self):
+    return {"count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {("<" + repr(2.0**b) if b is not None else "0"): c
+                        for b, c in self.buckets.iteritems()}}
+
+
+
+class _Timer(object):
+  """Context manager that observes its elapsed seconds in a histogram."""
+
+  def __init__(self, instrumentation, name):
+    self.instrumentation = instrumentation
+    self.name = name
+
+
+  def __enter__(self):
+    self.start = time.time()
+    return self
+
+
+  def __exit__(self, *args):
+    self.instrumentation.observe(self.name, time.time() - self.start)
+
+
+
+class _NullTimer(object):
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    pass
+
+
+
+_NULL_TIMER = _NullTimer()
+
+
+
+class Instrumentation(object):
+  """Registry of named counters and histograms; timers are histograms."""
+
+  def __init__(self, enabled=False):
+    self.enabled = enabled
+    self._lock = threading.Lock()
+    self.reset()
+
+
+  def enable(self):
+    self.enabled = True
+
+
+  def disable(self):
+    self.enabled = False
+
+
+  def reset(self):
+    with self._lock:
+      self.counters = {}
+      self.histograms = {}
+
+
+  def increment(self, name, amount=1):
+    """Add amount to the named counter."""
+    if not self.enabled:
+      return
+    with self._lock:
+      self.counters[name] = self.counters.get(name, 0) + amount
+
+
+  def observe(self, name, value):
+    """Add a value to the named histogram."""
+    if not self.enabled:
+      return
+    with self._lock:
+      if name not in self.histograms:
+        self.histograms[name] = Histogram()
+      self.histograms[name].observe(value)
+
+
+  def timer(self, name):
+    """
+    Return a context manager that observes its elapsed seconds in the named
+    histogram.
+    """
+    if not self.enabled:
+      return _NULL_TIMER
+    return _Timer(self, name)
+
+
+  def toDict(self):
+    with self._lock:
+      return {"counters": dict(self.counters),
+              "histograms": {name: h.toDict()
+                             for name, h in self.histograms.iteritems()}}
+
+
+  def writeJSON(self, path):
+    """Write the counters and histograms to a JSON file."""
+    with open(path, "w") as f:
+      json.dump(self.toDict(), f, indent=1, sort_keys=True)
+
+
+
+instruments = Instrumentation()
+
+
+
+def timed(method):
+  """
+  Decorator to time calls of a method in the histogram named
+  "<class name>.<method name>"; the histogram count is the number of calls.
+  """
+  methodName = method.__name__
+
+  @functools.wraps(method)
+  def wrapper(self, *args, **kwargs):
+    if not instruments.enabled:
+      return method(self, *args, **kwargs)
+    with _Timer(instruments, self.__class__.__name__ + "." + methodName):
+      return method(self, *args, **kwargs)
+
+  return wrapper
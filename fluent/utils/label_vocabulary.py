@@ -0,0 +1,146 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Mapping between classification label strings and the integer ids the models
+are trained on.
+"""
+
+import itertools
+import numpy
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+class LabelVocabulary(object):
+  """
+  Dict-backed, ordered mapping of label strings to ids 0..n-1. Vocabularies
+  built with fromLabels() order the labels by sorting them, so the ids do not
+  depend on the order of the data; save the vocabulary alongside a model so a
+  loaded model keeps its label ids.
+  """
+
+  def __init__(self, labels=()):
+    """
+    @param labels     (iterable)    Label strings in id order.
+    """
+    self.labels = []
+    self.ids = {}
+    for label in labels:
+      self.add(label)
+
+
+  @classmethod
+  def fromLabels(cls, labelLists):
+    """
+    Build a vocabulary of the distinct labels in labelLists, in sorted order.
+
+    @param labelLists (iterable)    Lists of label strings, e.g. one per
+                                    sample.
+    """
+    return cls(sorted(set(itertools.chain.from_iterable(labelLists))))
+
+
+  def __len__(self):
+    return len(self.labels)
+
+
+  def __iter__(self):
+    return iter(self.labels)
+
+
+  def __contains__(self, label):
+    return label in self.ids
+
+
+  def __getitem__(self, labelId):
+    """Return the label string of an id."""
+    return self.labels[labelId]
+
+
+  def add(self, label):
+    """Return the id of label, adding it to the end of the vocabulary if new."""
+    labelId = self.ids.get(label)
+    if labelId is None:
+      labelId = len(self.labels)
+      self.ids[label] = labelId
+      self.labels.append(label)
+    return labelId
+
+
+  def update(self, labelLists):
+    """Add the new labels in labelLists, in sorted order, after the existing
+    ones; existing ids are unchanged."""
+    new = set(itertools.chain.from_iterable(labelLists)).difference(self.ids)
+    for label in sorted(new):
+      self.add(label)
+
+
+  def index(self, label):
+    """Return the id of label; raises KeyError for unknown labels."""
+    return self.ids[label]
+
+
+  def encode(self, labels):
+    """Return a numpy array of the ids of a list of label strings."""
+    ids = self.ids
+    return numpy.fromiter((ids[label] for label in labels),
+                          dtype=numpy.int32,
+                          count=len(labels))
+
+
+  def encodeMany(self, labelLists):
+    """
+    Encode lists of labels, e.g. the labels of each sample, in CSR form.
+
+    @param labelLists (list)        Lists of label strings.
+    @return           (tuple)       Concatenated int32 label ids, and the int64
+        offsets such that list i has the ids values[offsets[i]:offsets[i+1]].
+    """
+    offsets = numpy.zeros(len(labelLists) + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.fromiter((len(l) for l in labelLists),
+                                dtype=numpy.int64,
+                                count=len(labelLists)),
+                 out=offsets[1:])
+    ids = self.ids
+    values = numpy.fromiter(
+      (ids[label] for label in itertools.chain.from_iterable(labelLists)),
+      dtype=numpy.int32,
+      count=offsets[-1])
+    return values, offsets
+
+
+  def save(self, path):
+    """Write the label strings, in id order, to a JSON file."""
+    with open(path, "w") as f:
+      json.dump({"labels": self.labels}, f, indent=1)
+
+
+  @classmethod
+  def load(cls, path):
+    with open(path) as f:
+      labels = json.load(f)["labels"]
+    # Labels are read from CSVs as byte strings.
+    return cls(l.encode("utf-8") if isinstance(l, unicode) else l
+               for l in labels)
@@ -0,0 +1,338 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Columnar on-disk storage for encoded patterns, i.e. the items of the form
+  {"pattern": encoding, "labels": numpy.array}
+that the experiment runners build from ClassificationModel.encodePattern().
+
+An encoding is either a single dict with "text", "sparsity", and "bitmap"
+entries, or a list of such dicts (one per token) for token-level models. The
+store keeps one row per dict in these columns:
+  - bitmaps     concatenated int32 positions plus int64 offsets
+  - texts       concatenated utf-8 bytes plus int64 offsets
+  - sparsities  float64
+and one row per sample in these columns:
+  - samples     int64 offsets into the pattern rows
+  - labels      concatenated int32 label indices plus int64 offsets
+
+Token-level models with a table of token SDRs (see
+fluent.utils.random_sdr.TokenSDRTable) can write their samples as token ids
+instead, with PatternStoreWriter.appendTokens(). The store then keeps one
+pattern row per distinct token, and one column per token occurrence:
+  - tokens      int64 pattern row of each token occurrence
+and the samples column offsets into the occurrences. Every occurrence of a
+token reads back as a view of the same row of the mapped file, so the store
+grows with the vocabulary rather than with the number of tokens.
+"""
+
+import numpy
+import os
+
+from fluent.utils.columnar import (
+  ColumnWriter,
+  RaggedWriter,
+  raggedIndices,
+  readColumn,
+  readRagged,
+  takeRagged)
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+# Version 2 adds token table stores; version 1 stores are read unchanged.
+STORE_VERSION = 2
+
+
+
+class PatternStoreWriter(object):
+  """
+  Writes patterns to a store directory one sample at a time, so the full set
+  of encodings never needs to be held in memory. The metadata file is written
+  on close(); use the writer as a context manager to guarantee this.
+  """
+
+  def __init__(self, path):
+    """
+    @param path       (str)       Directory for the store; created if needed,
+                                  and existing store files are overwritten.
+    """
+    if not os.path.isdir(path):
+      os.makedirs(path)
+
+    self.path = path
+    self.tokenLevel = None
+    self.tokenTable = None
+    self.numSamples = 0
+    self._closed = False
+    self._tokenRows = {}
+
+    self._bitmaps = RaggedWriter(path, "bitmaps", numpy.int32)
+    self._texts = RaggedWriter(path, "texts", numpy.uint8)
+    self._sparsities = ColumnWriter(
+      os.path.join(path, "sparsities"), numpy.float64)
+    self._samples = ColumnWriter(
+      os.path.join(path, "samples.offsets"), numpy.int64)
+    self._samples.append(0)
+    self._labels = RaggedWriter(path, "labels", numpy.int32)
+    self._tokens = None
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    self.close()
+
+
+  def append(self, pattern, labels):
+    """
+    Append the encoding and label indices of one sample.
+
+    @param pattern    (dict, list)    A single encoding dict, or a list of
+                                      them for token-level models.
+    @param labels     (numpy array)   Label indices of the sample.
+    @return           (int)           Index of the sample in the store.
+    """
+    tokenLevel = not isinstance(pattern, dict)
+    self._setMode(tokenLevel, False)
+
+    for p in (pattern if tokenLevel else [pattern]):
+      p = p or {}
+      self._appendRow(p.get("text", ""), p.get("bitmap"),
+                      p.get("sparsity", 0.0))
+
+    self._samples.append(len(self._bitmaps))
+    return self._appendLabels(labels)
+
+
+  def appendTokens(self, tokens, tokenIds, bitmaps, sparsity, labels):
+    """
+    Append a token-level sample encoded with a token table. The text and
+    bitmap of each token are written the first time the token is appended.
+
+    @param tokens     (list)          Token strings of the sample.
+    @param tokenIds   (array-like)    Table id of each token.
+    @param bitmaps    (numpy array)   Table of token bitmaps; row tokenIds[i]
+                                      is the bitmap of token i.
+    @param sparsity   (float)         Sparsity of the bitmaps.
+    @param labels     (numpy array)   Label indices of the sample.
+    @return           (int)           Index of the sample in the store.
+    """
+    self._setMode(True, True)
+
+    rows = self._tokenRows
+    for token, tokenId in zip(tokens, tokenIds):
+      row = rows.get(token)
+      if row is None:
+        row = rows[token] = len(self._bitmaps)
+        self._appendRow(token, bitmaps[tokenId], sparsity)
+      self._tokens.append(row)
+
+    self._samples.append(self._tokens.length)
+    return self._appendLabels(labels)
+
+
+  def close(self):
+    """Flush the columns and write the store metadata."""
+    if self._closed:
+      return
+    self._closed = True
+
+    for column in (self._bitmaps, self._texts, self._sparsities,
+                   self._samples, self._labels):
+      column.close()
+    if self._tokens is not None:
+      self._tokens.close()
+
+    meta = {"version": STORE_VERSION,
+            "numSamples": self.numSamples,
+            "numPatterns": len(self._bitmaps),
+            "tokenLevel": bool(self.tokenLevel),
+            "tokenTable": bool(self.tokenTable),
+            "numTokens": self._tokens.length if self._tokens is not None else 0}
+    with open(os.path.join(self.path, "meta.json"), "w") as f:
+      json.dump(meta, f)
+
+
+  def _setMode(self, tokenLevel, tokenTable):
+    if self.tokenLevel is None:
+      self.tokenLevel = tokenLevel
+      self.tokenTable = tokenTable
+      if tokenTable:
+        self._tokens = ColumnWriter(os.path.join(self.path, "tokens"),
+                                    numpy.int64)
+    elif self.tokenLevel != tokenLevel:
+      raise ValueError("Cannot mix sample-level and token-level patterns in "
+                       "one store.")
+    elif self.tokenTable != tokenTable:
+      raise ValueError("Cannot mix token table samples with other patterns in "
+                       "one store.")
+
+
+  def _appendRow(self, text, bitmap, sparsity):
+    self._bitmaps.append(bitmap if bitmap is not None else [])
+    self._texts.append(numpy.frombuffer(_toBytes(text), dtype=numpy.uint8))
+    self._sparsities.append(sparsity)
+
+
+  def _appendLabels(self, labels):
+    self._labels.append(labels if labels is not None else [])
+    self.numSamples += 1
+    return self.numSamples - 1
+
+
+
+class PatternStore(object):
+  """
+  Memory-mapped, read-only view of a store written by PatternStoreWriter.
+  Indexing a store returns the same {"pattern": ..., "labels": ...} items the
+  store was written from, where bitmaps and labels are views into the mapped
+  files rather than copies.
+  """
+
+  def __init__(self, path):
+    """
+    @param path       (str)       Directory of the store.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+      meta = json.load(f)
+    if meta["version"] > STORE_VERSION:
+      raise ValueError("Pattern store version {0} is not supported."
+                       .format(meta["version"]))
+
+    self.path = path
+    self.tokenLevel = meta["tokenLevel"]
+    self.tokenTable = meta.get("tokenTable", False)
+    self.numSamples = meta["numSamples"]
+    self.numPatterns = meta["numPatterns"]
+
+    self.bitmaps, self.bitmapOffsets = readRagged(
+      path, "bitmaps", numpy.int32, self.numPatterns)
+    self.texts, self.textOffsets = readRagged(
+      path, "texts", numpy.uint8, self.numPatterns)
+    self.sparsities = readColumn(
+      os.path.join(path, "sparsities"), numpy.float64, self.numPatterns)
+    self.sampleOffsets = readColumn(
+      os.path.join(path, "samples.offsets"), numpy.int64, self.numSamples + 1)
+    self.labels, self.labelOffsets = readRagged(
+      path, "labels", numpy.int32, self.numSamples)
+    # The pattern row of each token occurrence, for token table stores.
+    self.tokens = None
+    if self.tokenTable:
+      self.tokens = readColumn(
+        os.path.join(path, "tokens"), numpy.int64, meta["numTokens"])
+
+
+  def __len__(self):
+    return self.numSamples
+
+
+  def __getitem__(self, idx):
+    return {"pattern": self.getPattern(idx),
+            "labels": self.getLabels(idx)}
+
+
+  def __iter__(self):
+    for i in xrange(self.numSamples):
+      yield self[i]
+
+
+  def getBitmap(self, patternIdx):
+    """Return the positions array of one pattern row."""
+    return self.bitmaps[
+      self.bitmapOffsets[patternIdx]:self.bitmapOffsets[patternIdx+1]]
+
+
+  def getText(self, patternIdx):
+    """Return the text of one pattern row."""
+    return self.texts[
+      self.textOffsets[patternIdx]:self.textOffsets[patternIdx+1]].tobytes()
+
+
+  def getLabels(self, idx):
+    """Return the label indices of sample idx."""
+    idx = self._checkIndex(idx)
+    return self.labels[self.labelOffsets[idx]:self.labelOffsets[idx+1]]
+
+
+  def getPattern(self, idx):
+    """Return the encoding of sample idx, in the format it was written."""
+    idx = self._checkIndex(idx)
+    start, end = self.sampleOffsets[idx], self.sampleOffsets[idx+1]
+    rows = self.tokens[start:end] if self.tokenTable else xrange(start, end)
+    patterns = [{"text": self.getText(i),
+                 "sparsity": float(self.sparsities[i]),
+                 "bitmap": self.getBitmap(i)}
+                for i in rows]
+    return patterns if self.tokenLevel else patterns[0]
+
+
+  def take(self, indices):
+    """
+    Gather the bitmaps and labels of a subset of samples, e.g. one partition
+    of a train/test split, into contiguous in-memory CSR arrays; only the
+    selected rows of the mapped files are read.
+
+    @param indices    (array-like)    Sample indices, in order.
+    @return           (dict)          Arrays of the selected samples:
+        "bitmaps", "bitmapOffsets"  positions of each pattern row,
+        "sampleOffsets"             pattern rows of each sample, i.e. sample j
+                                    spans pattern rows
+                                    sampleOffsets[j]:sampleOffsets[j+1],
+        "labels", "labelOffsets"    label indices of each sample.
+    """
+    indices = numpy.asarray(indices, dtype=numpy.int64)
+    if indices.size and (indices.min() < 0 or
+                         indices.max() >= self.numSamples):
+      raise IndexError("Sample index out of range.")
+
+    patternRows, sampleOffsets = raggedIndices(self.sampleOffsets, indices)
+    if self.tokenTable:
+      patternRows = self.tokens[patternRows]
+    bitmaps, bitmapOffsets = takeRagged(
+      self.bitmaps, self.bitmapOffsets, patternRows)
+    labels, labelOffsets = takeRagged(self.labels, self.labelOffsets, indices)
+
+    return {"bitmaps": bitmaps,
+            "bitmapOffsets": bitmapOffsets,
+            "sampleOffsets": sampleOffsets,
+            "labels": labels,
+            "labelOffsets": labelOffsets}
+
+
+  def _checkIndex(self, idx):
+    if idx < 0:
+      idx += self.numSamples
+    if not 0 <= idx < self.numSamples:
+      raise IndexError("Sample index out of range.")
+    return idx
+
+
+
+def _toBytes(text):
+  if isinstance(text, unicode):
+    return text.encode("utf-8")
+  return text or ""
@@ -22,12 +22,16 @@
 This file contains plotting tools for NLP experiment results.
 """
 
+import atexit
 import math
 import numpy
 import os
 import pandas as pd
+import plotly.offline
 import plotly.plotly as py
 import plotly.tools as tls
+import Queue
+import threading
 
 from plotly.graph_objs import (
     Data,
@@ -43,13 +47,88 @@ from plotly.graph_objs import (
 
 
 
+_STOP = object()
+
+
+
+class _PlotWriter(object):
+  """
+  Renders figures to self-contained HTML files in a background thread, so the
+  caller does not wait on rendering or disk writes. The thread is a daemon, so
+  it never keeps the interpreter alive; the figures still pending at exit are
+  written by an atexit hook.
+  """
+
+  def __init__(self):
+    self._queue = Queue.Queue()
+    self._closed = False
+    self._thread = threading.Thread(target=self._run, name="PlotWriter")
+    self._thread.daemon = True
+    self._thread.start()
+    atexit.register(self.close)
+
+
+  def submit(self, fig, path):
+    self._queue.put((fig, path))
+
+
+  def close(self):
+    """Write the figures already submitted, then stop the thread."""
+    if self._closed:
+      return
+    self._closed = True
+    self._queue.put(_STOP)
+    self._thread.join()
+
+
+  def _run(self):
+    while True:
+      item = self._queue.get()
+      if item is _STOP:
+        break
+      fig, path = item
+      try:
+        outputDir = os.path.dirname(path)
+        if outputDir and not os.path.isdir(outputDir):
+          os.makedirs(outputDir)
+        plotly.offline.plot(fig,
+                            filename=path,
+                            auto_open=False,
+                            include_plotlyjs=True,
+                            show_link=False)
+      except Exception as e:
+        print "Could not write the plot \'{0}\': {1}".format(path, e)
+
+
+
 class PlotNLP():
-  """Class to plot evaluation metrics for NLP experiments."""
+  """
+  Class to plot evaluation metrics for NLP experiments.
+
+  With the "online" backend the figures are uploaded to the Plotly service,
+  which needs API credentials. With the "offline" backend they are written as
+  self-contained HTML files to outputDir by a background thread; call close()
+  to wait for the pending files.
+  """
+
+  backends = ("online", "offline")
 
   def __init__(self,
                apiKey=None,
                username=None,
-               experimentName="experiment"):
+               experimentName="experiment",
+               backend="online",
+               outputDir="."):
+    if backend not in self.backends:
+      raise ValueError("backend must be one of {0}.".format(self.backends))
+    self.backend = backend
+    self.outputDir = outputDir
+    self.experimentName = experimentName
+    self._writer = None
+
+    if backend == "offline":
+      return
+
     # Instantiate API credentials.
     try:
       self.apiKey = apiKey if apiKey else os.environ["PLOTLY_API_KEY"]
@@ -69,7 +148,26 @@ class PlotNLP():
 
     py.sign_in(self.username, self.apiKey)
 
-    self.experimentName = experimentName
+
+  def close(self):
+    """Wait until the plot files are written (offline backend)."""
+    if self._writer is not None:
+      self._writer.close()
+      self._writer = None
+
+
+  def _show(self, fig, name, description):
+    """Upload the figure, or queue it to be written to outputDir/name.html."""
+    if self.backend == "online":
+      plot_url = py.plot(fig)
+      print description + " URL: ", plot_url
+      return
+
+    if self._writer is None:
+      self._writer = _PlotWriter()
+    path = os.path.join(self.outputDir, name + ".html")
+    self._writer.submit(fig, path)
+    print description + " file: ", path
 
 
   @staticmethod
@@ -146,21 +244,61 @@ class PlotNLP():
     )
 
     fig = Figure(data=data, layout=layout)
-    plot_url = py.plot(fig)
-    print "Confusion matrix URL: ", plot_url
+    self._show(fig, "confusion_matrix", "Confusion matrix")
+
+
+  @staticmethod
+  def summarizeAccuracies(trialAccuracies, trainSize):
+    """
+    Group the trials by training set size.
+
+    @param trialAccuracies    (numpy array)   Accuracy of each category
+        (column) in each trial (row); NaN where a trial did not test the
+        category.
+    @param trainSize          (list)          Size of training set for each
+                                              trial.
+    @return                   (dict)          "sizes", the sorted distinct
+        training set sizes, and arrays of shape (sizes, categories): "count" of
+        trials testing the category, and the "mean" and "std" of their
+        accuracies (NaN where the count is zero).
+    """
+    trialAccuracies = numpy.asarray(trialAccuracies, dtype=numpy.float64)
+    sizes, group = numpy.unique(trainSize, return_inverse=True)
+    tested = ~numpy.isnan(trialAccuracies)
+    accuracies = numpy.where(tested, trialAccuracies, 0.0)
+
+    shape = (len(sizes), trialAccuracies.shape[1])
+    count = numpy.zeros(shape)
+    total = numpy.zeros(shape)
+    totalSquares = numpy.zeros(shape)
+    numpy.add.at(count, group, tested)
+    numpy.add.at(total, group, accuracies)
+    numpy.add.at(totalSquares, group, accuracies ** 2)
 
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+      mean = total / count
+      variance = numpy.maximum(totalSquares / count - mean ** 2, 0.0)
+    return {"sizes": sizes,
+            "count": count,
+            "mean": mean,
+            "std": numpy.sqrt(variance)}
 
-  def plotCategoryAccuracies(self, trialAccuracies, trainSize):
+
+  def plotCategoryAccuracies(self, trialAccuracies, trainSize, labelRefs=None):
     """
     Shows the accuracy for the categories at a certain training size
-    
-    @param trialAccuracies    (dict)    A dictionary of dictionaries. For each
-        train size, there is a dictionary that maps a category to a list of 
-        accuracies for that category.
-    
+
+    @param trialAccuracies    (numpy array)   Accuracy of each category
+        (column) in each trial (row); NaN where a trial did not test the
+        category.
+
     @param trainSize          (list)    Size of training set for each trial.
+
+    @param labelRefs          (list)    Category names by column; defaults to
+                                        the column indices.
     """
-    sizes = sorted(set(trainSize))
+    summary = self.summarizeAccuracies(trialAccuracies, trainSize)
+    sizes = summary["sizes"]
     size_sqrt = math.sqrt(len(sizes))
     subplotDimension = int(math.ceil(size_sqrt))
 
@@ -176,27 +314,19 @@ class PlotNLP():
       # 1-indexed
       col = i % cols + 1
       row = (i - col + 1) / cols + 1
-      classificationAccuracies = trialAccuracies[s]
-      num_categories = max(num_categories,len(classificationAccuracies.keys()))
-      
-      x = []
-      y = []
-      std = []
-      for label, acc in classificationAccuracies.iteritems():
-        x.append(label)
-        y.append(numpy.mean(acc))
-        std.append(numpy.std(acc))
+      tested = numpy.flatnonzero(summary["count"][i])
+      num_categories = max(num_categories, len(tested))
 
       trace = Scatter(
-        x=x,
-        y=y,
+        x=[labelRefs[c] if labelRefs else c for c in tested],
+        y=summary["mean"][i, tested].tolist(),
         name=s,
         mode='markers',
         error_y=ErrorY(
           type='data',
           symmetric=False,
-          array=std,
-          arrayminus=std,
+          array=summary["std"][i, tested].tolist(),
+          arrayminus=summary["std"][i, tested].tolist(),
           visible=True
         )
       )
@@ -215,29 +345,32 @@ class PlotNLP():
         fig["layout"]["yaxis{}".format(i)]["range"] = [-.1, 1.1]
     fig["layout"]["margin"] = {"b" : 120}
 
-    plot_url = py.plot(fig)
-    print "Category Accuracies URL: ", plot_url
+    self._show(fig, "category_accuracies", "Category Accuracies")
 
 
-  def plotCumulativeAccuracies(self, classificationAccuracies, trainSize):
+  def plotCumulativeAccuracies(self, trialAccuracies, trainSize,
+                               labelRefs=None):
     """
     Creates scatter plots that show the accuracy for each category at a
     certain training size
-    
-    @param classificationAccuracies (dict)    Maps a category label to a list of
-        lists of accuracies. Each item in the key is a list of accuracies for
-        a specific training size, ordered by increasing training size.
-        
-    @param trainSize                (list)    Sizes of training sets for trials.
+
+    @param trialAccuracies    (numpy array)   Accuracy of each category
+        (column) in each trial (row); NaN where a trial did not test the
+        category.
+
+    @param trainSize          (list)    Sizes of training sets for trials.
+
+    @param labelRefs          (list)    Category names by column; defaults to
+                                        the column indices.
     """
-    # Convert list of list of accuracies to list of means
-    classificationSummaries = [(label, map(numpy.mean, acc))
-        for label, acc in classificationAccuracies.iteritems()]
-    
+    # Mean accuracy of each category at each training size it was tested.
+    summary = self.summarizeAccuracies(trialAccuracies, trainSize)
     data = []
-    sizes = sorted(set(trainSize))
-    for label, summary in classificationSummaries:
-      data.append(Scatter(x=sizes, y=summary, name=label))
+    for c in numpy.flatnonzero(summary["count"].any(axis=0)):
+      tested = summary["count"][:, c] > 0
+      data.append(Scatter(x=summary["sizes"][tested].tolist(),
+                          y=summary["mean"][tested, c].tolist(),
+                          name=labelRefs[c] if labelRefs else c))
     data = Data(data)
 
     layout = Layout(
@@ -261,5 +394,4 @@ class PlotNLP():
     )
 
     fig = Figure(data=data, layout=layout)
-    plot_url = py.plot(fig)
-    print "Cumulative Accuracies URL: ", plot_url
+    self._show(fig, "cumulative_accuracies", "Cumulative Accuracies")
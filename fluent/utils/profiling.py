@@ -0,0 +1,226 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Opt-in profiling of the phases of an experiment run.
+
+Each phase runs under either cProfile, which traces every function call, or a
+statistical sampler, which records the call stack every few milliseconds of
+CPU time and so adds little overhead to long runs. For each phase a profile
+file is written to the output directory, and the top functions of all phases
+are written to profile_summary.txt:
+  - cprofile: <phase>.prof, readable with the pstats module or snakeviz
+  - sample: <phase>.stacks, in the collapsed "f1;f2;f3 count" format read by
+    flamegraph.pl and speedscope
+peakMemoryKB() reports the peak resident memory of the process.
+"""
+
+import cProfile
+import collections
+import os
+import platform
+import pstats
+import resource
+import signal
+import StringIO
+
+
+
+class _Sampler(object):
+  """
+  Samples the main thread's call stack on the ITIMER_PROF signal, so only CPU
+  time is sampled. Not available on Windows.
+  """
+
+  def __init__(self, interval):
+    self.interval = interval
+    self.stacks = collections.Counter()
+    self.numSamples = 0
+
+
+  def _sample(self, signum, frame):
+    stack = []
+    while frame is not None:
+      code = frame.f_code
+      stack.append("{0} ({1}:{2})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+      frame = frame.f_back
+    self.stacks[tuple(reversed(stack))] += 1
+    self.numSamples += 1
+
+
+  def start(self):
+    self._previousHandler = signal.signal(signal.SIGPROF, self._sample)
+    # Restart system calls interrupted by a sample, e.g. socket and file reads,
+    # instead of failing them with EINTR.
+    signal.siginterrupt(signal.SIGPROF, False)
+    signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+
+  def stop(self):
+    signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    signal.signal(signal.SIGPROF, self._previousHandler)
+
+
+  def writeStacks(self, path):
+    with open(path, "w") as f:
+      for stack, count in self.stacks.most_common():
+        f.write("{0} {1}\n".format(";".join(stack), count))
+
+
+  def summary(self, topN):
+    """
+    @return           (str)         The topN functions by the fraction of
+                                    samples they are on the stack (total), with
+                                    the fraction at the top of the stack (self).
+    """
+    selfCounts = collections.Counter()
+    totalCounts = collections.Counter()
+    for stack, count in self.stacks.iteritems():
+      selfCounts[stack[-1]] += count
+      for function in set(stack):
+        totalCounts[function] += count
+
+    lines = ["{0} samples at {1:.1f} ms intervals".format(
+               self.numSamples, self.interval * 1000),
+             "{0:>8}{1:>8}  {2}".format("self%", "total%", "function")]
+    samples = float(self.numSamples) or 1.0
+    for function, count in totalCounts.most_common(topN):
+      lines.append("{0:>8.1f}{1:>8.1f}  {2}".format(
+        100 * selfCounts[function] / samples, 100 * count / samples, function))
+    return "\n".join(lines) + "\n"
+
+
+
+class _Phase(object):
+  """Context manager that profiles one phase."""
+
+  def __init__(self, profiler, name):
+    self.profiler = profiler
+    self.name = name
+
+
+  def __enter__(self):
+    if self.profiler.mode == "cprofile":
+      self.profile = cProfile.Profile()
+      self.profile.enable()
+    else:
+      self.profile = _Sampler(self.profiler.interval)
+      self.profile.start()
+    return self
+
+
+  def __exit__(self, *args):
+    if self.profiler.mode == "cprofile":
+      self.profile.disable()
+    else:
+      self.profile.stop()
+    self.profiler._record(self.name, self.profile)
+
+
+
+class PhaseProfiler(object):
+  """
+  Profiles named phases of a run, e.g.
+    profiler = PhaseProfiler(resultsDir, mode="sample")
+    with profiler.phase("encodeSamples"):
+      runner.encodeSamples()
+    profiler.writeSummary()
+  A profiler with mode None runs the phases unprofiled.
+  """
+
+  modes = ("cprofile", "sample")
+
+  def __init__(self, outputDir, mode="cprofile", topN=25, interval=0.005):
+    """
+    @param outputDir      (str)     Directory for the profile files.
+    @param mode           (str)     "cprofile", "sample", or None to disable.
+    @param topN           (int)     Number of functions listed per phase in the
+                                    summary.
+    @param interval       (float)   Seconds of CPU time between samples, for
+                                    the sample mode.
+    """
+    if mode is not None and mode not in self.modes:
+      raise ValueError("Unknown profiling mode \'{0}\'; use one of {1}."
+                       .format(mode, self.modes))
+    self.outputDir = outputDir
+    self.mode = mode
+    self.topN = topN
+    self.interval = interval
+    self.summaries = []
+
+
+  def phase(self, name):
+    """Return a context manager that profiles the enclosed code as a phase."""
+    if self.mode is None:
+      return _NullPhase()
+    return _Phase(self, name)
+
+
+  def _record(self, name, profile):
+    if not os.path.exists(self.outputDir):
+      os.makedirs(self.outputDir)
+
+    if self.mode == "cprofile":
+      profile.dump_stats(os.path.join(self.outputDir, name + ".prof"))
+      stream = StringIO.StringIO()
+      stats = pstats.Stats(profile, stream=stream)
+      stats.strip_dirs().sort_stats("cumulative").print_stats(self.topN)
+      summary = stream.getvalue()
+    else:
+      profile.writeStacks(os.path.join(self.outputDir, name + ".stacks"))
+      summary = profile.summary(self.topN)
+
+    self.summaries.append((name, summary))
+
+
+  def writeSummary(self):
+    """
+    Write the top functions of each phase to profile_summary.txt.
+
+    @return           (str)         Path of the summary file, or None if no
+                                    phases were profiled.
+    """
+    if not self.summaries:
+      return None
+    path = os.path.join(self.outputDir, "profile_summary.txt")
+    with open(path, "w") as f:
+      for name, summary in self.summaries:
+        f.write("=== {0} ===\n{1}\n".format(name, summary))
+    return path
+
+
+
+class _NullPhase(object):
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    pass
+
+
+
+def peakMemoryKB():
+  """Peak resident memory of this process, in KB."""
+  maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports KB, OS X reports bytes.
+  return maxRSS / 1024 if platform.system() == "Darwin" else maxRSS
@@ -0,0 +1,293 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Deterministic random SDRs derived from a stable hash of each token.
+
+The SDR of a token depends only on the token and the SDR dimensions: it is
+seeded by the md5 digest of the token's bytes, not by Python's hash() or any
+global RNG state, so every process produces the same encodings. Candidate
+positions come from the splitmix64 generator evaluated at counters 1, 2, ...
+after the seed, which lets a whole batch of tokens be generated with a few
+numpy operations; the SDR is the first w distinct candidates. Single tokens
+take a shorter path with the same result, and their SDRs are memoized.
+"""
+
+import hashlib
+import numpy
+
+
+
+_GOLDEN = numpy.uint64(0x9E3779B97F4A7C15)
+_MIX1 = numpy.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = numpy.uint64(0x94D049BB133111EB)
+_SHIFTS = [numpy.uint64(s) for s in (27, 30, 31, 32)]
+
+
+
+def tokenSeeds(tokens):
+  """
+  @param tokens     (list)          Token strings; unicode is utf-8 encoded.
+  @return           (numpy array)   A uint64 seed for each token, the first 8
+                                    bytes of its md5 digest (little-endian).
+  """
+  digests = "".join(
+    hashlib.md5(t.encode("utf-8") if isinstance(t, unicode) else t).digest()[:8]
+    for t in tokens)
+  return numpy.frombuffer(digests, dtype="<u8").astype(numpy.uint64)
+
+
+def splitmix64(seeds, counters):
+  """
+  Return the splitmix64 output for each seed (column vector) and counter (row
+  vector), as a uint64 array of shape (len(seeds), len(counters)).
+  """
+  shift27, shift30, shift31, _ = _SHIFTS
+  z = seeds[:, numpy.newaxis] + _GOLDEN * counters[numpy.newaxis, :]
+  z = (z ^ (z >> shift30)) * _MIX1
+  z = (z ^ (z >> shift27)) * _MIX2
+  return z ^ (z >> shift31)
+
+
+
+class RandomSDRGenerator(object):
+  """
+  Generates SDRs of w active positions out of n for tokens. Use one instance
+  per SDR size, e.g.
+    generator = RandomSDRGenerator(n=16384, w=328)
+    bitmaps = generator.encodeBatch(["the", "kitchen", "smells"])
+  """
+
+  def __init__(self, n, w, cacheSize=2**16):
+    """
+    @param n          (int)         Number of positions in an SDR.
+    @param w          (int)         Number of active positions; at most n.
+    @param cacheSize  (int)         Max number of tokens whose encode() result
+                                    is memoized.
+    """
+    if not 0 < w <= n:
+      raise ValueError("w must be between 1 and n.")
+    if n >= 2**32:
+      raise ValueError("n must be less than 2**32.")
+    self.n = n
+    self.w = w
+    self._n = numpy.uint64(n)
+    self.cacheSize = cacheSize
+    self._cache = {}
+    self._numCandidates = w + 16 + w * w // (2 * n)
+    self._steps = _GOLDEN * numpy.arange(1, self._numCandidates + 1,
+                                         dtype=numpy.uint64)
+
+
+  def encode(self, token):
+    """
+    Return the sorted int32 positions of one token's SDR. The SDRs of the last
+    cacheSize distinct tokens are memoized; the cache starts over when full.
+    """
+    bitmap = self._cache.get(token)
+    if bitmap is None:
+      bitmap = self._encodeOne(token)
+      if len(self._cache) >= self.cacheSize:
+        self._cache = {}
+      self._cache[token] = bitmap
+    return bitmap.copy()
+
+
+  def _encodeOne(self, token):
+    """
+    Same as encodeBatch([token])[0] without the batch setup: one row of
+    candidates, and numpy.unique for the first draw of each position.
+    """
+    digest = hashlib.md5(
+      token.encode("utf-8") if isinstance(token, unicode) else token).digest()
+    seed = numpy.frombuffer(digest[:8], dtype="<u8")[0]
+    shift27, shift30, shift31, shift32 = _SHIFTS
+    z = self._steps + seed
+    z = (z ^ (z >> shift30)) * _MIX1
+    z = (z ^ (z >> shift27)) * _MIX2
+    z ^= z >> shift31
+    candidates = ((z >> shift32) * self._n) >> shift32
+
+    _, firstDraws = numpy.unique(candidates, return_index=True)
+    if len(firstDraws) < self.w:
+      # Too many collisions; the batch path draws more candidates.
+      return self.encodeBatch([token])[0]
+    firstDraws.sort()
+    bitmap = candidates[firstDraws[:self.w]].astype(numpy.int32)
+    bitmap.sort()
+    return bitmap
+
+
+  def encodeBatch(self, tokens):
+    """
+    @param tokens     (list)          Token strings.
+    @return           (numpy array)   int32 array of shape (len(tokens), w);
+                                      row i holds the sorted positions of
+                                      token i's SDR.
+    """
+    seeds = tokenSeeds(tokens)
+    bitmaps = numpy.empty((len(seeds), self.w), dtype=numpy.int32)
+    if not len(seeds):
+      return bitmaps
+
+    # Draw enough candidates that nearly every row has w distinct positions;
+    # rows with too many collisions are redrawn with twice as many.
+    numCandidates = self.w + 16 + self.w * self.w // (2 * self.n)
+    rows = numpy.arange(len(seeds))
+    while len(rows):
+      positions, complete = self._firstDistinct(seeds[rows], numCandidates)
+      bitmaps[rows[complete]] = positions[complete]
+      rows = rows[~complete]
+      numCandidates *= 2
+
+    return bitmaps
+
+
+  def _firstDistinct(self, seeds, numCandidates):
+    """
+    @return           (tuple)         The sorted first w distinct candidate
+        positions of each seed, and a bool array of the rows that had w
+        distinct candidates (the other rows' positions are invalid).
+    """
+    counters = numpy.arange(1, numCandidates + 1, dtype=numpy.uint64)
+    # Scale the top 32 bits of each output to [0, n).
+    shift32 = _SHIFTS[3]
+    candidates = ((splitmix64(seeds, counters) >> shift32) * self._n) >> shift32
+
+    # Sort each row by position then candidate index, packed into one key.
+    indexBits = int(numCandidates - 1).bit_length()
+    keyType = (numpy.int32 if (self.n << indexBits) < 2**31 else numpy.int64)
+    keys = ((candidates.astype(keyType) << indexBits) |
+            numpy.arange(numCandidates, dtype=keyType))
+    keys.sort(axis=1)
+    positions = keys >> indexBits
+    indices = keys & ((1 << indexBits) - 1)
+
+    # The first draw of each position comes first among its repeats; give
+    # repeats an index past the end, then keep the w first draws with the
+    # lowest indices, which remain sorted by position.
+    repeat = numpy.zeros(keys.shape, dtype=bool)
+    repeat[:, 1:] = positions[:, 1:] == positions[:, :-1]
+    indices[repeat] = numCandidates
+    threshold = numpy.partition(indices, self.w - 1, axis=1)[:, self.w - 1]
+    complete = threshold < numCandidates
+    keep = indices[complete] <= threshold[complete, numpy.newaxis]
+
+    bitmaps = numpy.zeros((len(seeds), self.w), dtype=numpy.int32)
+    bitmaps[complete] = positions[complete][keep].reshape(-1, self.w)
+    return bitmaps, complete
+
+
+
+class TokenSDRTable(object):
+  """
+  Memo table of the SDRs of the tokens seen so far, for token-level encoders.
+  Each distinct token gets an id, and its SDR is row id of one contiguous
+  (number of tokens, w) position array, so a token's SDR is generated once
+  and every pattern of that token can be a view of the same row.
+
+  The table holds at most maxTokens tokens: a lookup that would add more
+  starts a new, empty table, so a long-running encoder's memory stays bounded.
+  Ids are only valid until the next lookup that resets the table; rows handed
+  out earlier keep their values.
+  """
+
+  def __init__(self, generator, capacity=1024, maxTokens=None):
+    """
+    @param generator  (RandomSDRGenerator)  Generates the SDRs of new tokens.
+    @param capacity   (int)                 Initial number of rows.
+    @param maxTokens  (int)                 Max number of tokens kept, or None
+                                            for no limit.
+    """
+    if maxTokens is not None and maxTokens < 1:
+      raise ValueError("maxTokens must be 1 or greater.")
+    self.generator = generator
+    self.maxTokens = maxTokens
+    self._capacity = capacity if maxTokens is None else min(capacity,
+                                                            maxTokens)
+    self.clear()
+
+
+  def clear(self):
+    """Forget all tokens; rows handed out earlier keep their values."""
+    self.ids = {}
+    self.tokens = []
+    self._bitmaps = numpy.empty((self._capacity, self.generator.w),
+                                dtype=numpy.int32)
+
+
+  def __len__(self):
+    return len(self.tokens)
+
+
+  @property
+  def bitmaps(self):
+    """The SDR of every token, as a (number of tokens, w) array."""
+    return self._bitmaps[:len(self.tokens)]
+
+
+  def lookup(self, tokens):
+    """
+    Return the token ids of tokens, adding the new ones to the table; the
+    SDRs of all new tokens are generated in one batch.
+
+    @param tokens     (list)          Token strings.
+    @return           (numpy array)   int64 id of each token.
+    """
+    if self.maxTokens is not None:
+      numNew = len(set(tokens).difference(self.ids))
+      if len(self.tokens) + numNew > self.maxTokens:
+        # A single lookup with more than maxTokens new tokens still gets ids
+        # for all of them; the next lookup resets the table.
+        self.clear()
+
+    ids = self.ids
+    numKnown = len(self.tokens)
+    for token in tokens:
+      if token not in ids:
+        ids[token] = len(self.tokens)
+        self.tokens.append(token)
+
+    if len(self.tokens) > numKnown:
+      self._reserve(len(self.tokens))
+      self._bitmaps[numKnown:len(self.tokens)] = self.generator.encodeBatch(
+        self.tokens[numKnown:])
+
+    return numpy.fromiter((ids[token] for token in tokens),
+                          dtype=numpy.int64,
+                          count=len(tokens))
+
+
+  def _reserve(self, numRows):
+    """
+    Grow the table by doubling, up to maxTokens rows; views of the old rows
+    stay valid.
+    """
+    capacity = len(self._bitmaps)
+    if numRows <= capacity:
+      return
+    capacity = max(capacity, 1)
+    while capacity < numRows:
+      capacity *= 2
+    if self.maxTokens is not None:
+      capacity = max(min(capacity, self.maxTokens), numRows)
+    bitmaps = numpy.empty((capacity, self.generator.w), dtype=numpy.int32)
+    bitmaps[:len(self._bitmaps)] = self._bitmaps
+    self._bitmaps = bitmaps
@@ -0,0 +1,210 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+"""
+Append-only on-disk store of experiment results. Each trial is written as soon
+as it finishes, so a crashed or interrupted run keeps its completed trials and
+can be resumed, and the predictions of all trials need not be held in memory.
+
+Per trial the store keeps the training set size, the train and test sample
+indices, and the predicted and actual label ids of each test sample, in
+columnar files (see fluent.utils.columnar):
+  - trainSizes      int64, one value per trial
+  - train, test     ragged int64 sample indices, one row per trial
+  - predictions     ragged int32 label ids, one row per test sample
+  - actual          ragged int32 label ids, one row per test sample
+The metadata file records the number of complete trials; it is replaced
+atomically after each trial, so values written after it, e.g. by a trial that
+was interrupted, are ignored and truncated when the store is reopened.
+"""
+
+import numpy
+import os
+
+from fluent.utils.columnar import (
+  ColumnWriter,
+  RaggedWriter,
+  readColumn,
+  readRagged)
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+STORE_VERSION = 1
+
+
+
+class ResultStore(object):
+  """
+  Appends trials to a result store directory, and reads them back from the
+  memory-mapped files.
+  """
+
+  def __init__(self, path, resume=True):
+    """
+    @param path       (str)       Directory of the store; created if needed.
+    @param resume     (bool)      Keep the trials already in the store; if
+                                  False, any existing trials are discarded.
+    """
+    if not os.path.isdir(path):
+      os.makedirs(path)
+    self.path = path
+
+    meta = {"version": STORE_VERSION, "numTrials": 0, "numTestSamples": 0}
+    metaPath = os.path.join(path, "meta.json")
+    if resume and os.path.isfile(metaPath):
+      with open(metaPath) as f:
+        meta = json.load(f)
+      if meta["version"] > STORE_VERSION:
+        raise ValueError("Result store version {0} is not supported."
+                         .format(meta["version"]))
+    self.numTrials = meta["numTrials"]
+    self.numTestSamples = meta["numTestSamples"]
+
+    append = self.numTrials > 0
+    self._trainSizes = ColumnWriter(
+      os.path.join(path, "trainSizes"), numpy.int64, append)
+    self._train = RaggedWriter(path, "train", numpy.int64, append)
+    self._test = RaggedWriter(path, "test", numpy.int64, append)
+    self._predictions = RaggedWriter(path, "predictions", numpy.int32, append)
+    self._actual = RaggedWriter(path, "actual", numpy.int32, append)
+
+    # Drop anything written after the last complete trial.
+    self._trainSizes.truncate(self.numTrials)
+    self._train.truncate(self.numTrials)
+    self._test.truncate(self.numTrials)
+    self._predictions.truncate(self.numTestSamples)
+    self._actual.truncate(self.numTestSamples)
+    self._writeMeta()
+
+    self._columns = None
+
+
+  def __len__(self):
+    return self.numTrials
+
+
+  def __iter__(self):
+    for i in xrange(self.numTrials):
+      yield self.getTrial(i)
+
+
+  def appendTrial(self, trainSize, trainIndices, testIndices, predictions,
+                  actual):
+    """
+    Write the results of one trial, and return its index.
+
+    @param trainSize      (int)         Training set size of the trial.
+    @param trainIndices   (array-like)  Indices of the training samples.
+    @param testIndices    (array-like)  Indices of the test samples.
+    @param predictions    (list)        Predicted label ids of each test
+                                        sample; None values are dropped.
+    @param actual         (list)        Actual label ids of each test sample.
+    """
+    if len(predictions) != len(testIndices) or len(actual) != len(testIndices):
+      raise ValueError("Expected predictions and actual labels for each of the "
+                       "{0} test samples.".format(len(testIndices)))
+
+    for predicted in predictions:
+      self._predictions.append([p for p in predicted if p is not None])
+    for labels in actual:
+      self._actual.append(labels)
+    self._trainSizes.append(trainSize)
+    self._train.append(trainIndices)
+    self._test.append(testIndices)
+    for column in self._writers():
+      column.flush()
+
+    self.numTrials += 1
+    self.numTestSamples += len(testIndices)
+    self._writeMeta()
+    self._columns = None
+    return self.numTrials - 1
+
+
+  def getTrial(self, trial):
+    """
+    @return           (dict)      The "trainSize", "trainIndices" and
+        "testIndices" of the trial, and its "results": a tuple of the lists of
+        predicted and actual label id arrays of the test samples, in the format
+        of ClassificationModel.evaluateResults().
+    """
+    if not 0 <= trial < self.numTrials:
+      raise IndexError("Trial index out of range.")
+    columns = self._getColumns()
+    # The per-sample rows of a trial follow those of the earlier trials, so
+    # they start at the trial's offset in the test column.
+    testOffsets = columns["testOffsets"]
+    samples = xrange(int(testOffsets[trial]), int(testOffsets[trial + 1]))
+
+    return {"trainSize": int(columns["trainSizes"][trial]),
+            "trainIndices": self._row(columns, "train", trial),
+            "testIndices": self._row(columns, "test", trial),
+            "results": ([self._row(columns, "predictions", i) for i in samples],
+                        [self._row(columns, "actual", i) for i in samples])}
+
+
+  def close(self):
+    for column in self._writers():
+      column.close()
+
+
+  def _writers(self):
+    return (self._trainSizes, self._train, self._test, self._predictions,
+            self._actual)
+
+
+  @staticmethod
+  def _row(columns, name, i):
+    offsets = columns[name + "Offsets"]
+    return columns[name][offsets[i]:offsets[i + 1]]
+
+
+  def _getColumns(self):
+    """Map the column files; remapped after each append."""
+    if self._columns is None:
+      columns = {"trainSizes": readColumn(
+        os.path.join(self.path, "trainSizes"), numpy.int64, self.numTrials)}
+      for name, dtype, numRows in (
+          ("train", numpy.int64, self.numTrials),
+          ("test", numpy.int64, self.numTrials),
+          ("predictions", numpy.int32, self.numTestSamples),
+          ("actual", numpy.int32, self.numTestSamples)):
+        columns[name], columns[name + "Offsets"] = readRagged(
+          self.path, name, dtype, numRows)
+      self._columns = columns
+    return self._columns
+
+
+  def _writeMeta(self):
+    """Replace the metadata file atomically."""
+    meta = {"version": STORE_VERSION,
+            "numTrials": self.numTrials,
+            "numTestSamples": self.numTestSamples}
+    tmpPath = os.path.join(self.path, "meta.json.tmp")
+    with open(tmpPath, "w") as f:
+      json.dump(meta, f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.rename(tmpPath, os.path.join(self.path, "meta.json"))
@@ -28,6 +28,7 @@ import re
 import string
 
 from collections import Counter
+from fluent.utils.instrumentation import instruments, timed
 from functools import partial
 
 
@@ -40,7 +41,8 @@ class TextPreprocess(object):
   def __init__(self,
                corpusTxt="compilation.txt",
                abbrCSV="abbreviations.csv",
-               contrCSV="contractions.csv"):
+               contrCSV="contractions.csv",
+               cacheSize=2**16):
     """
     @param corpusTxt      (str)       A compilation of most frequent words. The
         default file 'compilation.txt' is the most frequent words from both
@@ -53,6 +55,9 @@ class TextPreprocess(object):
     @param contrCSV       (str)       A compilation of common contractions. The
         file is a csv with the header "Contr,Expansion". The default file
         'contractions.csv' contains a short list of common contractions.
+
+    @param cacheSize      (int)       Max number of memoized spelling
+        corrections; the memo starts over when full.
     """
     self.abbrCSV = abbrCSV
     self.contrCSV = contrCSV
@@ -63,6 +68,11 @@ class TextPreprocess(object):
     self.contrs = None
     self.corpus = None
 
+    # Memo of spelling corrections; the corpus is fixed once loaded, so the
+    # correction of a word never changes.
+    self.cacheSize = cacheSize
+    self.corrections = {}
+
 
   def _setupCorpus(self, corpusSource):
     """Create member vars for English language corpus and bag of words."""
@@ -140,6 +150,23 @@ class TextPreprocess(object):
     return expansionPairs
 
 
+  @timed
+  def tokenizeSample(self, text, preprocess=False):
+    """
+    Tokenize a sample the way the experiments and the classification service
+    do: with preprocess, the 100 most common words and the "[identifier
+    deleted]" strings are removed, and spelling is corrected.
+    @param text               (str)             Single string to tokenize.
+    @param preprocess         (bool)            Preprocess the text.
+    """
+    if preprocess:
+      return self.tokenize(text,
+                           ignoreCommon=100,
+                           removeStrings=["[identifier deleted]"],
+                           correctSpell=True)
+    return self.tokenize(text)
+
+
   def tokenize(self,
                text,
                ignoreCommon=None,
@@ -228,6 +255,10 @@ class TextPreprocess(object):
     Find the best spelling correction for this word. Prefer edit distance  of 0,
     then one, then two; otherwise default to the word itself.
     """
+    if word in self.corrections:
+      instruments.increment("TextPreprocess.correctionCacheHits")
+      return self.corrections[word]
+
     if not self.bagOfWords:
       self._setupCorpus(self.corpusTxt)
 
@@ -236,7 +267,14 @@ class TextPreprocess(object):
                   self._known(self._editDistance2(word)) or
                   [word])
 
-    return max(candidates, key=self.bagOfWords.get)
+    correction = max(candidates, key=self.bagOfWords.get)
+    if correction != word:
+      instruments.increment("TextPreprocess.corrections")
+    if len(self.corrections) >= self.cacheSize:
+      self.corrections = {}
+    self.corrections[word] = correction
+
+    return correction
 
 
   def _known(self, words):
@@ -21,12 +21,17 @@
 
 import numpy
 import pandas
+import shutil
+import tempfile
 import unittest
 
+from fluent.encoders.stub_encoder import StubEncoder
 from fluent.models.classification_model import ClassificationModel
 from fluent.models.classify_endpoint import ClassificationModelEndpoint
 from fluent.models.classify_fingerprint import ClassificationModelFingerprint
 from fluent.models.classify_random_sdr import ClassificationModelRandomSDR
+from fluent.utils.instrumentation import instruments
+from fluent.utils.pattern_store import PatternStore, PatternStoreWriter
 
 
 
@@ -141,6 +146,160 @@ class ClassificationModelTest(unittest.TestCase):
                     "Outputs for samples 2 and 4 should be identical.")
 
 
+  def testRandomSDRTestModelTimedOnce(self):
+    """A single-sample test is one testBatch timing, not two."""
+    model = ClassificationModelRandomSDR()
+    pattern = model.encodePattern(["Pickachu"])
+    model.trainModel(pattern, numpy.array([0]))
+
+    instruments.reset()
+    instruments.enable()
+    try:
+      model.testModel(pattern)
+      histograms = instruments.toDict()["histograms"]
+    finally:
+      instruments.disable()
+      instruments.reset()
+
+    self.assertEqual(
+      histograms["ClassificationModelRandomSDR.testBatch"]["count"], 1)
+    self.assertNotIn("ClassificationModelRandomSDR.testModel", histograms)
+
+
+  def testSaveAndLoadRandomSDR(self):
+    """A loaded randomSDR model classifies the same as the saved model."""
+    model = ClassificationModelRandomSDR(k=2)
+
+    samples = [(["Pickachu", "Eevee"], numpy.array([0, 2])),
+               (["Charmander"], numpy.array([1])),
+               (["Abra", "Eevee"], numpy.array([1, 0]))]
+    patterns = [model.encodePattern(s[0]) for s in samples]
+    for pattern, (_, labels) in zip(patterns, samples):
+      model.trainModel(pattern, labels)
+
+    path = tempfile.mkdtemp()
+    try:
+      model.save(path)
+      loadedModel = ClassificationModelRandomSDR()
+      loadedModel.load(path)
+    finally:
+      shutil.rmtree(path)
+
+    self.assertEqual(loadedModel.classifier.k, 2)
+    for pattern in patterns:
+      self.assertSequenceEqual(model.testModel(pattern).tolist(),
+                               loadedModel.testModel(pattern).tolist())
+
+
+  def testSaveAndLoadFingerprint(self):
+    """A loaded fingerprint model classifies the same as the saved model."""
+    model = ClassificationModelFingerprint(encoder=StubEncoder(), k=2)
+
+    samples = [(["pikachu", "eevee"], numpy.array([0, 2])),
+               (["charmander"], numpy.array([1])),
+               (["abra", "eevee"], numpy.array([1, 0])),
+               (["eevee"], numpy.array([2]))]
+    patterns = [model.encodePattern(s[0]) for s in samples]
+    for pattern, (_, labels) in zip(patterns, samples):
+      model.trainModel(pattern, labels)
+
+    path = tempfile.mkdtemp()
+    try:
+      model.save(path)
+      loadedModel = ClassificationModelFingerprint(encoder=StubEncoder())
+      loadedModel.load(path)
+    finally:
+      shutil.rmtree(path)
+
+    self.assertEqual(loadedModel.classifier.k, 2)
+    saved = model._getPrototypes(model.classifier)
+    loaded = loadedModel._getPrototypes(loadedModel.classifier)
+    for name in ("positions", "offsets", "categories"):
+      self.assertSequenceEqual(loaded[name].tolist(), saved[name].tolist())
+    for pattern in patterns + [model.encodePattern(["eevee", "abra"])]:
+      self.assertSequenceEqual(model.testModel(pattern).tolist(),
+                               loadedModel.testModel(pattern).tolist())
+
+
+  def testFingerprintEncodeBatch(self):
+    """Batch encoding matches encodePattern(), including the random SDR of a
+    sample the encoder returns no fingerprint for."""
+    model = ClassificationModelFingerprint(encoder=StubEncoder())
+    samples = [["pikachu", "eevee"], [], ["charmander"]]
+
+    for encoding, sample in zip(model.encodeBatch(samples), samples):
+      expected = model.encodePattern(sample)
+      self.assertEqual(encoding["text"], expected["text"])
+      self.assertAlmostEqual(encoding["sparsity"], expected["sparsity"])
+      self.assertSequenceEqual(encoding["bitmap"].tolist(),
+                               expected["bitmap"].tolist())
+    self.assertEqual(len(model.encodeBatch([[]])[0]["bitmap"]), model.w)
+
+
+  def testRandomSDRDistanceMethod(self):
+    ClassificationModelRandomSDR(distanceMethod="rawOverlap")
+    with self.assertRaises(ValueError):
+      ClassificationModelRandomSDR(distanceMethod="norm")
+
+
+  def testTestPatterns(self):
+    """Stored samples are tested in one batch, as testModel() would."""
+    samples = [(["pikachu", "eevee"], numpy.array([0])),
+               (["charmander"], numpy.array([1])),
+               (["abra", "eevee"], numpy.array([1, 0])),
+               (["eevee"], numpy.array([2]))]
+    fingerprint = ClassificationModelFingerprint(encoder=StubEncoder())
+    randomSDR = ClassificationModelRandomSDR()
+
+    for model in (fingerprint, randomSDR):
+      path = tempfile.mkdtemp()
+      try:
+        with PatternStoreWriter(path) as writer:
+          for sample, labels in samples:
+            model.writePattern(writer, sample, labels)
+        store = PatternStore(path)
+        model.trainPatterns(store, [0, 1, 2])
+
+        batches = []
+        testBatch = model.testBatch
+        def countingTestBatch(batch, numLabels=3):
+          batches.append(len(batch))
+          return testBatch(batch, numLabels)
+        model.testBatch = countingTestBatch
+        results = model.testPatterns(store, [3, 1, 0])
+        expected = [model.testModel(store[i]["pattern"]) for i in (3, 1, 0)]
+      finally:
+        shutil.rmtree(path)
+
+      self.assertEqual([r.tolist() for r in results],
+                       [e.tolist() for e in expected])
+      if model is fingerprint:
+        self.assertEqual(batches, [3])
+
+
+  def testWritePatternRandomSDR(self):
+    """Patterns written as token ids read back as encodePattern() outputs."""
+    model = ClassificationModelRandomSDR(maxTokens=2)
+    samples = [["Pickachu", "Eevee"], ["Charmander"], ["Eevee", "Abra"]]
+
+    path = tempfile.mkdtemp()
+    try:
+      with PatternStoreWriter(path) as writer:
+        for i, sample in enumerate(samples):
+          model.writePattern(writer, sample, numpy.array([i]))
+      store = PatternStore(path)
+
+      self.assertEqual(store.numPatterns, 4)
+      for sample, stored in zip(samples, store):
+        expected = model.encodePattern(sample)
+        self.assertEqual([p["text"] for p in stored["pattern"]], sample)
+        for e, p in zip(expected, stored["pattern"]):
+          self.assertSequenceEqual(p["bitmap"].tolist(), e["bitmap"].tolist())
+          self.assertAlmostEqual(p["sparsity"], e["sparsity"])
+    finally:
+      shutil.rmtree(path)
+
+
 ## TODO: ClassificationModelEndpoint/Fingerprint tests (mock out encodings)
 
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+
+"""Tests for the Cortical.io encoder, with the cortipy client stubbed."""
+
+import os
+import sys
+import types
+import unittest
+
+
+
+class FakeEncodingError(Exception):
+  """Stands in for cortipy.exceptions.UnsuccessfulEncodingError."""
+
+
+
+def fakeCortipy():
+  cortipy = types.ModuleType("cortipy")
+  cortipy.cortical_client = types.ModuleType("cortipy.cortical_client")
+  cortipy.cortical_client.CorticalClient = object
+  cortipy.exceptions = types.ModuleType("cortipy.exceptions")
+  cortipy.exceptions.UnsuccessfulEncodingError = FakeEncodingError
+  return cortipy
+
+
+
+# The encoder module imports cortipy; stub it if it is not installed.
+try:
+  import cortipy
+except ImportError:
+  cortipy = fakeCortipy()
+  sys.modules["cortipy"] = cortipy
+  sys.modules["cortipy.cortical_client"] = cortipy.cortical_client
+  sys.modules["cortipy.exceptions"] = cortipy.exceptions
+
+from fluent.encoders import cio_encoder
+
+
+
+# Term -> (fingerprint positions, df)
+TERMS = {
+  "cat": ([1, 2, 3, 4], 0.02),
+  "dog": ([3, 4, 5, 6], 0.01),
+  "pet": ([4, 5, 6, 7, 8, 9, 10, 11], 0.03),
+}
+
+# Texts the fake API can encode directly.
+TEXTS = {
+  "a cat": [1, 2, 3],
+}
+
+
+
+class FakeClient(object):
+  """Stands in for cortipy's CorticalClient, counting the API requests."""
+
+  def __init__(self, apiKey, cacheDir=None):
+    self.requests = {"getTextBitmap": 0,
+                     "getBitmap": 0,
+                     "tokenize": 0,
+                     "bitmapToTerms": 0}
+    self.termRequests = []
+
+
+  def getTextBitmap(self, text):
+    self.requests["getTextBitmap"] += 1
+    if text not in TEXTS:
+      raise cio_encoder.UnsuccessfulEncodingError(text)
+    return {"text": text, "fingerprint": {"positions": TEXTS[text]}}
+
+
+  def getBitmap(self, term):
+    self.requests["getBitmap"] += 1
+    self.termRequests.append(term)
+    if term not in TERMS:
+      raise cio_encoder.UnsuccessfulEncodingError(term)
+    positions, df = TERMS[term]
+    return {"term": term, "df": df, "fingerprint": {"positions": positions}}
+
+
+  def tokenize(self, text):
+    # Like the API, return the sentences as comma separated tokens.
+    self.requests["tokenize"] += 1
+    return [",".join(text.split())]
+
+
+  def bitmapToTerms(self, encoding, numTerms=10):
+    self.requests["bitmapToTerms"] += 1
+    return [{"term": "remote", "score": 1.0}]
+
+
+
+class CioEncoderTest(unittest.TestCase):
+  """Test the Cortical.io encoder against a fake API client."""
+
+  def setUp(self):
+    self.client = cio_encoder.CorticalClient
+    cio_encoder.CorticalClient = FakeClient
+    self.apiKey = os.environ.get("CORTICAL_API_KEY")
+    os.environ["CORTICAL_API_KEY"] = "key"
+
+    self.encoder = cio_encoder.CioEncoder(w=10, h=10)
+    self.requests = self.encoder.client.requests
+
+
+  def tearDown(self):
+    cio_encoder.CorticalClient = self.client
+    if self.apiKey is None:
+      del os.environ["CORTICAL_API_KEY"]
+    else:
+      os.environ["CORTICAL_API_KEY"] = self.apiKey
+
+
+  def testDecodeIsRemoteByDefault(self):
+    """Indexed terms don't switch decode() away from the API."""
+    self.encoder.indexTerms(["cat"])
+
+    self.assertEqual(self.encoder.decode([1, 2]), [("remote", 1.0)])
+    self.assertEqual(self.requests["bitmapToTerms"], 1)
+
+
+  def testLocalDecode(self):
+    """Local decoding ranks the indexed terms by overlap, without requests."""
+    self.encoder.indexTerms(["cat", "dog", "pet"])
+
+    decoded = self.encoder.decodeBatch([[3, 4, 5, 6, 7], [1, 2]],
+                                       numTerms=2, local=True)
+
+    self.assertEqual(decoded, [[("dog", 4.0), ("pet", 4.0)],
+                               [("cat", 2.0)]])
+    self.assertEqual(self.encoder.decode([1, 2], local=True),
+                     [("cat", 2.0)])
+    self.assertEqual(self.requests["bitmapToTerms"], 0)
+
+
+  def testIndexTermsFetchesOnce(self):
+    """Each term is requested once; unencodable terms are skipped."""
+    self.encoder.indexTerms(["cat", "unknown", "dog"])
+    self.encoder.indexTerms(["dog", "unknown", "cat", "pet"])
+
+    self.assertEqual(sorted(self.encoder.client.termRequests),
+                     ["cat", "dog", "pet", "unknown"])
+    self.assertEqual(len(self.encoder.termIndex), 3)
+    self.assertNotIn("unknown", self.encoder.termIndex)
+
+
+  def testEncodeText(self):
+    """Texts the API encodes are not sub-encoded."""
+    encoding = self.encoder.encode("a cat")
+
+    self.assertEqual(encoding["fingerprint"]["positions"], [1, 2, 3])
+    self.assertEqual(self.requests["tokenize"], 0)
+    self.assertEqual(self.requests["getBitmap"], 0)
+
+
+  def testUnencodableTerms(self):
+    """Texts with unencodable tokens encode to None, and the tokens are not
+    requested again."""
+    self.assertIsNone(self.encoder.encode("cat unknown"))
+    self.assertIsNone(self.encoder.encode("unknown dog"))
+
+    self.assertEqual(self.encoder.client.termRequests.count("unknown"), 1)
+
+
+  def testEncodeBatch(self):
+    """Only the texts the API cannot encode are tokenized, and their distinct
+    tokens are each requested once."""
+    texts = ["a cat", "cat dog", "dog pet", "", "pet cat dog"]
+
+    encodings = self.encoder.encodeBatch(texts)
+
+    self.assertEqual(self.requests["getTextBitmap"], 4)
+    self.assertEqual(self.requests["tokenize"], 3)
+    self.assertEqual(sorted(self.encoder.client.termRequests),
+                     ["cat", "dog", "pet"])
+    self.assertEqual(encodings[0]["fingerprint"]["positions"], [1, 2, 3])
+    self.assertIsNone(encodings[3])
+    self.assertEqual([encodings[i]["term"] for i in (1, 2, 4)],
+                     ["dog", "dog", "dog"])
+
+
+  def testEncodeBatchMatchesEncode(self):
+    texts = ["a cat", "cat pet", "unknown cat", "pet"]
+    encodings = self.encoder.encodeBatch(texts)
+
+    self.assertEqual(encodings, [self.encoder.encode(text) for text in texts])
+    self.assertEqual(self.encoder.client.termRequests.count("unknown"), 1)
+
+
+  def testSubEncodingDf(self):
+    """The df method takes the fingerprint of the least frequent token."""
+    encoding = self.encoder.encode("cat dog pet")
+
+    self.assertEqual(encoding["term"], "dog")
+    self.assertEqual(encoding["fingerprint"]["positions"], [3, 4, 5, 6])
+    self.assertAlmostEqual(encoding["df"], 0.01)
+    self.assertAlmostEqual(encoding["sparsity"], 4.0)
+
+
+  def testSubEncodingKeyword(self):
+    """The keyword method keeps the most common bits of the tokens, up to the
+    target sparsity."""
+    encoding = self.encoder._subEncoding("cat dog pet", method="keyword")
+
+    # Bit 4 is in all three fingerprints and bits 3, 5 and 6 in two; the 5% of
+    # 100 bits is filled with one of the bits in a single fingerprint.
+    positions = encoding["fingerprint"]["positions"]
+    self.assertEqual(len(positions), 5)
+    self.assertTrue(set([3, 4, 5, 6]) < set(positions))
+    self.assertAlmostEqual(encoding["sparsity"], 5.0)
+    self.assertEqual(encoding["text"], "cat dog pet")
+
+
+  def testSubEncodingMethod(self):
+    with self.assertRaises(ValueError):
+      self.encoder._subEncoding("cat", method="tfidf")
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the LSA encoder, with gensim replaced by small stubs."""
+
+import numpy
+import sys
+import types
+import unittest
+
+
+
+class FakeDictionary(object):
+  """Stands in for gensim.corpora.Dictionary."""
+
+  instance = None
+
+  def __init__(self, terms):
+    self.token2id = {term: i for i, term in enumerate(terms)}
+
+
+  @classmethod
+  def load(cls, path):
+    return cls.instance
+
+
+  load_from_text = load
+
+
+  def doc2bow(self, tokens):
+    counts = {}
+    for token in tokens:
+      if token in self.token2id:
+        termId = self.token2id[token]
+        counts[termId] = counts.get(termId, 0) + 1
+    return sorted(counts.iteritems())
+
+
+
+class FakeTfidfModel(object):
+  """Weighs each term by its count."""
+
+  @classmethod
+  def load(cls, path):
+    return cls()
+
+
+  def __getitem__(self, bows):
+    return ([(termId, float(count)) for termId, count in bow] for bow in bows)
+
+
+
+class FakeProjection(object):
+
+  def __init__(self, u):
+    self.u = u
+
+
+
+class FakeLsiModel(object):
+  """Projects bag-of-words vectors onto the columns of projection.u."""
+
+  instance = None
+
+  def __init__(self, u, terms):
+    self.projection = FakeProjection(u)
+    self.num_topics = u.shape[1]
+    self.id2word = dict(enumerate(terms))
+
+
+  @classmethod
+  def load(cls, path):
+    return cls.instance
+
+
+  def __getitem__(self, corpus):
+    u = self.projection.u
+    for bow in corpus:
+      topics = numpy.zeros(self.num_topics)
+      for termId, weight in bow:
+        topics += weight * u[termId]
+      yield list(enumerate(topics))
+
+
+
+def corpus2dense(corpus, num_terms, num_docs):
+  dense = numpy.zeros((num_terms, num_docs))
+  for doc, vector in enumerate(corpus):
+    for i, weight in vector:
+      dense[i, doc] = weight
+  return dense
+
+
+
+def fakeGensim():
+  gensim = types.ModuleType("gensim")
+  gensim.corpora = types.ModuleType("gensim.corpora")
+  gensim.corpora.Dictionary = FakeDictionary
+  gensim.models = types.ModuleType("gensim.models")
+  gensim.models.TfidfModel = FakeTfidfModel
+  gensim.models.lsimodel = types.ModuleType("gensim.models.lsimodel")
+  gensim.models.lsimodel.LsiModel = FakeLsiModel
+  gensim.matutils = types.ModuleType("gensim.matutils")
+  gensim.matutils.corpus2dense = corpus2dense
+  return gensim
+
+
+# The encoder module imports gensim; stub it if it is not installed.
+try:
+  import gensim
+except ImportError:
+  sys.modules["gensim"] = fakeGensim()
+
+from fluent.encoders import lsa_encoder
+
+
+
+TERMS = ["kitchen", "smells", "manager", "listens", "pay", "raise", "fridge",
+         "odor", "team", "meeting", "desk", "chair"]
+
+
+
+class LSAEncoderTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.gensim = lsa_encoder.gensim
+    lsa_encoder.gensim = fakeGensim()
+
+    rng = numpy.random.RandomState(7)
+    self.u = rng.randn(len(TERMS), 20)
+    FakeDictionary.instance = FakeDictionary(TERMS)
+    FakeLsiModel.instance = FakeLsiModel(self.u, TERMS)
+    self.encoder = lsa_encoder.LSAEncoder(w=4)
+
+
+  def tearDown(self):
+    lsa_encoder.gensim = self.gensim
+
+
+  def _expectedTopics(self, tokens):
+    """The top w topics with positive weight, computed directly."""
+    weights = numpy.zeros(self.u.shape[1])
+    for token in tokens:
+      if token in TERMS:
+        weights += self.u[TERMS.index(token)]
+    top = numpy.argsort(-weights)[:self.encoder.w]
+    return sorted(top[weights[top] > 0].tolist())
+
+
+  def testEncodeBatchMatchesEncode(self):
+    texts = ["The kitchen smells", ["manager", "listens"], "pay raise pay",
+             "the kitchen smells", "unknown words only", ""]
+
+    batch = self.encoder.encodeBatch(texts)
+
+    self.assertEqual(batch.shape, (len(texts), 20))
+    for text, encoding in zip(texts, batch):
+      single = lsa_encoder.LSAEncoder(w=4).encode(text)
+      self.assertSequenceEqual(encoding.tolist(), single.tolist())
+      tokens = self.encoder._tokenize(text)
+      self.assertEqual(numpy.flatnonzero(encoding).tolist(),
+                       self._expectedTopics(tokens))
+    self.assertFalse(batch[4].any())
+    self.assertFalse(batch[5].any())
+
+
+  def testOnlyPositiveTopicsAreActive(self):
+    # One term whose projection is positive on a single topic.
+    self.u[TERMS.index("desk")] = -1.0
+    self.u[TERMS.index("desk"), 3] = 2.0
+
+    encoding = self.encoder.encode("desk")
+
+    self.assertEqual(numpy.flatnonzero(encoding).tolist(), [3])
+
+
+  def testCacheIsBounded(self):
+    encoder = lsa_encoder.LSAEncoder(w=4, cacheSize=2)
+
+    encodings = encoder.encodeBatch(["kitchen", "pay", "manager", "kitchen"])
+    self.assertLessEqual(len(encoder._topicCache), 2)
+    encoder.encodeBatch(["desk"])
+    self.assertLessEqual(len(encoder._topicCache), 2)
+
+    self.assertSequenceEqual(encodings[0].tolist(), encodings[3].tolist())
+    self.assertSequenceEqual(encoder.encode("manager").tolist(),
+                             encodings[2].tolist())
+
+
+  def testDecode(self):
+    encoding = self.encoder.encode("kitchen smells")
+
+    decoded = self.encoder.decode(encoding, numTerms=3)
+
+    self.assertEqual(len(decoded), 3)
+    weights = [weight for _, weight in decoded]
+    self.assertEqual(weights, sorted(weights, reverse=True))
+    self.assertEqual(self.encoder.decode(encoding), decoded[0][0])
+    self.assertIsNone(self.encoder.decode(numpy.zeros(20)))
+
+
+  def testDecodeMatchesPerTopicTerms(self):
+    encodings = self.encoder.encodeBatch(["kitchen smells", "pay raise",
+                                          "team meeting desk"])
+
+    decoded = self.encoder.decodeBatch(encodings, numTerms=5)
+
+    for encoding, terms in zip(encodings, decoded):
+      # Sum the normalized weights of each active topic's strongest terms,
+      # found with a full argsort per topic, as LsiModel.show_topic() does.
+      scores = {}
+      for topic in numpy.flatnonzero(encoding):
+        weights = self.u[:, topic] / numpy.sqrt((self.u[:, topic] ** 2).sum())
+        for termId in numpy.argsort(-numpy.abs(weights))[
+            :lsa_encoder.TERMS_PER_TOPIC]:
+          scores[TERMS[termId]] = (scores.get(TERMS[termId], 0.0) +
+                                   weights[termId])
+      expected = sorted(scores.iteritems(), key=lambda item: -item[1])[:5]
+
+      self.assertEqual([term for term, _ in terms],
+                       [term for term, _ in expected])
+      for (_, weight), (_, expectedWeight) in zip(terms, expected):
+        self.assertAlmostEqual(weight, expectedWeight, places=5)
+
+
+if __name__ == "__main__":
+  unittest.main()
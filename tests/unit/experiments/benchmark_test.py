@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Smoke tests for the experiment stage benchmarks."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+
+from fluent.experiments import benchmark
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+class BenchmarkTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _args(self, **kwargs):
+    args = {"numSamples": 50,
+            "vocabSize": 100,
+            "meanLength": 8,
+            "numCategories": 4,
+            "typoRate": 0.05,
+            "trainPortion": 0.8,
+            "models": sorted(benchmark.MODELS),
+            "noCorrectSpell": True,
+            "spellCorpus": "compilation.txt",
+            "maxSpellSamples": 10,
+            "seed": 42,
+            "output": os.path.join(self.tmpDir, "benchmark.json"),
+            "baseline": "",
+            "tolerance": 0.2}
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+
+  def testGenerateCorpusIsSeeded(self):
+    corpus = benchmark.generateCorpus(20, 50, 5, 3, 0.1, seed=1)
+
+    self.assertEqual(len(corpus), 20)
+    self.assertEqual([text for text, _ in corpus],
+                     [text for text, _ in
+                      benchmark.generateCorpus(20, 50, 5, 3, 0.1, seed=1)])
+    for _, labels in corpus:
+      self.assertTrue(1 <= len(labels) <= 3)
+      self.assertTrue(all(0 <= l < 3 for l in labels))
+
+
+  def testStageTimings(self):
+    output = benchmark.run(self._args())
+
+    stages = output["stages"]
+    expected = ["tokenize"] + ["{0}/{1}".format(model, stage)
+                               for model in benchmark.MODELS
+                               for stage in ("encode", "train", "test",
+                                             "evaluate")]
+    self.assertItemsEqual(stages.keys(), expected)
+    self.assertEqual(stages["tokenize"]["items"], 50)
+    self.assertEqual(stages["RandomSDR/train"]["items"], 40)
+    self.assertEqual(stages["RandomSDR/test"]["items"], 10)
+    for metrics in stages.itervalues():
+      self.assertGreaterEqual(metrics["seconds"], 0.0)
+      self.assertGreater(metrics["peakMemoryKB"], 0)
+
+    with open(os.path.join(self.tmpDir, "benchmark.json")) as f:
+      self.assertEqual(sorted(json.load(f)["stages"]), sorted(expected))
+
+
+  def testCompareToBaseline(self):
+    baselinePath = os.path.join(self.tmpDir, "benchmark.json")
+    with open(baselinePath, "w") as f:
+      json.dump({"stages": {"fast": {"itemsPerSecond": 100.0},
+                            "slow": {"itemsPerSecond": 100.0}}}, f)
+    results = {"fast": {"itemsPerSecond": 95.0},
+               "slow": {"itemsPerSecond": 50.0}}
+
+    self.assertEqual(
+      benchmark.compareToBaseline(results, baselinePath, 0.2), ["slow"])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+
+"""Tests for the experiment Runner, with the RandomSDR model."""
+
+import csv
+import numpy
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+
+
+# The runner's plotting module imports plotly; stub it if it is not installed.
+try:
+  import plotly
+except ImportError:
+  plotly = types.ModuleType("plotly")
+  for name in ("offline", "plotly", "tools", "graph_objs"):
+    setattr(plotly, name, types.ModuleType("plotly." + name))
+    sys.modules["plotly." + name] = getattr(plotly, name)
+  sys.modules["plotly"] = plotly
+  for name in ("Data", "ErrorY", "Figure", "Font", "Heatmap", "Layout",
+               "Margin", "Scatter", "XAxis", "YAxis"):
+    setattr(plotly.graph_objs, name, dict)
+
+from fluent.experiments.runner import Runner
+from fluent.models.classify_random_sdr import ClassificationModelRandomSDR
+from fluent.utils.data_split import partitionIndices
+
+
+DATA_PATH = os.path.join(
+  os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, os.pardir,
+  "data", "sample_reviews", "sample_reviews_data_training.csv")
+
+# Samples and their two label columns; the label ids are apple 0, banana 1,
+# cherry 2.
+SAMPLES = [("apples are red", "apple", ""),
+           ("bananas are yellow", "banana", ""),
+           ("cherries and apples", "cherry", "apple"),
+           ("cherries are red", "cherry", ""),
+           ("bananas and apples", "banana", "apple"),
+           ("yellow bananas", "banana", "")]
+
+
+
+class RunnerTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.runners = []
+
+
+  def tearDown(self):
+    for runner in self.runners:
+      runner.close()
+    shutil.rmtree(self.tmpDir)
+
+
+  def _writeCSV(self, name, samples):
+    """Write samples with their label columns in the data file format."""
+    path = os.path.join(self.tmpDir, name)
+    with open(path, "wb") as f:
+      writer = csv.writer(f)
+      writer.writerow(["QID", "QuestionText", "Response", "Classification1",
+                       "Classification2"])
+      for i, sample in enumerate(samples):
+        writer.writerow([i, "question"] + list(sample))
+    return path
+
+
+  def _runner(self, trainSize, dataPath=DATA_PATH, numClasses=1,
+              experimentName="runner", resume=False):
+    runner = Runner(dataPath=dataPath,
+                    resultsDir=self.tmpDir,
+                    experimentName=experimentName,
+                    load=False,
+                    modelName="ClassificationModelRandomSDR",
+                    modelModuleName="fluent.models.classify_random_sdr",
+                    numClasses=numClasses,
+                    plots=0,
+                    orderedSplit=False,
+                    trainSize=trainSize,
+                    verbosity=0,
+                    resume=resume)
+    self.runners.append(runner)
+    runner.initModel()
+    runner.setupData()
+    runner.encodeSamples()
+    return runner
+
+
+  def testPatternStore(self):
+    """Training and testing from the pattern store match the model run on the
+    encoded samples."""
+    runner = self._runner([10])
+    samples = runner.samples
+
+    self.assertEqual(len(runner.patterns), len(samples))
+    model = ClassificationModelRandomSDR(verbosity=0)
+    patterns = [model.encodePattern(sample) for sample, _ in samples]
+    for i, (_, labels) in enumerate(samples):
+      stored = runner.patterns[i]
+      self.assertSequenceEqual(stored["labels"].tolist(), labels.tolist())
+      self.assertEqual([p["bitmap"].tolist() for p in stored["pattern"]],
+                       [p["bitmap"].tolist() for p in patterns[i]])
+
+    trainIdx, testIdx = partitionIndices(len(samples), 10, seed=1)
+    runner.partitions = [(trainIdx, testIdx)]
+    runner.training(0)
+    runner.testing(0)
+
+    for i in trainIdx:
+      model.trainModel(patterns[i], samples[i][1])
+    trial = runner.resultStore.getTrial(0)
+    self.assertSequenceEqual(trial["testIndices"].tolist(), testIdx.tolist())
+    predicted, actual = trial["results"]
+    for j, i in enumerate(testIdx):
+      self.assertSequenceEqual(predicted[j].tolist(),
+                               model.testModel(patterns[i]).tolist())
+      self.assertSequenceEqual(actual[j].tolist(), samples[i][1].tolist())
+
+
+
+  def testValidateExperiment(self):
+    runner = self._runner([2, 5], self._writeCSV("data.csv", SAMPLES), 2)
+    self.assertEqual(runner.labelRefs, ["apple", "banana", "cherry"])
+    actual = [labels for _, labels in runner.samples]
+
+    # The first trial predicts label 0 for a sample expecting it, one of two
+    # expected labels where the other is unknown to the model, label 2 for a
+    # sample without expected labels, and nothing for a sample expecting
+    # label 2. The second trial tests only the sample without expectations.
+    runner.resultStore.appendTrial(2, [4, 5], [0, 1, 2, 3],
+                                   [[0], [1, 2], [2], []], actual[:4])
+    runner.resultStore.appendTrial(5, [0, 1, 3, 4, 5], [2], [[2]], [actual[2]])
+    expectations = [("expect apples", "apple", ""),
+                    ("expect bananas", "banana", "durian"),
+                    ("expect nothing", "", ""),
+                    ("expect cherries", "cherry", ""),
+                    ("expect more", "banana", ""),
+                    ("expect more bananas", "banana", "")]
+
+    accuracies = runner.validateExperiment(
+      self._writeCSV("expected.csv", expectations))
+
+    self.assertAlmostEqual(accuracies[0], (1.0 + 0.5 + 0.0) / 3)
+    self.assertTrue(numpy.isnan(accuracies[1]))
+
+    with self.assertRaises(ValueError):
+      runner.validateExperiment(
+        self._writeCSV("short.csv", expectations[:5]))
+
+
+  def testTrialAccuracies(self):
+    """Each trial's row has the accuracy of each label it tested, by label id,
+    and NaN for the labels it did not test."""
+    runner = self._runner([2, 4, 6], self._writeCSV("data.csv", SAMPLES), 2)
+    actual = [labels for _, labels in runner.samples]
+    runner.resultStore.appendTrial(2, [4, 5], [0, 1, 2, 3],
+                                   [[0], [2], [2], []], actual[:4])
+    runner.resultStore.appendTrial(4, [0, 2, 3, 4], [1, 5],
+                                   [[1], [0]], [actual[1], actual[5]])
+    runner.resultStore.appendTrial(6, range(6), [], [], [])
+
+    accuracies = runner._calculateTrialAccuracies()
+
+    nan = numpy.nan
+    numpy.testing.assert_array_equal(accuracies, [[0.5, 0.0, 0.5],
+                                                  [nan, 0.5, nan],
+                                                  [nan, nan, nan]])
+
+
+  def testResume(self):
+    """A run interrupted after its first trial and resumed skips the stored
+    trial, and ends with the accuracies of an uninterrupted run."""
+    numpy.random.seed(7)
+    uninterrupted = self._runner([5, 8], experimentName="uninterrupted")
+    uninterrupted.runExperiment()
+
+    numpy.random.seed(7)
+    interrupted = self._runner([5], experimentName="resumed")
+    interrupted.runExperiment()
+    interrupted.close()
+
+    resumed = self._runner([5, 8], experimentName="resumed", resume=True)
+    trained = []
+    training = resumed.training
+    def recordTraining(trial):
+      trained.append(trial)
+      training(trial)
+    resumed.training = recordTraining
+    # Continue the random partitions after the first trial's.
+    numpy.random.seed(7)
+    numpy.random.permutation(len(resumed.samples))
+    resumed.runExperiment()
+
+    self.assertEqual(trained, [1])
+    self.assertEqual(len(resumed.resultStore), 2)
+    for trial, expected in zip(resumed.resultStore,
+                               uninterrupted.resultStore):
+      self.assertSequenceEqual(trial["trainIndices"].tolist(),
+                               expected["trainIndices"].tolist())
+      self.assertSequenceEqual(trial["testIndices"].tolist(),
+                               expected["testIndices"].tolist())
+    numpy.testing.assert_array_equal(
+      resumed._calculateTrialAccuracies(),
+      uninterrupted._calculateTrialAccuracies())
+
+
+if __name__ == "__main__":
+  unittest.main()
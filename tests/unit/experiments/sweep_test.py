@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+
+"""Tests for the hyperparameter sweep."""
+
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+
+from fluent.experiments import sweep
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+DATA_PATH = os.path.join(
+  os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir, os.pardir,
+  "data", "sample_reviews", "sample_reviews_data_training.csv")
+
+
+
+class SweepTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _run(self, grid, experimentName="sweep", seed=42):
+    gridPath = os.path.join(self.tmpDir, "grid.json")
+    with open(gridPath, "w") as f:
+      json.dump(grid, f)
+    args = argparse.Namespace(dataPath=DATA_PATH,
+                              gridPath=gridPath,
+                              experimentName=experimentName,
+                              resultsDir=self.tmpDir,
+                              outputName="sweep_results.csv",
+                              numClasses=1,
+                              numLabels=1,
+                              trainSize=[5, 8],
+                              orderedSplit=False,
+                              seed=seed,
+                              numProcesses=1,
+                              stubEncoder=True)
+    return sweep.run(args)
+
+
+  def testExpandGrid(self):
+    configs = sweep.expandGrid(
+      [{"model": u"RandomSDR", "n": [100, 200], "w": 10, "k": [1, 3]},
+       {"model": "Fingerprint", "preprocess": [False, True]}])
+
+    self.assertEqual(len(configs), 6)
+    self.assertEqual(
+      sorted((c["n"], c["k"]) for c in configs if c["model"] == "RandomSDR"),
+      [(100, 1), (100, 3), (200, 1), (200, 3)])
+    self.assertTrue(all(c["w"] == 10 for c in configs[:4]))
+    self.assertEqual([c["preprocess"] for c in configs[4:]], [False, True])
+    self.assertTrue(all(type(c["model"]) is str for c in configs))
+
+
+  def testExpandGridBadModel(self):
+    with self.assertRaises(ValueError):
+      sweep.expandGrid({"model": "Doc2Vec", "k": [1, 3]})
+    with self.assertRaises(ValueError):
+      sweep.expandGrid({"k": [1, 3]})
+
+
+  def testEncodingKey(self):
+    """Only the model, preprocessing and encoder parameters key encodings."""
+    key = sweep.encodingKey
+    config = {"model": "RandomSDR", "n": 100, "w": 10, "k": 1}
+
+    self.assertEqual(key(config), key(dict(config, k=3)))
+    self.assertNotEqual(key(config), key(dict(config, n=200)))
+    self.assertNotEqual(key(config), key(dict(config, w=20)))
+    self.assertNotEqual(key(config), key(dict(config, preprocess=True)))
+    self.assertEqual(key(config), key(dict(config, preprocess=False)))
+    self.assertEqual(key(dict(config, preprocess=1)),
+                     key(dict(config, preprocess=True)))
+    self.assertEqual(key({"model": "Fingerprint", "k": 1}),
+                     key({"model": "Fingerprint", "k": 3}))
+    self.assertNotEqual(key({"model": "Fingerprint"}),
+                        key({"model": "RandomSDR"}))
+
+
+  def testRunSharesEncodings(self):
+    table = self._run({"model": "RandomSDR", "n": [100, 200], "w": 10,
+                       "k": [1, 3]})
+
+    # Columns: k, model, n, w, then sweep.RESULT_COLUMNS.
+    encodingsDir = os.path.join(self.tmpDir, "sweep", "encodings")
+    self.assertEqual(len(os.listdir(encodingsDir)), 2)
+    self.assertEqual(len(table), 8)
+    encodeSeconds = {}
+    for row in table:
+      encodeSeconds.setdefault(row[2], set()).add(row[7])
+    self.assertEqual(sorted(encodeSeconds), [100, 200])
+    self.assertTrue(all(len(s) == 1 for s in encodeSeconds.itervalues()))
+    self.assertTrue(os.path.isfile(
+      os.path.join(self.tmpDir, "sweep", "sweep_results.csv")))
+
+
+  def testRunPartitionsAreSeeded(self):
+    grid = {"model": "RandomSDR", "n": 100, "w": 10, "k": 1}
+    accuracies = lambda table: [row[6] for row in table]
+
+    table1 = self._run(grid, "sweep1")
+    table2 = self._run(grid, "sweep2")
+
+    self.assertEqual(accuracies(table1), accuracies(table2))
+    self.assertEqual([row[5] for row in table1], [5, 8])
+
+
+
+if __name__ == "__main__":
+  unittest.main()
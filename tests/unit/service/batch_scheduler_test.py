@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the micro-batching scheduler."""
+
+import numpy
+import threading
+import unittest
+
+from fluent.encoders.stub_encoder import StubEncoder
+from fluent.models.classify_fingerprint import ClassificationModelFingerprint
+from fluent.service.batch_scheduler import MicroBatchScheduler
+
+
+
+class MicroBatchSchedulerTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.model = ClassificationModelFingerprint(verbosity=0,
+                                                encoder=StubEncoder())
+    for text, labels in [("the kitchen smells", numpy.array([0])),
+                         ("my manager never listens", numpy.array([1]))]:
+      self.model.trainModel(self.model.encodePattern(text.split()), labels)
+
+    self.samples = [["kitchen"], ["manager"], ["the", "kitchen"], ["my"]]
+
+
+  def testResultsMatchModel(self):
+    scheduler = MicroBatchScheduler(self.model, maxBatchSize=3, maxWaitMs=50)
+    scheduler.start()
+    try:
+      predictions, futures = scheduler.classify(self.samples)
+    finally:
+      scheduler.stop()
+
+    for sample, predicted in zip(self.samples, predictions):
+      expected = self.model.testModel(self.model.encodePattern(sample))
+      self.assertSequenceEqual(predicted.tolist(), expected.tolist())
+    self.assertTrue(all(f.latency["batchSize"] <= 3 for f in futures))
+    self.assertEqual(scheduler.getStats()["samples"], len(self.samples))
+
+
+  def testConcurrentRequestsAreBatched(self):
+    scheduler = MicroBatchScheduler(self.model, maxBatchSize=100,
+                                    maxWaitMs=200)
+    scheduler.start()
+
+    results = [None] * 20
+    def request(i):
+      results[i] = scheduler.submit(self.samples[i % 4]).result()
+    threads = [threading.Thread(target=request, args=(i,)) for i in xrange(20)]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    scheduler.stop()
+
+    stats = scheduler.getStats()
+    self.assertEqual(stats["samples"], 20)
+    self.assertLess(stats["batches"], 20)
+    self.assertTrue(all(r is not None for r in results))
+
+
+  def testSubmitRequiresStart(self):
+    scheduler = MicroBatchScheduler(self.model)
+
+    with self.assertRaises(RuntimeError):
+      scheduler.submit(["kitchen"])
+
+
+  def testShortBatchResultFailsEveryFuture(self):
+    testBatch = self.model.testBatch
+    self.model.testBatch = lambda patterns, numLabels: testBatch(patterns[:1],
+                                                                 numLabels)
+    scheduler = MicroBatchScheduler(self.model, maxBatchSize=100,
+                                    maxWaitMs=200)
+    scheduler.start()
+    try:
+      futures = [scheduler.submit(s) for s in self.samples]
+      for future in futures:
+        with self.assertRaisesRegexp(RuntimeError, "predictions"):
+          future.result(timeout=5)
+
+      # The worker survives the failed batch.
+      self.model.testBatch = testBatch
+      self.assertIsNotNone(scheduler.submit(["kitchen"]).result(timeout=5))
+    finally:
+      scheduler.stop()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the classification service."""
+
+import numpy
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib2
+
+from fluent.encoders.stub_encoder import StubEncoder
+from fluent.models.classify_fingerprint import ClassificationModelFingerprint
+from fluent.models.classify_random_sdr import ClassificationModelRandomSDR
+from fluent.service.classification_service import (
+  ClassificationServer,
+  ClassificationService,
+  loadModel)
+
+try:
+  import simplejson as json
+except ImportError:
+  import json
+
+
+
+class ClassificationServiceTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.model = ClassificationModelFingerprint(verbosity=0,
+                                                encoder=StubEncoder())
+    samples = [("the kitchen smells of old fish", numpy.array([0])),
+               ("my manager never listens", numpy.array([1])),
+               ("we need a bigger kitchen fridge", numpy.array([0, 2]))]
+    for text, labels in samples:
+      self.model.trainModel(self.model.encodePattern(text.split()), labels)
+
+    self.service = ClassificationService(self.model,
+                                         labelRefs=["kitchen", "management",
+                                                    "facilities"])
+
+
+  def tearDown(self):
+    self.service.close()
+
+
+  def testClassifyMatchesModel(self):
+    texts = ["the kitchen smells", "my manager"]
+
+    predictions, latencies = self.service.classify(texts)
+
+    for text, predicted in zip(texts, predictions):
+      expected = self.model.testModel(self.model.encodePattern(text.split()))
+      self.assertSequenceEqual(predicted, expected.tolist())
+    self.assertItemsEqual(latencies.keys(),
+                          ["preprocess", "queue", "encode", "infer"])
+
+    stats = self.service.getStats()
+    self.assertEqual(stats["encode"]["count"], 2)
+
+
+  def testHTTPRoundTrip(self):
+    server = ClassificationServer(("localhost", 0), self.service, verbosity=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://{0}:{1}".format(*server.server_address)
+
+    try:
+      request = urllib2.Request(url + "/classify",
+                                json.dumps({"texts": ["the kitchen smells"]}))
+      response = json.loads(urllib2.urlopen(request).read())
+      stats = json.loads(urllib2.urlopen(url + "/stats").read())
+    finally:
+      server.shutdown()
+      server.server_close()
+
+    result = response["results"][0]
+    self.assertEqual(result["text"], "the kitchen smells")
+    self.assertEqual(result["labelNames"],
+                     [self.service.labelRefs[l] for l in result["labels"]])
+    self.assertEqual(stats["infer"]["count"], 1)
+
+
+  def testHTTPErrors(self):
+    server = ClassificationServer(("localhost", 0), self.service, verbosity=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://{0}:{1}/classify".format(*server.server_address)
+
+    def post(body):
+      try:
+        urllib2.urlopen(urllib2.Request(url, json.dumps(body)))
+      except urllib2.HTTPError as e:
+        return e.code, json.loads(e.read())
+      return 200, None
+
+    def failingClassify(texts):
+      raise RuntimeError("model failure")
+
+    try:
+      badStrings = post({"texts": "the kitchen smells"})
+      badItems = post({"texts": ["the kitchen", 3]})
+      self.service.classify = failingClassify
+      modelError = post({"texts": ["the kitchen smells"]})
+    finally:
+      server.shutdown()
+      server.server_close()
+
+    self.assertEqual(badStrings[0], 400)
+    self.assertEqual(badItems[0], 400)
+    self.assertEqual(modelError[0], 500)
+    self.assertIn("model failure", modelError[1]["error"])
+
+
+  def testLoadModelStubEncoder(self):
+    """--stubEncoder only reaches models that take an encoder."""
+    modelDir = tempfile.mkdtemp()
+    try:
+      model = ClassificationModelRandomSDR(verbosity=0)
+      pattern = model.encodePattern(["kitchen"])
+      model.trainModel(pattern, numpy.array([1]))
+      model.save(modelDir)
+
+      loadedModel = loadModel(modelDir,
+                              "ClassificationModelRandomSDR",
+                              "fluent.models.classify_random_sdr",
+                              verbosity=0,
+                              stubEncoder=True)
+    finally:
+      shutil.rmtree(modelDir)
+
+    self.assertIsInstance(loadedModel, ClassificationModelRandomSDR)
+    self.assertSequenceEqual(loadedModel.testModel(pattern).tolist(), [1])
+
+
+if __name__ == "__main__":
+  unittest.main()
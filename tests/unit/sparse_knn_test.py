@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the sparse_knn module."""
+
+import numpy
+import unittest
+
+from fluent.models.sparse_knn import SparseKNN
+
+
+
+def _referenceVotes(prototypes, categories, k, query):
+  """
+  Votes of KNNClassifier.infer() with exact=True and rawOverlap, computed by
+  scanning every prototype.
+  """
+  if not categories:
+    return numpy.zeros(1)
+  votes = numpy.zeros(max(categories) + 1)
+  matches = [i for i, p in enumerate(prototypes) if set(query) <= set(p)]
+  for i in matches[:min(k, len(categories))]:
+    votes[categories[i]] += 1
+  if votes.any():
+    votes /= votes.sum()
+  return votes
+
+
+
+class SparseKNNTest(unittest.TestCase):
+
+
+  def testNoPrototypes(self):
+    knn = SparseKNN(k=3)
+
+    self.assertSequenceEqual(knn.infer([1, 2]).tolist(), [0.0])
+    self.assertEqual(knn.inferBatch([], [0, 0, 0]).shape, (2, 1))
+
+
+  def testMatchesReference(self):
+    rng = numpy.random.RandomState(1)
+    vocabulary = [numpy.sort(rng.choice(60, rng.randint(0, 6), replace=False))
+                  for _ in xrange(15)]
+    prototypes = [vocabulary[rng.randint(15)] for _ in xrange(80)]
+    categories = rng.randint(6, size=80).tolist()
+    queries = ([vocabulary[rng.randint(15)] for _ in xrange(40)] +
+               [numpy.array([], dtype=int), numpy.array([59, 1000])])
+    positions = numpy.concatenate(queries).astype(int)
+    offsets = numpy.cumsum([0] + [len(q) for q in queries])
+
+    for k in (1, 3, 5):
+      # A small maxBatchEntries scores the queries in several chunks.
+      knn = SparseKNN(k=k, maxBatchEntries=7)
+      for p, c in zip(prototypes, categories):
+        knn.learn(p, c)
+
+      votes = knn.inferBatch(positions, offsets)
+
+      expected = numpy.array([_referenceVotes(prototypes, categories, k, q)
+                              for q in queries])
+      self.assertTrue(numpy.array_equal(votes, expected),
+                      "Votes differ from the reference for k={0}".format(k))
+
+
+  def testRepeatedPairsShareARow(self):
+    knn = SparseKNN(k=2)
+    for _ in xrange(100):
+      knn.learn([3, 5], 1)
+    knn.learn([3, 5], 2)
+    knn.learn([3], 0)
+
+    self.assertEqual(len(knn), 102)
+    self.assertEqual(knn.numRows(), 3)
+    arrays = knn.getPrototypes()
+    self.assertSequenceEqual(arrays["counts"].tolist(), [100, 1, 1])
+    self.assertSequenceEqual(arrays["learnOrder"].tolist(), [0, 1, 100, 101])
+    # The first two learned prototypes match, both of category 1.
+    self.assertSequenceEqual(knn.infer([3]).tolist(), [0.0, 1.0, 0.0])
+    self.assertSequenceEqual(knn.infer([]).tolist(), [0.0, 1.0, 0.0])
+
+
+  def testPrototypesRoundTrip(self):
+    knn = SparseKNN(k=2)
+    knn.learn([5, 3, 5], 1)
+    knn.learn([], 0)
+    knn.learn([3, 8], 2)
+    knn.learn([3, 5], 1)
+
+    arrays = knn.getPrototypes()
+    self.assertSequenceEqual(arrays["positions"].tolist(), [3, 5, 3, 8])
+    self.assertSequenceEqual(arrays["offsets"].tolist(), [0, 2, 2, 4])
+    self.assertSequenceEqual(arrays["categories"].tolist(), [1, 0, 2])
+
+    restored = SparseKNN(k=2)
+    restored.setPrototypes(arrays)
+    self.assertEqual(len(restored), 4)
+    self.assertSequenceEqual(restored.infer([3]).tolist(),
+                             knn.infer([3]).tolist())
+
+    # Learning after a restore adds to the existing rows.
+    restored.learn([3, 8], 2)
+    self.assertEqual(restored.numRows(), 3)
+    self.assertSequenceEqual(restored.getPrototypes()["counts"].tolist(),
+                             [2, 1, 2])
+
+
+  def testRestoredPrototypesVote(self):
+    """Restored prototypes vote as the learned ones, also with a smaller k and
+    after learning more."""
+    rng = numpy.random.RandomState(3)
+    learned = [(rng.choice(8, rng.randint(1, 4), replace=False),
+                rng.randint(3)) for _ in xrange(60)]
+    queries = [rng.choice(8, rng.randint(0, 3), replace=False)
+               for _ in xrange(20)]
+    positions = numpy.concatenate(queries)
+    offsets = numpy.cumsum([0] + [len(q) for q in queries])
+
+    knn = SparseKNN(k=3)
+    for pattern, category in learned:
+      knn.learn(pattern, category)
+    arrays = knn.getPrototypes()
+
+    for k in (3, 1):
+      expected = SparseKNN(k=k)
+      for pattern, category in learned:
+        expected.learn(pattern, category)
+      restored = SparseKNN(k=k)
+      restored.setPrototypes(arrays)
+
+      self.assertEqual(len(restored), 60)
+      self.assertEqual(restored.numRows(), expected.numRows())
+      self.assertTrue(numpy.allclose(restored.inferBatch(positions, offsets),
+                                     expected.inferBatch(positions, offsets)))
+
+      expected.learn([0], 1)
+      restored.learn([0], 1)
+      self.assertTrue(numpy.allclose(restored.inferBatch(positions, offsets),
+                                     expected.inferBatch(positions, offsets)))
+
+    restored = SparseKNN(k=3)
+    restored.setPrototypes(arrays)
+    for name, array in restored.getPrototypes().iteritems():
+      self.assertSequenceEqual(array.tolist(), arrays[name].tolist())
+
+
+  def testOneRowPerPrototypeArrays(self):
+    """Arrays with one row per learned prototype, without counts, load."""
+    knn = SparseKNN(k=3)
+    knn.setPrototypes({"positions": numpy.array([1, 2, 1, 2, 2]),
+                       "offsets": numpy.array([0, 2, 4, 5]),
+                       "categories": numpy.array([0, 0, 1])})
+
+    self.assertEqual(len(knn), 3)
+    self.assertEqual(knn.numRows(), 2)
+    self.assertTrue(numpy.allclose(knn.infer([2]), [2.0/3, 1.0/3]))
+
+
+if __name__ == "__main__":
+  unittest.main()
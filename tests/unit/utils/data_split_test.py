@@ -22,6 +22,7 @@
 
 """Tests for data_split module."""
 
+import numpy
 import unittest
 
 from fluent.utils import data_split
@@ -82,6 +83,114 @@ class DataSplitTest(unittest.TestCase):
       partition1[0][0]+partition1[0][1], partition2[0][0]+partition2[0][1])
 
 
+  def testKFoldsSplitIndices(self):
+    kfolds = data_split.KFolds(3)
+
+    splits = [(train.tolist(), test.tolist())
+              for train, test in kfolds.splitIndices(7)]
+
+    self.assertSequenceEqual(
+        splits,
+        [([2, 3, 4, 5, 6], [0, 1]),
+         ([0, 1, 4, 5, 6], [2, 3]),
+         ([0, 1, 2, 3, 6], [4, 5])])
+
+    with self.assertRaises(ValueError):
+      kfolds.splitIndices(2)
+
+
+  def testKFoldsSplitIndicesRandomize(self):
+    kfolds = data_split.KFolds(4)
+
+    splits1 = list(kfolds.splitIndices(100, randomize=True, seed=1))
+    splits2 = list(kfolds.splitIndices(100, randomize=True, seed=1))
+
+    tests = numpy.concatenate([test for _, test in splits1])
+    self.assertSequenceEqual(sorted(tests.tolist()), range(100))
+    for (train1, test1), (train2, test2) in zip(splits1, splits2):
+      self.assertSequenceEqual(train1.tolist(), train2.tolist())
+      self.assertSequenceEqual(test1.tolist(), test2.tolist())
+      self.assertSequenceEqual(
+        sorted(train1.tolist() + test1.tolist()), range(100))
+
+
+  def testRandomizeWithoutSeedUsesGlobalSeed(self):
+    kfolds = data_split.KFolds(4)
+
+    numpy.random.seed(5)
+    splits1 = list(kfolds.splitIndices(100, randomize=True))
+    numpy.random.seed(5)
+    splits2 = list(kfolds.splitIndices(100, randomize=True))
+
+    for (_, test1), (_, test2) in zip(splits1, splits2):
+      self.assertSequenceEqual(test1.tolist(), test2.tolist())
+
+
+  def testBaseClassMethodsRaise(self):
+    splitter = data_split.DataSplit()
+
+    with self.assertRaises(NotImplementedError):
+      splitter.split(range(10))
+    with self.assertRaises(NotImplementedError):
+      splitter.splitIndices(10)
+
+
+  def testStandardSplitIndices(self):
+    splitter = data_split.StandardSplit(0.7)
+
+    train, test = splitter.splitIndices(10)
+    self.assertSequenceEqual(train.tolist(), [0, 1, 2, 3, 4, 5, 6])
+    self.assertSequenceEqual(test.tolist(), [7, 8, 9])
+
+    train, test = splitter.splitIndices(10, randomize=True, seed=3)
+    self.assertEqual(len(train), 7)
+    self.assertSequenceEqual(sorted(train.tolist() + test.tolist()), range(10))
+
+
+  def testStratifiedKFolds(self):
+    labels = numpy.array([0, 0, 0, 0, 0, 0, 1, 1, 1, 2, 2, 2])
+    kfolds = data_split.StratifiedKFolds(3)
+
+    for randomize in (False, True):
+      splits = list(kfolds.splitIndices(labels, randomize=randomize, seed=0))
+      self.assertEqual(len(splits), 3)
+      for train, test in splits:
+        self.assertSequenceEqual(
+          numpy.bincount(labels[test], minlength=3).tolist(), [2, 1, 1])
+        self.assertSequenceEqual(
+          sorted(train.tolist() + test.tolist()), range(12))
+
+    self.assertSequenceEqual(
+      kfolds.split("abcdefghijkl", labels)[0],
+      (list("bcefhikl"), list("adgj")))
+
+
+  def testMultilabelStratifiedKFolds(self):
+    # Label 2 is rare and always appears alongside label 0; samples 8 and 9
+    # have no labels.
+    sampleLabels = [[0, 2], [0], [0, 1], [1], [0, 2], [1], [0], [0, 1], [], []]
+    labelOffsets = numpy.cumsum([0] + [len(l) for l in sampleLabels])
+    labels = numpy.array(sum(sampleLabels, []))
+    kfolds = data_split.MultilabelStratifiedKFolds(2)
+
+    splits = list(kfolds.splitIndices(labels, labelOffsets, randomize=True,
+                                      seed=0))
+
+    tests = [test.tolist() for _, test in splits]
+    self.assertSequenceEqual(sorted(sum(tests, [])), range(10))
+    for train, test in splits:
+      self.assertEqual(len(test), 5)
+      self.assertSequenceEqual(
+        sorted(train.tolist() + test.tolist()), range(10))
+      testLabels = sum([sampleLabels[i] for i in test], [])
+      self.assertEqual(testLabels.count(2), 1)
+      self.assertEqual(testLabels.count(0), 3)
+      self.assertEqual(testLabels.count(1), 2)
+
+    with self.assertRaises(ValueError):
+      kfolds.splitIndices(numpy.array([0]), numpy.array([0, 1]))
+
+
   def testStandardSplitBadValue(self):
     with self.assertRaises(ValueError):
       data_split.StandardSplit(2)
@@ -123,5 +232,25 @@ class DataSplitTest(unittest.TestCase):
       partition1[0]+partition1[1], partition2[0]+partition2[1])
 
 
+  def testPartitionIndices(self):
+    train, test = data_split.partitionIndices(10, 4, orderedSplit=True)
+    self.assertSequenceEqual(train.tolist(), [0, 1, 2, 3])
+    self.assertSequenceEqual(test.tolist(), [4, 5, 6, 7, 8, 9])
+
+    train, test = data_split.partitionIndices(10, 4, seed=3)
+    self.assertEqual(len(train), 4)
+    self.assertSequenceEqual(test.tolist(),
+                             sorted(set(range(10)) - set(train.tolist())))
+    self.assertSequenceEqual(
+      train.tolist(), data_split.partitionIndices(10, 4, seed=3)[0].tolist())
+
+    numpy.random.seed(5)
+    train1, _ = data_split.partitionIndices(100, 10)
+    numpy.random.seed(5)
+    train2, _ = data_split.partitionIndices(100, 10)
+    self.assertSequenceEqual(train1.tolist(), train2.tolist())
+
+
+
 if __name__ == "__main__":
   unittest.main()
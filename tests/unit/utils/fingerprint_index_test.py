@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the fingerprint_index module."""
+
+import unittest
+
+from fluent.utils.fingerprint_index import FingerprintIndex
+
+
+
+class FingerprintIndexTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.index = FingerprintIndex()
+    self.index.add("kitchen", [1, 2, 3, 4])
+    self.index.add("smells", [3, 4, 5])
+    self.index.add("the", [10, 11])
+    self.index.add("cook", [1, 2, 5])
+
+
+  def testDecodeRanksByOverlap(self):
+    decoded = self.index.decode([1, 2, 3, 5, 99], numTerms=10)
+
+    # kitchen and cook tie at 3 bits; ties keep the order terms were added.
+    self.assertEqual(decoded, [("kitchen", 3.0), ("cook", 3.0),
+                               ("smells", 2.0)])
+    self.assertEqual(self.index.decode([1, 2, 3, 5], numTerms=1),
+                     [("kitchen", 3.0)])
+
+
+  def testDecodeBatch(self):
+    decoded = self.index.decodeBatch([[10], [], [42]], numTerms=2)
+
+    self.assertEqual(decoded, [[("the", 1.0)], [], []])
+
+
+  def testAddKeepsFirstFingerprint(self):
+    self.assertEqual(self.index.add("the", [1]), 2)
+    self.assertEqual(len(self.index), 4)
+    self.assertIn("the", self.index)
+    self.assertSequenceEqual(self.index.getPositions("the").tolist(), [10, 11])
+    self.assertEqual(self.index.decode([1], numTerms=5),
+                     [("kitchen", 1.0), ("cook", 1.0)])
+
+
+  def testTakeFromGrownArrays(self):
+    index = FingerprintIndex(capacity=1, positionsCapacity=1)
+    for i in xrange(20):
+      index.add("term{0}".format(i), [i, i + 100, i + 200], df=i)
+
+    positions, offsets = index.take([19, 0, 19])
+    self.assertSequenceEqual(positions.tolist(),
+                             [19, 119, 219, 0, 100, 200, 19, 119, 219])
+    self.assertSequenceEqual(offsets.tolist(), [0, 3, 6, 9])
+    self.assertSequenceEqual(index.getDfs([3, 7]).tolist(), [3.0, 7.0])
+    self.assertEqual(index.decode([5, 105, 6])[:2],
+                     [("term5", 2.0), ("term6", 1.0)])
+
+
+  def testEmptyIndex(self):
+    self.assertEqual(FingerprintIndex().decode([1, 2]), [])
+
+
+if __name__ == "__main__":
+  unittest.main()
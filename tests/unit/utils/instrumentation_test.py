@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the instrumentation module."""
+
+import unittest
+
+from fluent.utils.instrumentation import Instrumentation, instruments, timed
+
+
+
+class Timed(object):
+
+  @timed
+  def work(self, value):
+    return value
+
+
+
+class InstrumentationTest(unittest.TestCase):
+
+
+  def testDisabledRecordsNothing(self):
+    instrumentation = Instrumentation()
+
+    instrumentation.increment("calls")
+    instrumentation.observe("sizes", 3)
+    with instrumentation.timer("seconds"):
+      pass
+
+    self.assertEqual(instrumentation.toDict(),
+                     {"counters": {}, "histograms": {}})
+
+
+  def testCountersAndHistograms(self):
+    instrumentation = Instrumentation(enabled=True)
+
+    instrumentation.increment("calls")
+    instrumentation.increment("calls", 2)
+    for value in (0, 1, 3):
+      instrumentation.observe("sizes", value)
+    with instrumentation.timer("seconds"):
+      pass
+
+    results = instrumentation.toDict()
+    self.assertEqual(results["counters"], {"calls": 3})
+    sizes = results["histograms"]["sizes"]
+    self.assertEqual((sizes["count"], sizes["min"], sizes["max"]), (3, 0, 3))
+    self.assertAlmostEqual(sizes["mean"], 4.0 / 3)
+    self.assertEqual(sizes["buckets"], {"0": 1, "<2.0": 1, "<4.0": 1})
+    self.assertEqual(results["histograms"]["seconds"]["count"], 1)
+
+
+  def testTimedDecorator(self):
+    instruments.reset()
+    instruments.enable()
+    try:
+      self.assertEqual(Timed().work(5), 5)
+    finally:
+      instruments.disable()
+    Timed().work(5)
+
+    self.assertEqual(instruments.toDict()["histograms"]["Timed.work"]["count"],
+                     1)
+    instruments.reset()
+
+
+if __name__ == "__main__":
+  unittest.main()
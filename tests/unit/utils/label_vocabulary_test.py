@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the label_vocabulary module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fluent.utils.label_vocabulary import LabelVocabulary
+
+
+
+class LabelVocabularyTest(unittest.TestCase):
+
+
+  def testFromLabelsIsSorted(self):
+    vocabulary = LabelVocabulary.fromLabels([["pay", "staff"], ["culture"],
+                                             [], ["staff"]])
+
+    self.assertSequenceEqual(list(vocabulary), ["culture", "pay", "staff"])
+    self.assertEqual(vocabulary.index("staff"), 2)
+    self.assertEqual(vocabulary[1], "pay")
+    self.assertIn("pay", vocabulary)
+    with self.assertRaises(KeyError):
+      vocabulary.index("hours")
+
+
+  def testEncodeMany(self):
+    vocabulary = LabelVocabulary(["b", "a", "c"])
+
+    values, offsets = vocabulary.encodeMany([["a", "c"], [], ["b"]])
+
+    self.assertSequenceEqual(values.tolist(), [1, 2, 0])
+    self.assertSequenceEqual(offsets.tolist(), [0, 2, 2, 3])
+    self.assertSequenceEqual(vocabulary.encode(["c", "a"]).tolist(), [2, 1])
+
+
+  def testUpdateKeepsIds(self):
+    vocabulary = LabelVocabulary(["b", "a"])
+
+    vocabulary.update([["z", "a"], ["c"]])
+
+    self.assertSequenceEqual(list(vocabulary), ["b", "a", "c", "z"])
+
+
+  def testSaveAndLoad(self):
+    path = tempfile.mkdtemp()
+    try:
+      vocabulary = LabelVocabulary(["staff", "pay"])
+      vocabulary.save(os.path.join(path, "labels.json"))
+
+      loaded = LabelVocabulary.load(os.path.join(path, "labels.json"))
+    finally:
+      shutil.rmtree(path)
+
+    self.assertSequenceEqual(loaded.labels, ["staff", "pay"])
+    self.assertIsInstance(loaded[0], str)
+    self.assertEqual(loaded.index("pay"), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
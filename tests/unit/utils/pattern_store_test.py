@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the pattern_store module."""
+
+import numpy
+import shutil
+import tempfile
+import unittest
+
+from fluent.utils.pattern_store import PatternStore, PatternStoreWriter
+from fluent.utils.random_sdr import RandomSDRGenerator, TokenSDRTable
+
+
+
+class PatternStoreTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.path = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.path)
+
+
+  def testSampleLevelRoundTrip(self):
+    patterns = [
+      {"pattern": {"text": "the cat sat",
+                   "sparsity": 0.03,
+                   "bitmap": numpy.array([1, 5, 9])},
+       "labels": numpy.array([0, 2])},
+      {"pattern": {"text": "",
+                   "sparsity": 0.0,
+                   "bitmap": numpy.array([])},
+       "labels": numpy.array([1])}]
+
+    with PatternStoreWriter(self.path) as writer:
+      for p in patterns:
+        writer.append(p["pattern"], p["labels"])
+
+    store = PatternStore(self.path)
+
+    self.assertEqual(len(store), 2)
+    for expected, actual in zip(patterns, store):
+      self.assertEqual(actual["pattern"]["text"], expected["pattern"]["text"])
+      self.assertAlmostEqual(actual["pattern"]["sparsity"],
+                             expected["pattern"]["sparsity"])
+      self.assertSequenceEqual(actual["pattern"]["bitmap"].tolist(),
+                               expected["pattern"]["bitmap"].tolist())
+      self.assertSequenceEqual(actual["labels"].tolist(),
+                               expected["labels"].tolist())
+
+
+  def testTokenLevelRoundTrip(self):
+    pattern = [{"text": "cat", "sparsity": 0.2, "bitmap": numpy.array([3, 4])},
+               {"text": "sat", "sparsity": 0.2, "bitmap": numpy.array([0, 7])}]
+
+    with PatternStoreWriter(self.path) as writer:
+      writer.append(pattern, numpy.array([4]))
+      writer.append([], numpy.array([0]))
+
+    store = PatternStore(self.path)
+
+    self.assertEqual([p["text"] for p in store[0]["pattern"]], ["cat", "sat"])
+    self.assertSequenceEqual(store[0]["pattern"][1]["bitmap"].tolist(), [0, 7])
+    self.assertSequenceEqual(store[-1]["pattern"], [])
+    self.assertSequenceEqual(store[-1]["labels"].tolist(), [0])
+
+
+  def testTake(self):
+    with PatternStoreWriter(self.path) as writer:
+      writer.append([{"text": "a", "sparsity": 0.1, "bitmap": [1, 2]},
+                     {"text": "b", "sparsity": 0.1, "bitmap": [3]}], [0])
+      writer.append([], [1, 2])
+      writer.append([{"text": "c", "sparsity": 0.1, "bitmap": [4, 5, 6]}], [2])
+
+    subset = PatternStore(self.path).take([2, 0, 1])
+
+    self.assertSequenceEqual(subset["bitmaps"].tolist(), [4, 5, 6, 1, 2, 3])
+    self.assertSequenceEqual(subset["bitmapOffsets"].tolist(), [0, 3, 5, 6])
+    self.assertSequenceEqual(subset["sampleOffsets"].tolist(), [0, 1, 3, 3])
+    self.assertSequenceEqual(subset["labels"].tolist(), [2, 0, 1, 2])
+    self.assertSequenceEqual(subset["labelOffsets"].tolist(), [0, 1, 2, 4])
+
+
+  def testTokenTableRoundTrip(self):
+    samples = [["the", "cat", "sat"], [], ["the", "mat", "the"]]
+    labels = [[0], [1, 2], [2]]
+    table = TokenSDRTable(RandomSDRGenerator(100, 5))
+
+    with PatternStoreWriter(self.path) as writer:
+      for sample, sampleLabels in zip(samples, labels):
+        writer.appendTokens(sample, table.lookup(sample), table.bitmaps, 0.05,
+                            sampleLabels)
+    store = PatternStore(self.path)
+
+    # One pattern row per distinct token.
+    self.assertEqual(store.numPatterns, 4)
+    self.assertEqual(len(store), 3)
+    for i, sample in enumerate(samples):
+      pattern = store[i]["pattern"]
+      self.assertEqual([p["text"] for p in pattern], sample)
+      for token, p in zip(sample, pattern):
+        self.assertSequenceEqual(p["bitmap"].tolist(),
+                                 table.bitmaps[table.ids[token]].tolist())
+        self.assertAlmostEqual(p["sparsity"], 0.05)
+      self.assertSequenceEqual(store[i]["labels"].tolist(), labels[i])
+
+    # Every occurrence of a token is a view of the same row.
+    the = [p["bitmap"] for i in (0, 2) for p in store[i]["pattern"]
+           if p["text"] == "the"]
+    self.assertEqual(len(set(b.__array_interface__["data"][0] for b in the)), 1)
+
+    subset = store.take([2, 1])
+    self.assertSequenceEqual(
+      subset["bitmaps"].tolist(),
+      numpy.concatenate([table.bitmaps[table.ids[t]]
+                         for t in samples[2]]).tolist())
+    self.assertSequenceEqual(subset["sampleOffsets"].tolist(), [0, 3, 3])
+
+    with self.assertRaises(ValueError):
+      PatternStoreWriter(self.path).append([], [0]) or writer.append([], [0])
+
+
+  def testMixedPatternsRaise(self):
+    with PatternStoreWriter(self.path) as writer:
+      writer.append({"text": "a", "sparsity": 0.1, "bitmap": [1]}, [0])
+      with self.assertRaises(ValueError):
+        writer.append([{"text": "a", "sparsity": 0.1, "bitmap": [1]}], [0])
+
+
+  def testEmptyStore(self):
+    PatternStoreWriter(self.path).close()
+
+    self.assertEqual(len(PatternStore(self.path)), 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+
+"""Tests for the plotting helpers, with plotly stubbed if not installed."""
+
+import numpy
+import sys
+import types
+import unittest
+import warnings
+
+
+
+def fakePlotly():
+  plotly = types.ModuleType("plotly")
+  for name in ("offline", "plotly", "tools", "graph_objs"):
+    setattr(plotly, name, types.ModuleType("plotly." + name))
+  for name in ("Data", "ErrorY", "Figure", "Font", "Heatmap", "Layout",
+               "Margin", "Scatter", "XAxis", "YAxis"):
+    setattr(plotly.graph_objs, name, dict)
+  return plotly
+
+
+
+# The plotting module imports plotly; stub it if it is not installed.
+try:
+  import plotly
+except ImportError:
+  plotly = fakePlotly()
+  sys.modules["plotly"] = plotly
+  for name in ("offline", "plotly", "tools", "graph_objs"):
+    sys.modules["plotly." + name] = getattr(plotly, name)
+
+from fluent.utils.plotting import PlotNLP
+
+
+
+class SummarizeAccuraciesTest(unittest.TestCase):
+  """Test grouping trial accuracies by training set size."""
+
+  def testSummarizeAccuracies(self):
+    nan = numpy.nan
+    trialAccuracies = numpy.array([[1.0, 0.5, nan],
+                                   [0.0, nan, nan],
+                                   [0.5, 0.25, nan],
+                                   [1.0, nan, nan],
+                                   [0.75, 1.0, 0.2]])
+    trainSize = [8, 3, 8, 3, 8]
+
+    summary = PlotNLP.summarizeAccuracies(trialAccuracies, trainSize)
+
+    self.assertEqual(summary["sizes"].tolist(), [3, 8])
+    with warnings.catch_warnings():
+      # Groups without tested trials warn in the numpy reductions.
+      warnings.simplefilter("ignore", RuntimeWarning)
+      for i, size in enumerate((3, 8)):
+        group = trialAccuracies[numpy.array(trainSize) == size]
+        numpy.testing.assert_array_equal(summary["count"][i],
+                                         (~numpy.isnan(group)).sum(axis=0))
+        numpy.testing.assert_allclose(summary["mean"][i],
+                                      numpy.nanmean(group, axis=0))
+        numpy.testing.assert_allclose(summary["std"][i],
+                                      numpy.nanstd(group, axis=0))
+
+
+  def testUntestedCategories(self):
+    """Categories no trial of a size tested have no mean or std."""
+    summary = PlotNLP.summarizeAccuracies([[numpy.nan, 0.5]], [4])
+
+    self.assertEqual(summary["count"].tolist(), [[0.0, 1.0]])
+    self.assertTrue(numpy.isnan(summary["mean"][0, 0]))
+    self.assertTrue(numpy.isnan(summary["std"][0, 0]))
+    self.assertEqual(summary["mean"][0, 1], 0.5)
+    self.assertEqual(summary["std"][0, 1], 0.0)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the profiling module."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fluent.utils.profiling import PhaseProfiler
+
+
+
+def work():
+  return sum(i * i for i in xrange(1000))
+
+
+def busyLoop(seconds):
+  """Spin for the given seconds of CPU time."""
+  end = time.clock() + seconds
+  while time.clock() < end:
+    work()
+
+
+
+class PhaseProfilerTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.outputDir = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.outputDir)
+
+
+  def testCProfilePhases(self):
+    profiler = PhaseProfiler(self.outputDir, mode="cprofile", topN=5)
+    with profiler.phase("first"):
+      work()
+    with profiler.phase("second"):
+      work()
+
+    summaryPath = profiler.writeSummary()
+
+    self.assertTrue(os.path.isfile(os.path.join(self.outputDir, "first.prof")))
+    self.assertTrue(os.path.isfile(os.path.join(self.outputDir, "second.prof")))
+    with open(summaryPath) as f:
+      summary = f.read()
+    self.assertIn("=== first ===", summary)
+    self.assertIn("=== second ===", summary)
+    self.assertIn("work", summary)
+
+
+  def testSamplePhase(self):
+    profiler = PhaseProfiler(self.outputDir, mode="sample", topN=100,
+                             interval=0.001)
+    with profiler.phase("busy"):
+      busyLoop(0.2)
+
+    summaryPath = profiler.writeSummary()
+
+    with open(os.path.join(self.outputDir, "busy.stacks")) as f:
+      lines = f.read().splitlines()
+    self.assertGreater(len(lines), 0)
+    counts = {}
+    for line in lines:
+      stack, count = line.rsplit(" ", 1)
+      counts[stack] = int(count)
+    busyStacks = [stack.split(";") for stack in counts if "busyLoop (" in stack]
+    self.assertGreater(len(busyStacks), 0)
+    # Stacks run from the outermost frame to the sampled one.
+    for stack in busyStacks:
+      names = [frame.split(" ")[0] for frame in stack]
+      self.assertLess(names.index("testSamplePhase"), names.index("busyLoop"))
+    with open(summaryPath) as f:
+      summary = f.read()
+    self.assertIn("=== busy ===", summary)
+    self.assertIn("busyLoop", summary)
+
+
+  def testDisabled(self):
+    profiler = PhaseProfiler(self.outputDir, mode=None)
+    with profiler.phase("first"):
+      work()
+
+    self.assertIsNone(profiler.writeSummary())
+    self.assertEqual(os.listdir(self.outputDir), [])
+
+
+  def testInvalidMode(self):
+    with self.assertRaises(ValueError):
+      PhaseProfiler(self.outputDir, mode="trace")
+
+
+if __name__ == "__main__":
+  unittest.main()
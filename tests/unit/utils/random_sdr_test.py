@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the random_sdr module."""
+
+import numpy
+import random
+import unittest
+
+from fluent.utils.random_sdr import RandomSDRGenerator, TokenSDRTable
+
+
+
+class RandomSDRGeneratorTest(unittest.TestCase):
+
+
+  def testStableEncoding(self):
+    """The SDRs must not depend on the process, e.g. the Python hash seed."""
+    generator = RandomSDRGenerator(100, 20)
+
+    self.assertSequenceEqual(
+      generator.encode("kitchen").tolist(),
+      [1, 3, 5, 11, 14, 27, 28, 31, 48, 51, 54, 58, 59, 60, 64, 73, 84, 86, 95,
+       99])
+    self.assertSequenceEqual(generator.encode(u"caf\xe9").tolist(),
+                             generator.encode("caf\xc3\xa9").tolist())
+
+
+  def testBatchMatchesSingleTokens(self):
+    generator = RandomSDRGenerator(16384, 328)
+    tokens = ["the", "kitchen", "smells", "the", ""]
+
+    bitmaps = generator.encodeBatch(tokens)
+
+    self.assertEqual(bitmaps.shape, (5, 328))
+    for token, bitmap in zip(tokens, bitmaps):
+      self.assertSequenceEqual(bitmap.tolist(),
+                               generator.encode(token).tolist())
+      self.assertTrue((numpy.diff(bitmap) > 0).all())
+      self.assertTrue(0 <= bitmap[0] and bitmap[-1] < 16384)
+    self.assertFalse(numpy.array_equal(bitmaps[0], bitmaps[1]))
+    self.assertEqual(generator.encodeBatch([]).shape, (0, 328))
+
+
+  def testSingleTokenPath(self):
+    """encode() matches encodeBatch(), including rows that need redraws."""
+    for n, w in ((100, 20), (30, 30), (16384, 328)):
+      generator = RandomSDRGenerator(n, w)
+      tokens = ["token%d" % i for i in xrange(200)]
+
+      bitmaps = generator.encodeBatch(tokens)
+
+      for token, bitmap in zip(tokens, bitmaps):
+        self.assertSequenceEqual(generator.encode(token).tolist(),
+                                 bitmap.tolist())
+
+
+  def testEncodeCache(self):
+    generator = RandomSDRGenerator(100, 20, cacheSize=2)
+    bitmap = generator.encode("a")
+    bitmap[:] = 0
+
+    self.assertSequenceEqual(generator.encode("a").tolist(),
+                             generator.encodeBatch(["a"])[0].tolist())
+    generator.encode("b")
+    generator.encode("c")
+    self.assertEqual(len(generator._cache), 1)
+
+
+  def testDenseSDRs(self):
+    """Rows with many repeated draws still get w distinct positions."""
+    bitmaps = RandomSDRGenerator(30, 30).encodeBatch(["a", "b"])
+
+    self.assertSequenceEqual(bitmaps[0].tolist(), range(30))
+    self.assertSequenceEqual(bitmaps[1].tolist(), range(30))
+
+
+  def testGlobalRandomStateUntouched(self):
+    random.seed(42)
+    expected = random.random()
+    random.seed(42)
+
+    RandomSDRGenerator(100, 20).encodeBatch(["a", "b"])
+
+    self.assertEqual(random.random(), expected)
+
+
+  def testBadDimensions(self):
+    with self.assertRaises(ValueError):
+      RandomSDRGenerator(10, 11)
+    with self.assertRaises(ValueError):
+      RandomSDRGenerator(10, 0)
+
+
+
+
+class TokenSDRTableTest(unittest.TestCase):
+
+
+  def testLookup(self):
+    generator = RandomSDRGenerator(100, 20)
+    table = TokenSDRTable(generator, capacity=1)
+
+    ids = table.lookup(["the", "cat", "the", "sat"])
+    first = table.bitmaps[ids[0]]
+    self.assertSequenceEqual(ids.tolist(), [0, 1, 0, 2])
+    self.assertSequenceEqual(table.lookup(["sat", "mat"]).tolist(), [2, 3])
+
+    self.assertEqual(len(table), 4)
+    self.assertEqual(table.bitmaps.shape, (4, 20))
+    for token, bitmap in zip(table.tokens, table.bitmaps):
+      self.assertSequenceEqual(bitmap.tolist(),
+                               generator.encode(token).tolist())
+    # Rows handed out before the table grew keep their values.
+    self.assertSequenceEqual(first.tolist(), generator.encode("the").tolist())
+    self.assertSequenceEqual(table.lookup([]).tolist(), [])
+
+
+  def testMaxTokens(self):
+    generator = RandomSDRGenerator(100, 20)
+    table = TokenSDRTable(generator, maxTokens=3)
+
+    ids = table.lookup(["the", "cat", "the"])
+    cat = table.bitmaps[ids[1]]
+    self.assertSequenceEqual(table.lookup(["sat"]).tolist(), [2])
+
+    # Adding a fourth token starts a new table.
+    ids = table.lookup(["mat", "cat"])
+    self.assertSequenceEqual(ids.tolist(), [0, 1])
+    self.assertEqual(table.tokens, ["mat", "cat"])
+    self.assertLessEqual(len(table._bitmaps), 3)
+    self.assertSequenceEqual(table.bitmaps[1].tolist(), cat.tolist())
+    # Rows handed out before the reset keep their values.
+    self.assertSequenceEqual(cat.tolist(), generator.encode("cat").tolist())
+
+    with self.assertRaises(ValueError):
+      TokenSDRTable(generator, maxTokens=0)
+
+
+if __name__ == "__main__":
+  unittest.main()
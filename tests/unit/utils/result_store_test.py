@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2015, Numenta, Inc.  Unless you have purchased from
+# Numenta, Inc. a separate commercial license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+
+"""Tests for the result_store module."""
+
+import numpy
+import shutil
+import tempfile
+import unittest
+
+from fluent.utils.result_store import ResultStore
+
+
+
+class ResultStoreTest(unittest.TestCase):
+
+
+  def setUp(self):
+    self.path = tempfile.mkdtemp()
+
+
+  def tearDown(self):
+    shutil.rmtree(self.path)
+
+
+  def _appendTrials(self, store):
+    store.appendTrial(2, [0, 3], [1, 2],
+                      [numpy.array([1, 0]), [None]],
+                      [numpy.array([1]), numpy.array([0, 2])])
+    store.appendTrial(3, [1, 2, 3], [0],
+                      [numpy.array([2])],
+                      [numpy.array([2])])
+
+
+  def testAppendAndRead(self):
+    store = ResultStore(self.path)
+    self._appendTrials(store)
+
+    self.assertEqual(len(store), 2)
+    trial = store.getTrial(0)
+    self.assertEqual(trial["trainSize"], 2)
+    self.assertSequenceEqual(trial["trainIndices"].tolist(), [0, 3])
+    self.assertSequenceEqual(trial["testIndices"].tolist(), [1, 2])
+    predictions, actual = trial["results"]
+    self.assertEqual([p.tolist() for p in predictions], [[1, 0], []])
+    self.assertEqual([a.tolist() for a in actual], [[1], [0, 2]])
+
+    trial = store.getTrial(1)
+    self.assertEqual([p.tolist() for p in trial["results"][0]], [[2]])
+    self.assertEqual([t["trainSize"] for t in store], [2, 3])
+    store.close()
+
+
+  def testResume(self):
+    store = ResultStore(self.path)
+    self._appendTrials(store)
+    store.close()
+
+    store = ResultStore(self.path)
+    self.assertEqual(len(store), 2)
+    store.appendTrial(4, [0, 1, 2, 3], [], [], [])
+    self.assertEqual([t["trainSize"] for t in store], [2, 3, 4])
+    self.assertEqual(store.getTrial(1)["results"][1][0].tolist(), [2])
+    store.close()
+
+    store = ResultStore(self.path, resume=False)
+    self.assertEqual(len(store), 0)
+    store.close()
+
+
+  def testIncompleteTrialIsDropped(self):
+    store = ResultStore(self.path)
+    self._appendTrials(store)
+    # Rows written without a metadata update, as by an interrupted trial.
+    store._predictions.append([5])
+    store._trainSizes.append(9)
+    store.close()
+
+    store = ResultStore(self.path)
+    self.assertEqual(len(store), 2)
+    store.appendTrial(5, [0], [3], [[1]], [[1]])
+    trial = store.getTrial(2)
+    self.assertEqual(trial["trainSize"], 5)
+    self.assertEqual(trial["results"][0][0].tolist(), [1])
+    store.close()
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -53,6 +53,21 @@ class TextPreprocessTest(unittest.TestCase):
     self.assertSequenceEqual(tokens, expected_tokens)
 
 
+  def testTokenizeSample(self):
+    """Tests the experiments' preprocessing options."""
+    text = "I can't work at [identifier deleted] if you don't allw me to wfh"
+    processor = TextPreprocess(corpusTxt="childrens_stories.txt")
+
+    self.assertSequenceEqual(processor.tokenizeSample(text),
+                             processor.tokenize(text))
+    self.assertSequenceEqual(
+      processor.tokenizeSample(text, preprocess=True),
+      processor.tokenize(text,
+                         ignoreCommon=100,
+                         removeStrings=["[identifier deleted]"],
+                         correctSpell=True))
+
+
   def testTokenizeExpandAbbreviation(self):
     """Tests abbreviations are expanded."""
     text = "I can't work at [identifier deleted] if you don't allw me to wfh"
@@ -94,6 +109,15 @@ class TextPreprocessTest(unittest.TestCase):
     self.assertSequenceEqual(tokens, expected_tokens)
 
 
+  def testCorrectionsBounded(self):
+    processor = TextPreprocess(corpusTxt="childrens_stories.txt", cacheSize=2)
+
+    corrections = [processor.correct(w) for w in ("allw", "hte", "allw", "wrk")]
+
+    self.assertEqual(corrections[0], corrections[2])
+    self.assertLessEqual(len(processor.corrections), 2)
+
+
   def testReadExpansionFileNoSuffixes(self):
     """Tests TextPreprocess reads csv files correctly."""
     processor = TextPreprocess()